@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+import api_client
+
+from config import cache_dir, headers, api_cache_ttl, api_cache_size_mb
+
+# On-disk cache of API responses, shared by every call to the Rivals API.
+# Every URL belongs to an endpoint class (match, heroes, player, ...) and api_cache_ttl in config.py says how long
+# that class stays fresh. Fresh responses are served without asking, stale ones are revalidated with
+# If-None-Match / If-Modified-Since when the API gave us an ETag or Last-Modified, and refetched otherwise.
+# Bodies live in cache/api/<hash>.json, the index next to them. Beyond api_cache_size_mb the least recently used
+# responses are dropped.
+CACHE_DIR = os.path.join(cache_dir, "api")
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+# The index is written at most this often while responses come in, and when the process exits
+SAVE_INTERVAL = 2
+
+ENDPOINTS = [
+	("update", re.compile(r"/player/[^/]+/update$")),
+	("match-history", re.compile(r"/player/[^/]+/match-history$")),
+	("player", re.compile(r"/player/[^/]+$")),
+	("match", re.compile(r"/match/[^/]+$")),
+	("find-player", re.compile(r"/find-player/[^/]+$")),
+	("heroes", re.compile(r"/heroes$")),
+	("patch-notes", re.compile(r"/patch-notes$")),
+]
+
+stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+_entries = None
+_dirty = False
+_saved = 0
+_lock = threading.Lock()
+
+
+def endpoint_class(url):
+	path = urlsplit(url).path
+	for name, pattern in ENDPOINTS:
+		if pattern.search(path):
+			return name
+	return None
+
+
+def ttl(url):
+	# Unknown endpoints are not cached
+	return api_cache_ttl.get(endpoint_class(url), 0)
+
+
+def body_path(url):
+	return os.path.join(CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+
+def _load():
+	global _entries, _dirty
+	if _entries is None:
+		_entries = {}
+		if os.path.exists(INDEX_FILE):
+			try:
+				with open(INDEX_FILE, 'r') as f:
+					_entries = json.load(f)
+			except json.JSONDecodeError:
+				_entries = {}
+		# Endpoints that are not cached anymore (matches, since the match store keeps them) only take up room
+		for url in [url for url in _entries if ttl(url) == 0]:
+			del _entries[url]
+			try:
+				os.remove(body_path(url))
+			except FileNotFoundError:
+				pass
+			_dirty = True
+	return _entries
+
+
+def _save(force=False):
+	global _dirty, _saved
+	if not _dirty or (not force and time.time() - _saved < SAVE_INTERVAL):
+		return
+	_dirty = False
+	_saved = time.time()
+	os.makedirs(CACHE_DIR, exist_ok=True)
+	tmp_path = INDEX_FILE + ".tmp"
+	with open(tmp_path, "w") as f:
+		json.dump(_entries, f)
+	os.replace(tmp_path, INDEX_FILE)
+
+
+def flush():
+	with _lock:
+		_save(force=True)
+
+
+atexit.register(flush)
+
+
+def _entry(url):
+	# The index entry for url, if its body is still on disk
+	entry = _load().get(url)
+	if entry and not os.path.exists(body_path(url)):
+		del _entries[url]
+		return None
+	return entry
+
+
+def _read(url):
+	try:
+		with open(body_path(url), 'r') as f:
+			return json.load(f)
+	except (OSError, json.JSONDecodeError):
+		return None
+
+
+def _fresh(entry):
+	return entry["expires"] is None or time.time() < entry["expires"]
+
+
+def _touch(entry, max_age):
+	global _dirty
+	now = time.time()
+	entry["used"] = now
+	entry["expires"] = None if max_age is None else now + max_age
+	_dirty = True
+
+
+def _evict():
+	global _dirty
+	total = sum(entry["size"] for entry in _entries.values())
+	limit = api_cache_size_mb * 1024 * 1024
+	if total <= limit:
+		return
+	for url in sorted(_entries, key=lambda key: _entries[key]["used"]):
+		if total <= limit:
+			break
+		total -= _entries[url]["size"]
+		del _entries[url]
+		try:
+			os.remove(body_path(url))
+		except FileNotFoundError:
+			pass
+		stats["evicted"] += 1
+	_dirty = True
+
+
+def cached(url):
+	"""
+	The parsed response for url if we have a fresh one, otherwise None.
+	"""
+	max_age = ttl(url)
+	if max_age == 0:
+		return None
+	with _lock:
+		entry = _entry(url)
+		if not entry or not _fresh(entry):
+			return None
+		entry["used"] = time.time()
+	data = _read(url)
+	if data is not None:
+		stats["hits"] += 1
+	return data
+
+
+def store(url, body, response_headers):
+	"""
+	Keeps a 200 response (the raw body) if its endpoint is cached.
+	"""
+	max_age = ttl(url)
+	if max_age == 0:
+		return
+	os.makedirs(CACHE_DIR, exist_ok=True)
+	path = body_path(url)
+	tmp_path = f"{path}.{threading.get_ident()}.tmp"
+	with open(tmp_path, "wb") as f:
+		f.write(body)
+	os.replace(tmp_path, path)
+	with _lock:
+		entry = _load().setdefault(url, {})
+		entry.update({"size": len(body), "etag": response_headers.get("ETag"), "last_modified": response_headers.get("Last-Modified")})
+		_touch(entry, max_age)
+		stats["stored"] += 1
+		_evict()
+		_save()
+
+
+def conditional_headers(url, request_headers=headers):
+	"""
+	request_headers plus If-None-Match / If-Modified-Since for what we have stored.
+	"""
+	request_headers = dict(request_headers)
+	with _lock:
+		entry = _entry(url)
+	if entry:
+		if entry.get("etag"):
+			request_headers["If-None-Match"] = entry["etag"]
+		if entry.get("last_modified"):
+			request_headers["If-Modified-Since"] = entry["last_modified"]
+	return request_headers
+
+
+def revalidated(url):
+	"""
+	The server answered 304, what we have is good for another round. Returns it, or None if it went missing meanwhile.
+	"""
+	with _lock:
+		entry = _entry(url)
+		if not entry:
+			return None
+		_touch(entry, ttl(url))
+		_save()
+	data = _read(url)
+	if data is not None:
+		stats["revalidated"] += 1
+	return data
+
+
+def get(url, request_headers=headers, revalidate=False, timeout=api_client.api_timeout):
+	"""
+	GET through the cache. Returns (status, parsed json or None). A response served or revalidated from the cache is a 200.
+	revalidate=True always asks the server (conditionally, if it can), for data we know may have just changed.
+	"""
+	if not revalidate:
+		data = cached(url)
+		if data is not None:
+			return 200, data
+	r = api_client.get(url, request_headers=conditional_headers(url, request_headers), timeout=timeout)
+	if r.status_code == 304:
+		data = revalidated(url)
+		if data is not None:
+			return 200, data
+		# Lost the body, ask again without conditions
+		r = api_client.get(url, request_headers=request_headers, timeout=timeout)
+	if r.status_code != 200:
+		return r.status_code, None
+	stats["misses"] += 1
+	data = r.json()
+	store(url, r.content, r.headers)
+	return 200, data
+
+
+async def get_async(url, request_headers=headers, revalidate=False):
+	"""
+	get() for async code.
+	"""
+	if not revalidate:
+		data = cached(url)
+		if data is not None:
+			return 200, data
+	status, body, response_headers = await api_client.get_async(url, request_headers=conditional_headers(url, request_headers))
+	if status == 304:
+		data = revalidated(url)
+		if data is not None:
+			return 200, data
+		status, body, response_headers = await api_client.get_async(url, request_headers=request_headers)
+	if status != 200:
+		return status, None
+	stats["misses"] += 1
+	data = json.loads(body)
+	store(url, body, response_headers)
+	return 200, data
+
+
+def report():
+	print(f"API cache: {stats['hits']} hits, {stats['revalidated']} revalidated, {stats['misses']} fetched, {stats['evicted']} evicted.")
@@ -0,0 +1,197 @@
+import time
+import atexit
+import asyncio
+import threading
+import contextlib
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import headers, Bcol, API_RETRIES, RETRY_DELAY_SECONDS, api_backoff, api_timeout, api_connections
+
+# The one way we talk to the Rivals API and its image host, so connections are kept alive and reused instead of
+# paying a new TCP + TLS handshake on every call.
+#
+# Sync calls (get) share one requests.Session. Async calls (get_async) share one aiohttp session, which lives on the
+# client's own event loop in a background thread. Every asyncio.run() in the pipeline is a new loop, which could not
+# keep a connection between runs; get_async() can be awaited from any of them, the request itself is handed over to
+# the client loop.
+#
+# Both ask for gzip, send the API key unless told otherwise, time out after api_timeout, and retry connection errors,
+# 429s and 5xx errors up to API_RETRIES times, waiting api_backoff seconds doubled on every retry (or what Retry-After
+# says). report() prints how many connections were opened and how many requests reused one.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BASE_HEADERS = {"Accept-Encoding": "gzip, deflate"}
+
+bcol = Bcol()
+
+stats = {"requests": 0, "retries": 0, "opened": 0, "reused": 0}
+
+_session = None
+_async_session = None
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def retry_wait(attempt, response_headers=None):
+	# Retry-After if the API sent one, otherwise exponential backoff
+	if response_headers and "Retry-After" in response_headers:
+		try:
+			return float(response_headers["Retry-After"])
+		except ValueError:
+			pass
+	return min(api_backoff * 2 ** attempt, RETRY_DELAY_SECONDS)
+
+
+# --- Sync ---
+
+def session():
+	global _session
+	with _lock:
+		if _session is None:
+			_session = requests.Session()
+			_session.headers.update(BASE_HEADERS)
+			adapter = HTTPAdapter(pool_connections=4, pool_maxsize=api_connections)
+			_session.mount("http://", adapter)
+			_session.mount("https://", adapter)
+		return _session
+
+
+def get(url, request_headers=headers, timeout=api_timeout, stream=False, retries=API_RETRIES):
+	"""
+	GET on the shared session, with retries. Returns the requests.Response of the last attempt.
+	Pass request_headers={} for the image host, which doesn't want the API key.
+	"""
+	for attempt in range(1 + retries):
+		stats["requests"] += 1
+		try:
+			r = session().get(url, headers=request_headers, timeout=timeout, stream=stream)
+		except (requests.ConnectionError, requests.Timeout) as e:
+			if attempt == retries:
+				raise
+			wait = retry_wait(attempt)
+			print(f"{bcol.WARNING}{url} failed ({e}), retrying in {wait:.0f}s...{bcol.ENDC}")
+		else:
+			if r.status_code not in RETRY_STATUSES or attempt == retries:
+				return r
+			wait = retry_wait(attempt, r.headers)
+			print(f"{bcol.WARNING}{url} returned {r.status_code}, retrying in {wait:.0f}s...{bcol.ENDC}")
+			r.close()
+		stats["retries"] += 1
+		time.sleep(wait)
+
+
+# --- Async ---
+
+def _client_loop():
+	global _loop, _thread
+	with _lock:
+		if _loop is None:
+			_loop = asyncio.new_event_loop()
+			_thread = threading.Thread(target=_loop.run_forever, name="api_client", daemon=True)
+			_thread.start()
+		return _loop
+
+
+def _trace():
+	trace = aiohttp.TraceConfig()
+
+	async def opened(session, context, params):
+		stats["opened"] += 1
+
+	async def reused(session, context, params):
+		stats["reused"] += 1
+
+	trace.on_connection_create_end.append(opened)
+	trace.on_connection_reuseconn.append(reused)
+	return trace
+
+
+def async_session():
+	"""
+	The shared aiohttp session. Only use it on the client loop, get_async() takes care of that.
+	"""
+	global _async_session
+	if _async_session is None or _async_session.closed:
+		connector = aiohttp.TCPConnector(limit=api_connections)
+		_async_session = aiohttp.ClientSession(connector=connector, headers=BASE_HEADERS,
+			timeout=aiohttp.ClientTimeout(total=api_timeout), trace_configs=[_trace()])
+	return _async_session
+
+
+async def _fetch(url, request_headers, timeout):
+	# No timeout given, the session's api_timeout applies (timeout=None would mean no timeout at all)
+	kwargs = {"timeout": timeout} if timeout is not None else {}
+	async with async_session().get(url, headers=request_headers, **kwargs) as r:
+		return r.status, await r.read(), r.headers
+
+
+async def _on_client_loop(coro):
+	loop = _client_loop()
+	if asyncio.get_running_loop() is loop:
+		return await coro
+	return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def get_async(url, request_headers=headers, timeout=None, retries=API_RETRIES, throttle=None):
+	"""
+	GET on the shared aiohttp session, with retries. Returns (status, body bytes, response headers) of the last attempt.
+	throttle is an optional async context manager factory (a semaphore, a rate limiter) every attempt runs inside,
+	so waiting for a retry doesn't hold it.
+	"""
+	timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+	for attempt in range(1 + retries):
+		stats["requests"] += 1
+		async with throttle() if throttle else contextlib.nullcontext():
+			try:
+				status, body, response_headers = await _on_client_loop(_fetch(url, request_headers, timeout))
+			except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+				if attempt == retries:
+					raise
+				status, response_headers = None, None
+				print(f"{bcol.WARNING}{url} failed ({e or type(e).__name__}), retrying...{bcol.ENDC}")
+		if status is not None and (status not in RETRY_STATUSES or attempt == retries):
+			return status, body, response_headers
+		wait = retry_wait(attempt, response_headers)
+		if status is not None:
+			print(f"{bcol.WARNING}{url} returned {status}, retrying in {wait:.0f}s...{bcol.ENDC}")
+		stats["retries"] += 1
+		await asyncio.sleep(wait)
+
+
+# --- Counters ---
+
+def counters():
+	"""
+	stats, plus the connections opened and reused by the sync session's pools.
+	"""
+	totals = dict(stats)
+	if _session is not None:
+		for adapter in set(_session.adapters.values()):
+			pools = adapter.poolmanager.pools
+			for key in pools.keys():
+				pool = pools.get(key)
+				if pool is None:
+					continue
+				totals["opened"] += pool.num_connections
+				totals["reused"] += max(0, pool.num_requests - pool.num_connections)
+	return totals
+
+
+def report():
+	totals = counters()
+	print(f"{bcol.HEADER}API client: {totals['requests']} requests ({totals['retries']} retries), "
+		f"{totals['opened']} connections opened, {totals['reused']} requests on a reused connection.{bcol.ENDC}")
+
+
+def close():
+	global _async_session
+	if _async_session is not None and not _async_session.closed and _loop is not None:
+		asyncio.run_coroutine_threadsafe(_async_session.close(), _loop).result(timeout=5)
+	_async_session = None
+	if _session is not None:
+		_session.close()
+
+
+atexit.register(close)
@@ -2,14 +2,16 @@ import os
 import json
 import sys
 import datetime
-import time
-import requests
+import random
 import asyncio
-import aiohttp
 import shutil
 
 from gamer_master import Gamer_master
+import hero_assets
+import api_cache
+import api_client
 from config import base_api, current_season, headers, update_rate, base_image_api, polling_rate, timeout, premium_member
+from config import polling_first_probe, polling_backoff, polling_jitter
 from config import api_time_zone, time_zone, base_api_v2
 from config import Bcol
 
@@ -32,91 +34,17 @@ def get_heroes():
 	url = base_api+"heroes"
 	print("Getting all heroes")
 	print(url)
-	r = requests.get(url, headers=headers)
-	print("Request status code: "+str(r.status_code))
-	if r.status_code != 200:
-		print("API call not successful, {} returned.".format(str(r.status_code)))
+	status, data = api_cache.get(url)
+	print("Request status code: "+str(status))
+	if status != 200:
+		print("API call not successful, {} returned.".format(str(status)))
 	else:	
 		with open("heroes.json", "w") as outfile:
-		    outfile.write(json.dumps(r.json()))
+		    outfile.write(json.dumps(data))
 
 def get_hero_assets():
-	if os.path.exists("heroes.json"):
-		with open("heroes.json", 'r') as f:
-			heroes = json.load(f)
-	for hero in heroes:
-		filename = "../img/heroes/"+str(hero["id"])+".png"
-		if not os.path.exists(filename):
-			time.sleep(1)
-			print("Missing default "+hero["name"]+" avatar, collecting now:")
-			url = base_image_api+hero["imageUrl"]
-			print(url)
-			try:
-				avatar_image = requests.get(url, stream = True)
-				avatar_image.raw.decode_content = True
-				with open(filename,"wb") as outfile:
-					shutil.copyfileobj(avatar_image.raw, outfile)
-			except:
-				print("!! WARNING: AVATAR NOT COLLECTED FOR "+hero["transformations"]["name"])
-		filename = "../img/heroes/"+str(hero["id"])+"_icon.webp"
-		if not os.path.exists(filename):
-			time.sleep(1)
-			print("Missing secondary "+hero["name"]+" avatar, collecting now:")
-			url = base_image_api+"/rivals"+hero["transformations"][0]["icon"]
-			print(url)
-			try:
-				avatar_image = requests.get(url, stream = True)
-				avatar_image.raw.decode_content = True
-				with open(filename,"wb") as outfile:
-					shutil.copyfileobj(avatar_image.raw, outfile)
-			except:
-				print("!! WARNING: ICON NOT COLLECTED FOR "+hero["transformations"]["name"])
-		if not len(hero["transformations"]) > 1:
-			filename = "../img/heroes/"+str(hero["id"])+"_lord.png"
-			if not os.path.exists(filename):
-				time.sleep(1)
-				print("Missing "+hero["name"]+" lord avatar, collecting now:")
-				url = base_image_api+"/rivals/lord/{}_lord.png".format(str(hero["id"]))
-				print(url)
-				try:
-					avatar_image = requests.get(url, stream = True)
-					avatar_image.raw.decode_content = True
-					with open(filename,"wb") as outfile:
-						shutil.copyfileobj(avatar_image.raw, outfile)
-				except:
-					print("!! WARNING: AVATAR NOT COLLECTED FOR "+hero["transformations"]["name"])
-		else:
-			for n in range(len(hero["transformations"])):
-				count = str(n+1)
-				filename = "../img/heroes/"+str(hero["id"])+"_{}_lord.png".format(count)
-				if not os.path.exists(filename):
-					time.sleep(1)
-					print("Missing "+hero["name"]+" lord {} avatar, collecting now:".format(count))
-					url = base_image_api+"/rivals/lord/{}_{}_lord.png".format(str(hero["id"]),count)
-					print(url)
-					try:
-						avatar_image = requests.get(url, stream = True)
-						avatar_image.raw.decode_content = True
-						with open(filename,"wb") as outfile:
-							shutil.copyfileobj(avatar_image.raw, outfile)
-					except:
-						print("!! WARNING: AVATAR NOT COLLECTED FOR "+hero["transformations"]["name"])
-		costume_count = 0
-		for costume in hero["costumes"]:
-			filename = "../img/heroes/"+str(hero["id"])+"_costume_{}.png".format(costume_count)
-			if not os.path.exists(filename):
-				time.sleep(1)
-				print("Missing "+hero["name"]+" costume {}, collecting now:".format(costume_count))
-				url = base_image_api+"/rivals{}".format(costume["icon"])
-				print(url)
-				try:
-					avatar_image = requests.get(url, stream = True)
-					avatar_image.raw.decode_content = True
-					with open(filename,"wb") as outfile:
-						shutil.copyfileobj(avatar_image.raw, outfile)
-				except:
-					print("!! WARNING: AVATAR NOT COLLECTED FOR "+hero["transformations"]["name"])
-			costume_count += 1
+	# Concurrent, incremental sync, see hero_assets.py
+	hero_assets.sync_hero_assets()
 
 
 def convert_to_timestamp(date_str):
@@ -142,8 +70,18 @@ def verify_update(updates):
 		return True
 	return False
 
-def enrich_gamers(gamerlist):
-	g_master = Gamer_master(gamerlist)
+def enrich_gamers(gamerlist, g_master=None):
+	# The pipeline passes in its analysis model, so the profiles are only loaded once per run.
+	if g_master is None:
+		g_master = Gamer_master(gamerlist)
+	download_gamer_assets(g_master)
+	# Pick up the matches we just downloaded
+	g_master.reload_match_data()
+	return g_master
+
+def download_gamer_assets(g_master):
+	# Missing matches, player heads and banners for every gamer in the model, plus the local update dates.
+	# pipeline.py runs this once for all squads together, so a player in two squads is only fetched once.
 	g_master.get_player_matches()
 	for g in g_master.gamers:
 		g.add_readable_dates()
@@ -154,10 +92,11 @@ def enrich_gamers(gamerlist):
 		if not os.path.exists(icon):
 			try:
 				print("Getting new player head")
-				player_icon = requests.get(url, stream = True)
+				player_icon = api_client.get(url, request_headers={}, stream = True)
 				player_icon.raw.decode_content = True
 				with open("../img/player_heads/{}".format(g.data["player"]["icon"]["player_icon_id"])+".png","wb") as outfile:
 					shutil.copyfileobj(player_icon.raw, outfile)
+				g.set_colors()
 			except:
 				print("!! WARNING: PLAYER ICON NOT COLLECTED FOR "+g.nickname)
 		if premium_member and "banner" in g.data["player"]["icon"]:
@@ -169,7 +108,7 @@ def enrich_gamers(gamerlist):
 			if not os.path.exists(banner):
 				try:
 					print("Getting new banner")
-					player_icon = requests.get(url, stream = True)
+					player_icon = api_client.get(url, request_headers={}, stream = True)
 					player_icon.raw.decode_content = True
 					with open(banner,"wb") as outfile:
 						shutil.copyfileobj(player_icon.raw, outfile)
@@ -185,72 +124,174 @@ def stale_timestamp(last_history_update):
 	time_diff = current_time - profile_update_time
 	return time_diff > datetime.timedelta(hours=update_rate)
 
-async def request_new_gamer_data(session, gamer, uids):
-    url = f"https://marvelrivalsapi.com/api/v1/player/{uids[gamer]}/update"
-    async with session.get(url, headers=headers) as r:
-        status = r.status
-        if status != 200:
-        	print(f"Request new data for {gamer} returned status {bcol.HEADER}{status}{bcol.ENDC}")
-        	print(f"API call for update not successful for {gamer}. Possibly rate-limited or API error.")
-        else:
-        	print(f"Request new data for {gamer} returned status {bcol.OKGREEN}{status}{bcol.ENDC}")
-        	print(f"{bcol.OKGREEN}Data refresh request successful for {gamer}.{bcol.ENDC}")
-        # Return status code so caller can decide what to do
-        return status
+async def request_new_gamer_data(gamer, uids):
+    url = f"{base_api}player/{uids[gamer]}/update"
+    # Rate limits and server errors are retried by the client
+    status, body, response_headers = await api_client.get_async(url)
+    if status != 200:
+    	print(f"Request new data for {gamer} returned status {bcol.HEADER}{status}{bcol.ENDC}")
+    	print(f"API call for update not successful for {gamer}. Possibly rate-limited or API error.")
+    else:
+    	print(f"Request new data for {gamer} returned status {bcol.OKGREEN}{status}{bcol.ENDC}")
+    	print(f"{bcol.OKGREEN}Data refresh request successful for {gamer}.{bcol.ENDC}")
+    # Return status code so caller can decide what to do
+    return status
 
-async def fetch_gamer_data(session, gamer, uids, season):
+async def fetch_gamer_data(gamer, uids, season, revalidate=False):
+	# revalidate=True always asks the API, for when we are waiting on a refresh
 	url = f"{base_api}player/{uids[gamer]}?season={current_season}"
 	print(f"Getting stats for {gamer}:")
 	print(url)
-	async with session.get(url, headers=headers) as r:
-		status = r.status
-		print(f"Fetch for {gamer} returned status {status}")
-		if status != 200:
-			print(f"API call for fetching {gamer} not successful.")
-			return None
-		data = await r.json()
-		return data
-
-async def poll_for_update(session, gamer, uids, store_temp_cache, poll_interval=polling_rate, timeout=timeout, file_path="./whoops.json"):
-
+	status, data = await api_cache.get_async(url, revalidate=revalidate)
+	print(f"Fetch for {gamer} returned status {status}")
+	if status != 200:
+		print(f"API call for fetching {gamer} not successful.")
+		return None
+	return data
+
+class UpdatePoller():
 	"""
-	Poll the API until the profile's enriched data is available.
-	Specifically, wait until 'last_history_update' exists and is greater than the update_request_time.
+	Owns every pending profile refresh of a run and checks them all from one loop, instead of a polling loop per gamer.
+	A refresh is first checked polling_first_probe seconds after it was requested, then with a growing wait (times
+	polling_backoff, plus up to polling_jitter of jitter), never more than polling_rate apart. It is done as soon as
+	last_history_update moves or the newest match in match_history changes. All refreshes share one deadline, `timeout`
+	seconds after the poller started, after which we take the data we have.
 	"""
-	start_time = datetime.datetime.now()
-	while True:
-		data = await fetch_gamer_data(session, gamer, uids, current_season)
-		if data and "updates" in data:
-			if verify_update(data["updates"]):
-				print(f"{bcol.OKGREEN}{gamer} update is complete.{bcol.ENDC}")
-				return data
-			if time_stamp_is_today(convert_to_timestamp(data["updates"]["last_history_update"])):
-				print(f"{bcol.OKGREEN}{gamer} has updated history from today. Using data!{bcol.ENDC}")
-				return data
-			if store_temp_cache:
-				dirname = os.path.dirname(file_path)
-				os.makedirs(dirname, exist_ok=True)
-				print(f"{bcol.HEADER}Storing intitial object to retain update_request.{bcol.ENDC}")
-				with open(file_path, "w") as outfile:
-					outfile.write(json.dumps(data))
-				store_temp_cache = False
-		elapsed = (datetime.datetime.now() - start_time).total_seconds()
-		if elapsed > timeout:
-			if data:
-				print(f"Timeout reached while waiting for {gamer} update.")
-				if not stale_timestamp(data["updates"]["last_update_request"]):
-					print(f"{bcol.WARNING}Last update is kind of new though, using this data.{bcol.ENDC}")
-					return data
-				else:
-					print(f"{bcol.FAIL}  #### Last_update_request not processed. MOVING ON!{bcol.ENDC}")
-					return data
+
+	def __init__(self, uids, first_probe=polling_first_probe, backoff=polling_backoff, jitter=polling_jitter,
+			max_interval=polling_rate, deadline=timeout):
+		self.uids = uids
+		self.first_probe = first_probe
+		self.backoff = backoff
+		self.jitter = jitter
+		self.max_interval = max_interval
+		self.loop = asyncio.get_running_loop()
+		self.started = self.loop.time()
+		self.deadline = self.started + deadline
+		self.pending = {}
+		self.wakeup = asyncio.Event()
+		# Gamers with a check in flight, and its task
+		self.checking = {}
+		self.refreshes = 0
+		self.probes = 0
+
+	def wait(self, gamer, cached_data=None, store_temp_cache=False, file_path="./whoops.json"):
+		"""
+		Adds a refresh. Returns a future with the new profile data, or None if the API never answered.
+		cached_data is what we had before asking, the refresh is done when the API returns something newer.
+		"""
+		now = self.loop.time()
+		future = self.loop.create_future()
+		self.pending[gamer] = {
+			"future": future, "baseline": self.fingerprint(cached_data), "data": None, "store_temp_cache": store_temp_cache,
+			"file_path": file_path, "interval": self.first_probe, "next_at": now + self.first_probe, "added": now,
+		}
+		self.refreshes += 1
+		self.wakeup.set()
+		return future
+
+	def fingerprint(self, data):
+		# What moves when the API has refreshed a profile
+		if not data or "updates" not in data:
+			return None
+		history = data.get("match_history") or [{}]
+		return data["updates"].get("last_history_update"), history[0].get("match_uid")
+
+	def refreshed(self, gamer, entry, data):
+		if verify_update(data["updates"]):
+			print(f"{bcol.OKGREEN}{gamer} update is complete.{bcol.ENDC}")
+			return True
+		current = self.fingerprint(data)
+		baseline = entry["baseline"]
+		if baseline is None:
+			# Nothing to compare with, later answers are compared to this one
+			entry["baseline"] = current
+			return False
+		if baseline[0] and current[0] and convert_to_timestamp(current[0]) > convert_to_timestamp(baseline[0]):
+			print(f"{bcol.OKGREEN}{gamer} history was updated at {return_readable_date(current[0])}. Using data!{bcol.ENDC}")
+			return True
+		if current[1] != baseline[1]:
+			print(f"{bcol.OKGREEN}{gamer} has new matches. Using data!{bcol.ENDC}")
+			return True
+		return False
+
+	async def probe(self, gamer):
+		entry = self.pending[gamer]
+		self.probes += 1
+		# Whatever goes wrong with this check (no answer, an answer we can't read), it is tried again with backoff
+		try:
+			data = await fetch_gamer_data(gamer, self.uids, current_season, revalidate=True)
+			if data and "updates" in data:
+				entry["data"] = data
+				if self.refreshed(gamer, entry, data):
+					return self.finish(gamer)
+				if entry["store_temp_cache"]:
+					dirname = os.path.dirname(entry["file_path"])
+					os.makedirs(dirname, exist_ok=True)
+					print(f"{bcol.HEADER}Storing intitial object to retain update_request.{bcol.ENDC}")
+					with open(entry["file_path"], "w") as outfile:
+						outfile.write(json.dumps(data))
+					entry["store_temp_cache"] = False
+		except Exception as e:
+			print(f"{bcol.WARNING}Checking {gamer} failed: {e or type(e).__name__}{bcol.ENDC}")
+		now = self.loop.time()
+		if now >= self.deadline:
+			return self.give_up(gamer)
+		entry["interval"] = min(entry["interval"] * self.backoff, self.max_interval)
+		entry["next_at"] = min(now + entry["interval"] * (1 + random.uniform(0, self.jitter)), self.deadline)
+		print(f"{gamer} update not complete after {now - entry['added']:.0f}s. Checking again in {entry['next_at'] - now:.0f}s, "
+			f"giving up in {self.deadline - now:.0f}s.")
+
+	def give_up(self, gamer):
+		data = self.pending[gamer]["data"]
+		if data:
+			print(f"Timeout reached while waiting for {gamer} update.")
+			if not stale_timestamp(data["updates"]["last_update_request"]):
+				print(f"{bcol.WARNING}Last update is kind of new though, using this data.{bcol.ENDC}")
 			else:
-				print(f"{bcol.FAIL}  #### API Responding with ERROR. MOVING ON!{bcol.ENDC}")
-				return data
-		print(f"Time elapsed: {str(elapsed)}. {gamer} update not complete yet. Waiting {poll_interval} seconds. Timing out when {timeout} seconds has passed..")
-		await asyncio.sleep(poll_interval)
+				print(f"{bcol.FAIL}  #### Last_update_request not processed. MOVING ON!{bcol.ENDC}")
+		else:
+			print(f"{bcol.FAIL}  #### API Responding with ERROR. MOVING ON!{bcol.ENDC}")
+		self.finish(gamer)
+
+	def finish(self, gamer):
+		entry = self.pending.pop(gamer)
+		if not entry["future"].done():
+			entry["future"].set_result(entry["data"])
 
-async def update_single_profile(session, gamer, uids, force_update=False):
+	async def checked(self, gamer):
+		try:
+			await self.probe(gamer)
+		except Exception as e:
+			# Giving up failed too, finish with what we have rather than checking again right away
+			print(f"{bcol.FAIL}Could not finish checking {gamer}: {e or type(e).__name__}{bcol.ENDC}")
+			if gamer in self.pending:
+				self.finish(gamer)
+		finally:
+			# Before waking the loop, so it sees this gamer's next check time
+			self.checking.pop(gamer, None)
+			self.wakeup.set()
+
+	async def run(self):
+		"""
+		Runs until cancelled. Checks are started as they come due, a slow answer doesn't hold up the others.
+		"""
+		while True:
+			self.wakeup.clear()
+			now = self.loop.time()
+			for gamer, entry in self.pending.items():
+				if gamer not in self.checking and entry["next_at"] <= now:
+					self.checking[gamer] = asyncio.ensure_future(self.checked(gamer))
+			waiting = [entry["next_at"] for gamer, entry in self.pending.items() if gamer not in self.checking]
+			try:
+				await asyncio.wait_for(self.wakeup.wait(), max(0, min(waiting) - now) if waiting else None)
+			except asyncio.TimeoutError:
+				pass
+
+	def report(self):
+		print(f"{bcol.HEADER}Polled {self.refreshes} profile refreshes with {self.probes} checks in {self.loop.time() - self.started:.1f}s.{bcol.ENDC}")
+
+async def update_single_profile(gamer, uids, poller, force_update=False):
     file_path = os.path.join(PROFILE_DIR + f"{gamer}/", f"{gamer}.json")
     cached_data = None
     last_update_request = None
@@ -290,13 +331,10 @@ async def update_single_profile(session, gamer, uids, force_update=False):
         print(f"No enriched cached data found for {gamer}.")
 
     # ---------------------------------------------------
-    # If we need an update request, do it with retries.
+    # If we need an update request, do it (the client retries it).
     # ---------------------------------------------------
     if needs_update_request or force_update:
         store_temp_cache = True
-        max_retries = 3
-        wait_seconds = 5
-        request_success = False
 
         # Decide which gamer name to send to request_new_gamer_data
         gamer_name_for_api = (
@@ -304,27 +342,15 @@ async def update_single_profile(session, gamer, uids, force_update=False):
             else gamer
         )
 
-        for attempt in range(max_retries):
-            status = await request_new_gamer_data(session, gamer_name_for_api, uids)
-            if status == 200:
-                request_success = True
-                break
-            else:
-                if attempt < max_retries - 1:
-                    print(f"{bcol.WARNING}Request failed on attempt {attempt+1}/{max_retries}. "
-                          f"Waiting {wait_seconds}s before retry...{bcol.ENDC}")
-                    await asyncio.sleep(wait_seconds)
-
-        if not request_success:
+        status = await request_new_gamer_data(gamer_name_for_api, uids)
+        if status != 200:
             # ❌ Immediately stop for this gamer if repeated attempts failed
-            print(f"{bcol.FAIL}Failed to request new gamer data for {gamer} after {max_retries} attempts. Aborting update for this gamer.{bcol.ENDC}")
+            print(f"{bcol.FAIL}Failed to request new gamer data for {gamer}. Aborting update for this gamer.{bcol.ENDC}")
             return None
 
     # If we reach here, we successfully requested new data (or didn't need to).
-    await asyncio.sleep(polling_rate)
-
-    # Now poll until the enriched data is available or times out
-    new_data = await poll_for_update(session, gamer, uids, store_temp_cache, file_path=file_path)
+    # Now wait for the poller to see the enriched data show up, or for the deadline
+    new_data = await poller.wait(gamer, cached_data, store_temp_cache, file_path=file_path)
 
     if new_data:
         # Create the directory (and any intermediate directories) if it doesn't exist
@@ -345,36 +371,43 @@ async def update_gamer_data(gamerlist, force_update):
 	if os.path.exists("uids.json"):
 		with open("uids.json", 'r') as f:
 			uids = json.load(f)
-	async with aiohttp.ClientSession() as session:
+	# One poller checks every pending refresh, they all share its deadline. Requests go through api_client's pooled session.
+	poller = UpdatePoller(uids)
+	polling = asyncio.ensure_future(poller.run())
+	try:
 		# Create tasks for all profiles concurrently.
-		tasks = [update_single_profile(session, gamer, uids, force_update=force_update) for gamer in gamerlist]
+		tasks = [update_single_profile(gamer, uids, poller, force_update=force_update) for gamer in gamerlist]
 		results = await asyncio.gather(*tasks)
-		return results
+	finally:
+		polling.cancel()
+		await asyncio.gather(polling, return_exceptions=True)
+	poller.report()
+	return results
 
 def get_latest_patches():
 	url = base_api+"patch-notes?page=1&limit=10"
 	print("Getting patches")
 	print(url)
-	r = requests.get(url, headers=headers)
-	print("Request status code: "+str(r.status_code))
-	if r.status_code != 200:
-		print("API call not successful, {} returned.".format(str(r.status_code)))
+	status, data = api_cache.get(url)
+	print("Request status code: "+str(status))
+	if status != 200:
+		print("API call not successful, {} returned.".format(str(status)))
 	else:	
 		with open("patch_notes.json", "w") as outfile:
-		    outfile.write(json.dumps(r.json()))
+		    outfile.write(json.dumps(data))
 
 def make_api_call(url,headers=headers,image=False,filetype="png"):
 	print(url)
 	if not image:
-		r = requests.get(url, headers=headers)
-		print("Request status code: "+str(r.status_code))
-		if r.status_code != 200:
-			print("API call not successful, {} returned.".format(str(r.status_code)))
+		status, data = api_cache.get(url, request_headers=headers)
+		print("Request status code: "+str(status))
+		if status != 200:
+			print("API call not successful, {} returned.".format(str(status)))
 		else:	
-			return r.json()
+			return data
 	else:
 		try:
-			img_file = requests.get(url, stream = True)
+			img_file = api_client.get(url, request_headers={}, stream = True)
 			img_file.raw.decode_content = True
 			with open("returned_test_file."+filetype,"wb") as outfile:
 				shutil.copyfileobj(img_file.raw, outfile)
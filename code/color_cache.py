@@ -0,0 +1,55 @@
+import os
+import json
+import hashlib
+import threading
+
+from config import cache_dir
+
+# Sidecar cache for Gamer.extract_color. Palette quantisation of a player head is slow, and the heads rarely change,
+# so the final light/dark colors are stored per player_icon_id, together with a hash of the image and the
+# color settings they were made with. If any of those change the entry is simply recomputed.
+CACHE_FILE = os.path.join(cache_dir, "player_colors.json")
+
+_entries = None
+_lock = threading.Lock()
+
+
+def file_hash(filepath):
+	with open(filepath, 'rb') as f:
+		return hashlib.sha1(f.read()).hexdigest()
+
+
+def _load():
+	global _entries
+	if _entries is None:
+		_entries = {}
+		if os.path.exists(CACHE_FILE):
+			try:
+				with open(CACHE_FILE, 'r') as f:
+					_entries = json.load(f)
+			except json.JSONDecodeError:
+				_entries = {}
+	return _entries
+
+
+def get(icon_id, content_hash, settings):
+	with _lock:
+		entry = _load().get(str(icon_id))
+	if entry and entry["hash"] == content_hash and entry["settings"] == settings:
+		return {"light": tuple(entry["light"]), "dark": tuple(entry["dark"])}
+	return None
+
+
+def put(icon_id, content_hash, settings, colors):
+	with _lock:
+		_load()[str(icon_id)] = {
+			"hash": content_hash,
+			"settings": settings,
+			"light": list(colors["light"]),
+			"dark": list(colors["dark"])
+		}
+		os.makedirs(cache_dir, exist_ok=True)
+		tmp_path = CACHE_FILE + ".tmp"
+		with open(tmp_path, "w") as f:
+			json.dump(_entries, f)
+		os.replace(tmp_path, CACHE_FILE)
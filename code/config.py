@@ -10,6 +10,10 @@ headers = {
 # Maybe try it for 10 USD, it will last you a LONG time.
 
 ai_enabled = False # Should AI give feedback to each player based on their performances?
+gpt_concurrency = 4 # How many AI summaries we wait for at the same time
+gpt_poll_interval = 2 # Seconds between checking if an AI summary is done
+openai_base_url = config("OPENAI_BASE_URL", default=None) # Leave unset. Point it at gpt_stub.py to test without the real service
+gpt_cache_entries = 2000 # AI replies kept in cache/gpt_responses.json, so identical prompts are not paid for twice
 
 
 squadname = ""
@@ -18,14 +22,20 @@ site = "" # Used to point to images and other files hosted on site
 # Config file for MarvelStack
 
 premium_member = False
-base_api = "https://marvelrivalsapi.com/api/v1/"
-base_api_v2 = "https://marvelrivalsapi.com/api/v2/"
-base_image_api = "https://marvelrivalsapi.com"
+# Leave these three unset. Point them at mock_api.py to run the fetch stage against a local fake of the API
+base_api = config("RIVALS_BASE_API", default="https://marvelrivalsapi.com/api/v1/")
+base_api_v2 = config("RIVALS_BASE_API_V2", default="https://marvelrivalsapi.com/api/v2/")
+base_image_api = config("RIVALS_IMAGE_API", default="https://marvelrivalsapi.com")
 current_season = 2
 match_limit = 40
 average_match_time = 15 * 60 # How long do you consider an average match (15 by default)? we calculate stomps/struggles from this, for the timeline
 game_mode = 2 # 2 = Comp
-rate_limiter = 5 # For getting matches
+rate_limiter = config("RIVALS_RATE_LIMITER", default=5, cast=float) # For getting matches
+# Match details are downloaded concurrently, through one shared limiter. Set this to what your API key allows.
+api_requests_per_second = config("RIVALS_REQUESTS_PER_SECOND", default=1, cast=float)
+api_burst = 5 # How many requests we may fire at once before the rate kicks in
+match_download_concurrency = 4 # How many match downloads can be in flight at the same time
+asset_download_concurrency = 8 # How many hero images we fetch at the same time (async_broker.py --heroes)
 time_zone = "Europe/Oslo" # What timezone you are in locally
 api_time_zone = "America/New_York" # What timezone the API returns, so we know how to convert
 
@@ -42,24 +52,53 @@ costume_attachments = {
 
 gamerlist_bronze = [] # Input the members of your alt stack if you have one
 
+# Every squad pipeline.py builds in one run, each with its own game nights, records, audio and page.
+# Squads are processed side by side and share the hero catalog, match store and caches, so a player in two squads
+# is only fetched once. pipeline.py --squad <name> builds just that one (--bronze is short for --squad bronze).
+squads = [
+	{"name": "main", "gamers": gamerlist, "game_nights_folder": "./game_nights/", "records": "records.json", "audio_folder": "../audio/", "page": "../index.html"},
+	{"name": "bronze", "gamers": gamerlist_bronze, "game_nights_folder": "./game_nights_bronze/", "records": "records_bronze.json", "audio_folder": "../audio_bronze/", "page": "../bronze.html"},
+]
+
 
 gamer_card_hero_count = 6 # How many heroes do you want displayed in the profile card on site, at a max.
 rank_history_count = 20 # How far back should the Rank Score chart show metrics.
 stack_score_count = 14 # How many matches to show for hero scores
+site_data_folder = "data" # Next to index.html. Holds the card and chart data the page fetches
 # Used to decide how light to "push" the player colors extracted from their profile avatars.
 color_threshold = 400
+color_min_saturation = 0.4 # Greyish player heads are saturated up to at least this
 default_banner = "30000001_banner.webp"
 default_player_head = "30000001.png"
 
 # Polling is a bit odd. Since a player may have no new matches since the last update request,
 # it is impossible to know if there is still a reason to wait for new data, or accept the data currently being
 # returned. Usually waiting for about 10 minutes is enough, so we use 15 minutes by default to make sure.
-polling_rate = 1 * 60 # We poll every n minutes + wait an intitial n minutes after first refresh
-timeout = 5 * 60 # We poll for n minutes before accepting the data.
+# Every pending refresh is checked by one poller (async_broker.UpdatePoller): first after a few seconds, then less and less often.
+polling_first_probe = 3 # Seconds after the update request before we first check
+polling_backoff = 1.5 # Each check waits this much longer than the one before
+polling_jitter = 0.2 # Up to this fraction is added to every wait, so the squad's checks don't all land at once
+polling_rate = config("RIVALS_POLLING_RATE", default=1 * 60, cast=float) # The longest we wait between two checks, in seconds
+timeout = config("RIVALS_POLL_TIMEOUT", default=5 * 60, cast=float) # Deadline for every refresh in the run, after it we accept the data we have
 # for matches
 update_rate = 16 # How old can data be before we need to refresh it, in hours.
+# Responses from the API are kept in cache/api (api_cache.py). How long each kind of call stays fresh, in seconds.
+# None never expires, 0 is never cached. Stale entries are revalidated (ETag / Last-Modified) when the API sends those.
+api_cache_ttl = {
+	"match": 0, # A played match never changes, the match store (match_store.py) already keeps every one
+	"heroes": 6 * 60 * 60,
+	"patch-notes": 6 * 60 * 60,
+	"find-player": 7 * 24 * 60 * 60,
+	"player": 5 * 60, # Always revalidated while polling for a refresh
+	"match-history": 5 * 60,
+	"update": 0,
+}
+api_cache_size_mb = 200 # The least recently used responses are dropped beyond this
 API_RETRIES = 5  # How many times to retry API calls after the initial failure
-RETRY_DELAY_SECONDS = 10 # How many seconds to wait between retries
+RETRY_DELAY_SECONDS = config("RIVALS_RETRY_DELAY", default=10, cast=float) # The longest we wait between retries, unless the API says otherwise
+api_backoff = 1 # Seconds before the first retry, doubled on every retry after it (up to RETRY_DELAY_SECONDS)
+api_timeout = 30 # Seconds before a request to the API gives up
+api_connections = 16 # Keep-alive connections to the API kept open and reused between calls (api_client.py)
 
 
 rank_chart_break_points = [3000,3300,3600,3900,4200,4500,4800,5100] # Corresponds to each SR rank tier, from Bronze to Eternity
@@ -67,6 +106,9 @@ rank_chart_break_points_names = ["Bronze","Silver","Gold","Platinum","Diamond","
 rank_chart_break_points_colors = ["sandybrown","silver","gold","powderblue","#1680FF","#EB46FF","#d15438","hotpink"] # Colors for ranks
 display_chart_rank_names = False # Looks clean without, but you might want to show the rank name. Feel free to rename then as well, "Wood league" is popular.
 profile_dir = "../profiles"
+match_store_dir = "../profiles/_matches" # Every match detail file is stored once here, shared by the whole squad
+match_store_format = "msgpack" # "msgpack" is smaller and faster to load (pip install msgpack), falls back to "json" if it is not installed
+cache_dir = "./cache" # Derived data we can always rebuild (player colors etc.), safe to delete
 
 level_to_rank_map = {
     "1": "Bronze III",
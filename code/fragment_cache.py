@@ -0,0 +1,76 @@
+import os
+import json
+import marshal
+import hashlib
+import threading
+
+from config import cache_dir
+
+# On-disk cache of rendered per-player html (gamer cards, analytics tabs, matchup cards).
+# A fragment is rendered by a template function from a plain context dict, and stored together with a hash of
+# that context and of the template's compiled code. If neither changed since the last build the stored html is
+# used as is, so a new match for one player only re-renders that player's fragments.
+# One file per page, player and kind: a player in several squads gets a fragment for each squad's page, instead of
+# every squad's build overwriting the other's. The cache never grows past the squads' sizes.
+FRAGMENT_DIR = os.path.join(cache_dir, "fragments")
+
+# Counted per thread, pipeline.py builds the squads' pages at the same time
+_stats = threading.local()
+_template_hashes = {}
+
+
+def get_stats():
+	if not hasattr(_stats, "counts"):
+		_stats.counts = {"reused": 0, "rendered": 0}
+	return _stats.counts
+
+
+def template_hash(template):
+	# Changes whenever the template's code (f-strings included) is edited
+	if template not in _template_hashes:
+		_template_hashes[template] = hashlib.sha1(marshal.dumps(template.__code__)).hexdigest()
+	return _template_hashes[template]
+
+
+def fragment_key(kind, template, context):
+	payload = json.dumps(context, sort_keys=True, default=str)
+	return hashlib.sha1(f"{kind}\n{template_hash(template)}\n{payload}".encode("utf-8")).hexdigest()
+
+
+def safe(name):
+	return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(name))
+
+
+def fragment_path(page, kind, name):
+	return os.path.join(FRAGMENT_DIR, safe(page), kind, safe(name) + ".json")
+
+
+def render(page, kind, name, template, context):
+	"""
+	Returns the html for one fragment of a page. template(context) yields the html pieces, and is only called on a cache miss.
+	"""
+	key = fragment_key(kind, template, context)
+	path = fragment_path(page, kind, name)
+	if os.path.exists(path):
+		try:
+			with open(path, 'r', encoding="utf-8") as f:
+				cached = json.load(f)
+			if cached["key"] == key:
+				get_stats()["reused"] += 1
+				return cached["html"]
+		except (json.JSONDecodeError, KeyError):
+			pass
+
+	html = "".join(template(context))
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	# Each build writes its own tmp file, so two builds of the same page at once never share one
+	tmp_path = f"{path}.{threading.get_ident()}.tmp"
+	with open(tmp_path, "w", encoding="utf-8") as f:
+		json.dump({"key": key, "html": html}, f)
+	os.replace(tmp_path, path)
+	get_stats()["rendered"] += 1
+	return html
+
+
+def reset_stats():
+	_stats.counts = {"reused": 0, "rendered": 0}
@@ -6,9 +6,11 @@ import math
 import datetime
 import colorsys
 
-from config import profile_dir, time_zone, api_time_zone, color_threshold, ai_enabled, costume_attachments
+from config import profile_dir, time_zone, api_time_zone, color_threshold, color_min_saturation, ai_enabled, costume_attachments
 from config import default_player_head, level_to_rank_map
 
+import color_cache
+
 from colorthief import ColorThief
 from zoneinfo import ZoneInfo
 from PIL import UnidentifiedImageError
@@ -27,13 +29,23 @@ class Gamer():
 		else:
 			print("Tried loading a non-existing profile, exiting.")
 			exit()
-		
+
+		self.nickname = nickname
+		self.set_colors()
+
+		self.nickname_safe = self.nickname.replace("'","").replace(" ","")
+		self.id = self.data["uid"]
+		self.full_rank = self.data["player"]["rank"]["rank"]
+		self.rank = self.full_rank.split(" ")[0].lower()
+
+	def set_colors(self):
+		# Also called by the broker after it has downloaded a missing player head.
 		filepath = "../img/player_heads/{}.png".format(self.data["player"]["icon"]["player_icon_id"])
 
 		try:
 			colors = self.extract_color(filepath)
 		except UnidentifiedImageError:
-			print(f"Error for {nickname}: Unable to identify the image file. The file might be corrupted or not a valid image.")
+			print(f"Error for {self.nickname}: Unable to identify the image file. The file might be corrupted or not a valid image.")
 			colors = self.extract_color(f"../img/player_heads/{default_player_head}")
 
 		if colors:
@@ -46,14 +58,7 @@ class Gamer():
 			self.color_dark_g = str(colors["dark"][1])
 			self.color_dark_b = str(colors["dark"][2])
 		else:
-			print("Player head for "+nickname+" not collected yet.")
-
-
-		self.nickname = nickname
-		self.nickname_safe = self.nickname.replace("'","").replace(" ","")
-		self.id = self.data["uid"]
-		self.full_rank = self.data["player"]["rank"]["rank"]
-		self.rank = self.full_rank.split(" ")[0].lower()
+			print("Player head for "+self.nickname+" not collected yet.")
 
 	def store_self(self):
 		filepath = profile_dir+"/{}/{}.json".format(self.nickname,self.nickname)
@@ -78,8 +83,10 @@ class Gamer():
 			local_updates[key] = local_str
 		
 		# Store the new local_updates array next to the original updates.
-		self.data["local_updates"] = local_updates
-		self.store_self()
+		# Only written when it changed, the pipeline skips analysis for profiles that stay the same.
+		if self.data.get("local_updates") != local_updates:
+			self.data["local_updates"] = local_updates
+			self.store_self()
 
 	def get_hero_costume(self,hero_id):
 		if self.nickname in costume_attachments:
@@ -142,12 +149,20 @@ class Gamer():
 	    if not os.path.exists(filepath):
 	        return None
 
+	    # Only decode the image if the head or the color settings changed since last time
+	    icon_id = os.path.splitext(os.path.basename(filepath))[0]
+	    content_hash = color_cache.file_hash(filepath)
+	    settings = {"color_threshold": color_threshold, "min_saturation": color_min_saturation}
+	    colors = color_cache.get(icon_id, content_hash, settings)
+	    if colors:
+	        return colors
+
 	    color_thief = ColorThief(filepath)
 	    # Get the dominant color from the image
 	    r, g, b = color_thief.get_color(quality=1)
 
 	    # Optionally saturate the color to avoid greyish tones
-	    r, g, b = self.saturate_color((r, g, b), min_saturation=0.4)
+	    r, g, b = self.saturate_color((r, g, b), min_saturation=color_min_saturation)
 
 	    # Optionally apply your brightness threshold logic
 	    color_total = r + g + b
@@ -167,10 +182,12 @@ class Gamer():
 	    color_dark_g = str(math.ceil(g / 2))
 	    color_dark_b = str(math.ceil(b / 2))
 
-	    return {
+	    colors = {
 	        "light": (color_light_r, color_light_g, color_light_b),
 	        "dark": (color_dark_r, color_dark_g, color_dark_b)
 	    }
+	    color_cache.put(icon_id, content_hash, settings, colors)
+	    return colors
 
 # Example usage:
 if __name__ == "__main__":
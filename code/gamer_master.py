@@ -1,5 +1,4 @@
 import os
-import shutil
 import json
 import requests
 import time
@@ -9,36 +8,71 @@ import random
 import statistics
 import re
 import sys
+import hashlib
+import numpy as np
 
 from collections import defaultdict
 from zoneinfo import ZoneInfo
 
 from gamer import Gamer
 import synergies
+import hero_catalog
+import match_store
+import match_fetcher
+import participant_table
+import api_client
 
-from config import base_api, base_api_v2, headers, current_season, profile_dir, rate_limiter, time_zone, role_lock, gamer_card_hero_count
+from config import base_api_v2, current_season, profile_dir, rate_limiter, time_zone, role_lock, gamer_card_hero_count
 from config import TOAST_MESSAGES, ROAST_MESSAGES, NEUTRAL_MESSAGES, BELOW_MESSAGES, ABOVE_MESSAGES, CATEGORY_MAX_POINTS
 from config import MAX_STAT_VALUES, MAX_STEPS, STAR_ICONS, performances, matchup_threshold, MAX_STAT_VALUES, ROLE_SCORING_CATEGORIES
 from config import player_max_score, ai_enabled, minimum_time_played_to_count_match, stack_score_count, Bcol, match_limit, game_mode
-from config import gamerlist, gamerlist_bronze, average_match_time, squadname, API_RETRIES, RETRY_DELAY_SECONDS
+from config import gamerlist, gamerlist_bronze, average_match_time, squadname
+
+# What a game night fingerprint hashes per player, bump the version when this changes
+NIGHT_FINGERPRINT_TOTALS = ["kills", "assists", "deaths", "wins", "draws", "losses", "damage", "healing", "tanked", "seconds_played", "match_count"]
+NIGHT_FINGERPRINT_VERSION = 2
 
 
 class Gamer_master():
 
-	def __init__(self, gamerlist, game_nights_folder="./game_nights/"):
+	def __init__(self, gamerlist, game_nights_folder="./game_nights/", load_matches=True):
+		self.game_nights_folder = game_nights_folder
+		self.initiated = False
 		self.gamers = []
 		for nickname in gamerlist:
 			g = Gamer(nickname)
 			self.gamers.append(g)
+		# load_matches=False gives just the profiles, enough for async_broker.download_gamer_assets
+		if load_matches:
+			self.reload_match_data()
+		else:
+			self.seed_latest_game_night_dates()
+
+	@classmethod
+	def for_game_nights(cls, game_nights_folder="./game_nights/"):
+		# Just enough of a model for the game night file helpers (compute_kpi_records), without loading any gamers.
+		g_master = cls.__new__(cls)
+		g_master.game_nights_folder = game_nights_folder
+		g_master.initiated = False
+		g_master.gamers = []
+		return g_master
+
+	def reload_match_data(self):
+		# The pipeline builds one model per run, and calls this after the broker has downloaded new matches,
+		# instead of constructing a fresh Gamer_master.
 		self.get_comp_heroes()
 		self.load_and_sort_recent_match_data()
+		self.build_participant_table()
 		self.get_latest_match_night()
 		self.get_hero_matches()
 		self.get_hero_stats()
-		self.game_nights_folder = game_nights_folder
 
 
 	def initiate(self):
+		# Most of the steps below enrich the gamer objects in place, and are not safe to run twice.
+		if self.initiated:
+			return
+		self.initiated = True
 		self.calculate_hero_scores()
 		self.calculate_scores()
 		self.export_data_objects()
@@ -51,11 +85,7 @@ class Gamer_master():
 
 
 	def secure_name(self,name):
-		if name == "Dagger":
-			return "Cloak & Dagger"
-		if name == "Bruce Banner":
-			return "Hulk"
-		return name
+		return hero_catalog.secure_name(name)
 
 	def sanitize_gamerlist(self):
 		s_gamers = []
@@ -69,6 +99,10 @@ class Gamer_master():
 	    # Define profile_dir within the method or ensure it's accessible via self.profile_dir or globally
 	    # profile_dir = "path/to/your/profiles" # Make sure this is defined
 
+	    store = match_store.get_store()
+	    # Matches we still need, match_uid -> nicknames it belongs to. Downloaded together at the end.
+	    pending = defaultdict(set)
+
 	    # --- Part 1: Process existing match history for each gamer ---
 	    print(f"{bcol.HEADER}--- Processing existing match history ---{bcol.ENDC}")
 	    for gamer in self.gamers:
@@ -91,67 +125,14 @@ class Gamer_master():
 	                continue
 
 	            match_uid = match["match_uid"]
-	            match_filename = f"{match_uid}.json"
-	            dest_file = os.path.join(gamer_dir, match_filename)
 
-	            # 1. Skip if the match file already exists for this gamer.
-	            if os.path.exists(dest_file):
-	                # print(f"Match {match_filename} already exists for {gamer.nickname}.") # Optional verbosity
+	            # 1. Skip if the match is already in the shared store, whoever downloaded it.
+	            if store.has(match_uid):
 	                continue
 
-	            # 2. Look for the match file in all *other* gamer directories.
-	            found_copy = False
-	            for other_gamer in self.gamers:
-	                if other_gamer.nickname == gamer.nickname:
-	                    continue # Don't check self
-	                other_dir = os.path.join(profile_dir, other_gamer.nickname)
-	                source_file = os.path.join(other_dir, match_filename)
-	                if os.path.exists(source_file):
-	                    try:
-	                        print(f"Found {match_filename} in {other_gamer.nickname}'s directory. Copying to {gamer.nickname}...")
-	                        shutil.copy(source_file, dest_file)
-	                        print(f"{bcol.OKGREEN}Copied {match_filename} from {other_gamer.nickname} to {gamer.nickname}.{bcol.ENDC}")
-	                        found_copy = True
-	                        break # Exit the inner loop once copied
-	                    except Exception as e:
-	                        print(f"{bcol.FAIL}Error copying {match_filename} from {other_gamer.nickname} to {gamer.nickname}: {e}{bcol.ENDC}")
-	                        # Decide if you want to break or let it try downloading
-	                        break # Let's break here, assuming copy error is serious
-
-	            if found_copy:
-	                continue # Move to the next match for this gamer
-
-	            # 3. If not found locally or copied, attempt to download it with retries.
-	            print(f"Match {match_filename} not found locally for {gamer.nickname}. Attempting download...")
-	            match_data = None
-	            download_success = False
-	            for attempt in range(1 + API_RETRIES): # Initial attempt + retries
-	                match_data = self.get_match(match_uid) # Call your single match download method
-	                if match_data:
-	                    # Download successful
-	                    try:
-	                        with open(dest_file, "w") as f:
-	                            json.dump(match_data, f, indent=4)
-	                        print(f"{bcol.OKBLUE}Downloaded and saved match {match_uid} for {gamer.nickname} (Attempt {attempt + 1}).{bcol.ENDC}")
-	                        download_success = True
-	                        break # Exit retry loop on success
-	                    except IOError as e:
-	                        print(f"{bcol.FAIL}Failed to write match file {dest_file}: {e}{bcol.ENDC}")
-	                        # This is a local issue, maybe don't retry API? Break retry loop.
-	                        break
-	                else:
-	                    # Download failed
-	                    print(f"{bcol.WARNING}Download attempt {attempt + 1} failed for match {match_uid}.{bcol.ENDC}")
-	                    if attempt < API_RETRIES:
-	                        print(f"Retrying in {RETRY_DELAY_SECONDS}s...")
-	                        time.sleep(RETRY_DELAY_SECONDS)
-	                    # No need for else here, loop will end
-
-	            if not download_success:
-	                print(f"{bcol.FAIL}Failed to download match {match_uid} for {gamer.nickname} after {1 + API_RETRIES} attempts.{bcol.ENDC}")
-	                # Decide if you want to exit or just continue with the next match/gamer
-	                # exit(f"Exiting due to persistent download failure for match {match_uid}.") # Uncomment to exit script
-	                # continue # Continue processing next match
+	            # 2. If not stored yet, queue it for download.
+	            print(f"Match {match_uid} not found locally for {gamer.nickname}. Queued for download.")
+	            pending[str(match_uid)].add(gamer.nickname)
 
 	    # --- Part 2: Check for and fetch new matches if data is old (with retries) ---
 	    print(f"\n{bcol.HEADER}--- Checking for new matches (if data is not from yesterday) ---{bcol.ENDC}")
@@ -193,55 +174,26 @@ class Gamer_master():
 	            print(f"API URL: {url}")
 
 	            fetched_matches_data = None # Variable to store successful fetch result
-	            fetch_success = False
-
-	            # --- Retry Loop for Fetching Match History List ---
-	            for attempt in range(1 + API_RETRIES):
-	                try:
-	                    print(f"Attempting API call (Attempt {attempt + 1}/{1 + API_RETRIES})...")
-	                    r = requests.get(url, headers=headers, timeout=15) # Added timeout
-	                    r.raise_for_status() # Raises HTTPError for 4xx/5xx status codes
-
-	                    fetched_matches_data = r.json() # Try to parse JSON
-	                    print(f"{bcol.OKGREEN}Successfully fetched match history list for {gamer.nickname}.{bcol.ENDC}")
-	                    fetch_success = True
-	                    break # Exit retry loop on success
-
-	                except requests.exceptions.HTTPError as e:
-	                    print(f"{bcol.FAIL}HTTP Error during fetch for {gamer.nickname} (Attempt {attempt + 1}): {e.response.status_code} {e.response.reason}{bcol.ENDC}")
-	                    # Optional: print response body for debugging, be careful with large responses
-	                    # print(f"Response body: {r.text[:500]}")
-	                    # Decide if specific errors are non-retryable (e.g., 401 Unauthorized, 404 Not Found)
-	                    if e.response.status_code in [401, 403, 404]:
-	                         print(f"{bcol.FAIL}Non-retryable HTTP error {e.response.status_code}. Aborting fetch for {gamer.nickname}.{bcol.ENDC}")
-	                         break # Stop retrying for this specific error
-
-	                except requests.exceptions.RequestException as e:
-	                    # Includes connection errors, timeouts, etc.
-	                    print(f"{bcol.FAIL}Network error fetching history for {gamer.nickname} (Attempt {attempt + 1}): {e}{bcol.ENDC}")
-
-	                except json.JSONDecodeError as e:
-	                     print(f"{bcol.FAIL}Error decoding JSON response for {gamer.nickname} (Attempt {attempt + 1}): {e}{bcol.ENDC}")
-	                     # Optional: print response text that failed parsing
-	                     # print(f"Response text: {r.text[:500]}") # Be careful if r might not be defined
-
-	                except Exception as e:
-	                    # Catch any other unexpected errors during the fetch attempt
-	                    print(f"{bcol.FAIL}An unexpected error occurred during fetch attempt {attempt + 1} for {gamer.nickname}: {e}{bcol.ENDC}")
-	                    import traceback
-	                    traceback.print_exc() # Print stack trace for debugging unexpected errors
-
-
-	                # If we are here, the attempt failed and we might retry
-	                if attempt < API_RETRIES:
-	                    print(f"Retrying fetch in {RETRY_DELAY_SECONDS}s...")
-	                    time.sleep(RETRY_DELAY_SECONDS)
-	                # else: loop will naturally end after last attempt
-
-	            # --- End of Retry Loop for Fetching Match History List ---
-
-	            if not fetch_success or fetched_matches_data is None:
-	                print(f"{bcol.FAIL}Failed to fetch match history list for {gamer.nickname} after {1 + API_RETRIES} attempts. Skipping processing for this gamer.{bcol.ENDC}")
+
+	            # Rate limits, server errors and dropped connections are retried by the client
+	            try:
+	                r = api_client.get(url, timeout=15)
+	                r.raise_for_status() # Raises HTTPError for 4xx/5xx status codes
+	                fetched_matches_data = r.json() # Try to parse JSON
+	                print(f"{bcol.OKGREEN}Successfully fetched match history list for {gamer.nickname}.{bcol.ENDC}")
+
+	            except requests.exceptions.HTTPError as e:
+	                print(f"{bcol.FAIL}HTTP Error during fetch for {gamer.nickname}: {e.response.status_code} {e.response.reason}{bcol.ENDC}")
+
+	            except requests.exceptions.RequestException as e:
+	                # Includes connection errors, timeouts, etc.
+	                print(f"{bcol.FAIL}Network error fetching history for {gamer.nickname}: {e}{bcol.ENDC}")
+
+	            except json.JSONDecodeError as e:
+	                 print(f"{bcol.FAIL}Error decoding JSON response for {gamer.nickname}: {e}{bcol.ENDC}")
+
+	            if fetched_matches_data is None:
+	                print(f"{bcol.FAIL}Failed to fetch match history list for {gamer.nickname}. Skipping processing for this gamer.{bcol.ENDC}")
 	                continue # Move to the next gamer
 
 	            # Now process the successfully fetched matches
@@ -256,7 +208,13 @@ class Gamer_master():
 	            except:
 	                print(f"{bcol.FAIL}STORING FAILED, ERROR. Exiting().{gamer.nickname}.{bcol.ENDC}")
 	                exit()
-	            with open(latest_matches_file, "w") as f: json.dump(fetched_matches_data, f)
+	            # Only rewrite the list when it changed, the pipeline reruns a squad's analysis and site whenever this file is touched
+	            if self.stored_match_history(latest_matches_file) != fetched_matches_data:
+	                tmp_path = latest_matches_file + ".tmp"
+	                with open(tmp_path, "w") as f: json.dump(fetched_matches_data, f)
+	                os.replace(tmp_path, latest_matches_file)
+	            else:
+	                print(f"No new matches in {gamer.nickname}'s match history.")
 	            # --- Duplicated Match Processing Logic ---
 	            for match in fetched_matches_data["match_history"]:
 	                if not isinstance(match, dict) or "match_uid" not in match:
@@ -267,78 +225,52 @@ class Gamer_master():
 	                # if "game_mode_id" in match and match["game_mode_id"] != game_mode: continue
 
 	                match_uid = match["match_uid"]
-	                match_filename = f"{match_uid}.json"
-	                dest_file = os.path.join(gamer_dir, match_filename)
 
-	                # 1. Skip if exists
-	                if os.path.exists(dest_file):
+	                # 1. Skip if stored
+	                if store.has(match_uid):
 	                    continue
 
-	                # 2. Check other gamers & copy
-	                found_copy = False
-	                for other_gamer in self.gamers:
-	                    if other_gamer.nickname == gamer.nickname: continue
-	                    other_dir = os.path.join(profile_dir, other_gamer.nickname)
-	                    source_file = os.path.join(other_dir, match_filename)
-	                    if os.path.exists(source_file):
-	                        try:
-	                            print(f"Found fetched {match_filename} in {other_gamer.nickname}'s dir. Copying to {gamer.nickname}...")
-	                            shutil.copy(source_file, dest_file)
-	                            print(f"{bcol.OKGREEN}Copied {match_filename} from {other_gamer.nickname} to {gamer.nickname}.{bcol.ENDC}")
-	                            found_copy = True
-	                            break
-	                        except Exception as e:
-	                            print(f"{bcol.FAIL}Error copying {match_filename} from {other_gamer.nickname}: {e}{bcol.ENDC}")
-	                            break
-
-	                if found_copy:
-	                    continue
-
-	                # 3. Download with retries
-	                print(f"Match {match_filename} (from fetch) not found locally for {gamer.nickname}. Attempting download...")
-	                match_detail_data = None
-	                download_success_inner = False
-	                for attempt_inner in range(1 + API_RETRIES):
-	                    match_detail_data = self.get_match(match_uid) # Call single match download method
-	                    if match_detail_data:
-	                        try:
-	                            with open(dest_file, "w") as f:
-	                                json.dump(match_detail_data, f, indent=4)
-	                            print(f"{bcol.OKBLUE}Downloaded and saved match {match_uid} for {gamer.nickname} (Attempt {attempt_inner + 1}).{bcol.ENDC}")
-	                            download_success_inner = True
-	                            break
-	                        except IOError as e:
-	                            print(f"{bcol.FAIL}Failed to write match file {dest_file}: {e}{bcol.ENDC}")
-	                            break
-	                    else:
-	                        print(f"{bcol.WARNING}Download attempt {attempt_inner + 1} failed for match {match_uid}.{bcol.ENDC}")
-	                        if attempt_inner < API_RETRIES:
-	                            print(f"Retrying in {RETRY_DELAY_SECONDS}s...")
-	                            time.sleep(RETRY_DELAY_SECONDS)
-
-	                if not download_success_inner:
-	                    print(f"{bcol.FAIL}Failed to download match details for {match_uid} for {gamer.nickname} after {1 + API_RETRIES} attempts.{bcol.ENDC}")
-	                    # continue # Continue with the next match in the fetched list
+	                # 2. Queue it for download
+	                print(f"Match {match_uid} (from fetch) not found locally for {gamer.nickname}. Queued for download.")
+	                pending[str(match_uid)].add(gamer.nickname)
 	            # --- End of Duplicated Match Processing Logic ---
 
+	    # --- Part 3: Download every missing match at once, shared between gamers and rate limited ---
+	    if pending:
+	        print(f"\n{bcol.HEADER}--- Downloading {len(pending)} missing matches ---{bcol.ENDC}")
+	        results = match_fetcher.download_matches(list(pending))
+	        for match_uid, nicknames in pending.items():
+	            if not results.get(match_uid):
+	                print(f"{bcol.FAIL}Match {match_uid} could not be downloaded for {', '.join(sorted(nicknames))}.{bcol.ENDC}")
+
 	    print(f"\n{bcol.HEADER}--- Finished processing all gamers ---{bcol.ENDC}")
 
-	def get_match(self, match_id):
-		time.sleep(rate_limiter)
-		url = base_api+"match/"+match_id
-		print(url)
-		r = requests.get(url, headers=headers)
-		if r.status_code != 200:
-			print("API call not successful, {} returned.".format(str(r.status_code)))
+	def seed_latest_game_night_dates(self):
+		# Without match data get_latest_match_night never runs, and every gamer would look years out of date to
+		# get_player_matches. Their stored match history is enough to tell which night they last played.
+		for g in self.gamers:
+			history = self.stored_match_history(os.path.join(profile_dir, g.nickname, "latest_comp_games.json"))
+			timestamps = [match["match_time_stamp"] for match in (history or {}).get("match_history", []) if "match_time_stamp" in match]
+			if timestamps:
+				g.latest_game_night_date = self.get_game_night_date(max(timestamps))
+
+	def stored_match_history(self, path):
+		# What get_player_matches last wrote to latest_comp_games.json, or None
+		if not os.path.exists(path):
+			return None
+		try:
+			with open(path, 'r') as f:
+				return json.load(f)
+		except json.JSONDecodeError:
 			return None
-		else:
-			return r.json()
 
 	def convert_timestamp_to_date(self, timestamp):
 		dt_oslo = datetime.datetime.fromtimestamp(timestamp, tz=ZoneInfo(time_zone))
 		return dt_oslo.strftime("%d.%m.%Y %H:%M")
 
 	def load_and_sort_recent_match_data(self):
+		# Matches are read through the shared store, so a match played by several of us is only parsed once
+		store = match_store.get_store()
 		# Process each gamer in self.gamers
 		for gamer in self.gamers:
 			# Initialize the match_data list
@@ -363,23 +295,18 @@ class Gamer_master():
 			# For each match listed in the comp_games (assumed to be the last 20 matches)
 			for comp_game in comp_games["match_history"]:
 				match_uid = str(comp_game["match_uid"])
-				match_file = None
 				
-				# Look for a file that represents this match.
-				# We assume the file name starts with the match_uid and follows the scheme: "matchUID_timestamp_xxx_xxx_xxx.json"
-				for filename in os.listdir(profile_dir):
-					if filename == match_uid+".json":
-						match_file = filename
+				# Look for the stored match.
+				# We assume the match_uid follows the scheme: "matchUID_timestamp_xxx_xxx_xxx"
+				stored = store.load(match_uid)
 				
-				# If we found a matching file, load its JSON and attach extended data
-				if match_file:
-					file_path = os.path.join(profile_dir, match_file)
-					with open(file_path, 'r') as f:
-						data = json.load(f)
+				# If we found it, take a shallow copy (the stored object is shared with the other gamers) and attach extended data
+				if stored:
+					data = dict(stored)
 					
-					# Optionally, extract a timestamp from the file name (the second part)
+					# Optionally, extract a timestamp from the match_uid (the second part)
 					try:
-						timestamp = int(match_file[:-5].split("_")[1])
+						timestamp = int(match_uid.split("_")[1])
 					except (ValueError, IndexError):
 						timestamp = 0
 					
@@ -389,7 +316,7 @@ class Gamer_master():
 					if data["match_details"] is not None:
 						gamer.match_data.append(data)
 				else:
-					print(f"Match file for match_uid {match_uid} not found in {gamer.nickname}'s folder.")
+					print(f"Match file for match_uid {match_uid} not found in the match store for {gamer.nickname}.")
 			
 			# Sort the match_data list descending by match_timestamp so that the latest match is first.
 			gamer.match_data.sort(key=lambda m: m.get("match_timestamp", 0), reverse=True)
@@ -433,25 +360,24 @@ class Gamer_master():
 			g.latest_game_night = latest_night_matches
 
 	def get_hero_stats(self):
+		table = self.participants
 		for g in self.gamers:
 			for hero in g.top_heroes:
+				rows = table.hero_match_rows(g.nickname, hero["hero_id"])
 				hero["match_stats"] = []
-				hero["mvp_count"] = 0
-				hero["svp_count"] = 0
-				for match in hero["match_array"]:
+				hero["mvp_count"] = int(np.count_nonzero(table.mvp[rows]))
+				hero["svp_count"] = int(np.count_nonzero(table.svp[rows]))
+				for row in rows:
+					match = g.match_data[table.match_pos[row]]
 					stat_object = {}
-					stat_object["match_date"] = self.get_game_night_date(match["extended_data"]["match_time_stamp"])
+					stat_object["match_date"] = table.night[row]
 					stat_object["match_time"] = match["extended_data"]["match_time_stamp"]
 					stat_object["primary"] = False
 
-					if match["match_details"]["mvp_uid"] == g.id:
-						hero["mvp_count"] += 1
-					if match["match_details"]["svp_uid"] == g.id:
-						hero["svp_count"] += 1
 					# REPEAT ALL ADDITIONS HERE FOR PRIMARIES OR THEY GET LOST
-					if match["extended_data"]["match_player"]["player_hero"]["hero_id"] == hero["hero_id"]:
+					if table.hero_id[row] == hero["hero_id"]:
 						stat_object = match["extended_data"]["match_player"]["player_hero"]
-						stat_object["match_date"] = self.get_game_night_date(match["extended_data"]["match_time_stamp"])
+						stat_object["match_date"] = table.night[row]
 						stat_object["match_time"] = match["extended_data"]["match_time_stamp"]
 						stat_object["primary"] = True
 						if match["extended_data"]["score_info"]["0"] == match["extended_data"]["score_info"]["1"]:
@@ -489,16 +415,15 @@ class Gamer_master():
 
 					hero["match_stats"].append(stat_object)
 
+	def build_participant_table(self):
+		# Flattens every gamer's own participant row once, the analyses below select from it instead of walking match_players.
+		self.participants = participant_table.ParticipantTable(self.gamers, self.get_game_night_date, self.duration_to_seconds, performances)
+
 	def get_hero_matches(self):
+		table = self.participants
 		for g in self.gamers:
 			for hero in g.top_heroes:
-				hero["match_array"] = []
-				for match in g.match_data:
-					for participant in match["match_details"]["match_players"]:
-						if participant["nick_name"] == g.nickname:
-							for played_hero in participant["player_heroes"]:
-								if played_hero["hero_id"] == hero["hero_id"]:
-									hero["match_array"].append(match)
+				hero["match_array"] = [g.match_data[pos] for pos in table.match_pos[table.hero_match_rows(g.nickname, hero["hero_id"])]]
 				hero["match_count"] = len(hero["match_array"])
 			g.top_heroes = sorted([h for h in g.top_heroes if h["match_count"] > 0], key=lambda h: h["match_count"], reverse=True)
 
@@ -511,7 +436,7 @@ class Gamer_master():
 			for hero in hero_array:
 				hero_data = self.get_hero_from_id(hero["hero_id"])
 				hero["role"] = hero_data["role"]
-				hero["name"] = self.secure_name(hero_data["transformations"][0]["name"])
+				hero["name"] = hero_data["secure_name"]
 				hero["difficulty"] = hero_data["difficulty"]
 			if g.nickname in role_lock:
 				for hero in hero_array:
@@ -529,117 +454,76 @@ class Gamer_master():
 		print("")
 
 	def get_hero_from_id(self,h_id):
-		bcol = Bcol()
-		filepath = "heroes.json"
-		fetched_hero = None
-		if os.path.exists(filepath):
-			with open(filepath, 'r') as f:
-				heroes = json.load(f)
-		for hero in heroes:
-			if int(hero["id"]) == int(h_id):
-				fetched_hero = hero
-		if not fetched_hero:
-			exit(f"{bcol.FAIL}Hero {h_id} is not present in {filepath}. Try to run broker with --heroes param. If it still fails, maybe it is a new season, and you need to wait for the hero to be added?{bcol.ENDC}")
-		return fetched_hero
+		# Served from the in-memory catalog, heroes.json is only parsed again when it changes on disk.
+		return hero_catalog.get_hero(h_id)
 
 	def calculate_scores(self):
+		table = self.participants
 		for g in self.gamers:
-			# Initialize total counters
-			healing_array = []
-			damage_array = []
-			tank_array = []
-			deaths_array = []
-			kills_array = []
-			assists_array = []
-			grouped_match_scores = {}
+			# Sometimes a hero has a primary match, but it is not... counted?
+			# So they have 0 matches in their stats. And that crashes this part.
+			# So we only count matches where get_hero_stats dated the primary hero, i.e. it is one of our top heroes and was played.
+			top_hero_ids = [hero["hero_id"] for hero in g.top_heroes]
+			rows = table.rows(g.nickname, table.has_participant & table.played_primary & np.isin(table.hero_id, top_hero_ids))
+			results = rows[np.isin(table.win[rows], [0, 1, 2])]
 
 			totals = {
-				"kills": 0, "assists": 0, "deaths": 0, "wins": 0, "draws": 0, "losses": 0,
-				"damage": 0, "healing": 0, "tanked": 0, "seconds_played": 0, "unique_matches" : []
+				"kills": table.total("kills", rows), "assists": table.total("assists", rows), "deaths": table.total("deaths", rows),
+				"wins": table.count("win", rows, 1), "draws": table.count("win", rows, 2), "losses": table.count("win", rows, 0),
+				"damage": table.total("damage", rows), "healing": table.total("heal", rows), "tanked": table.total("taken", rows),
+				"seconds_played": table.total("play_time", rows), "unique_matches" : [table.match_result(row) for row in results]
 			}
 
 			match_count = len(g.match_data)
 
-			for match in g.match_data:
-				# Sometimes a hero has a primary match, but it is not... counted?
-				# So they have 0 matches in their stats. And that crashes this part.
-				# So we just check if match_date is added, and if not? Just skip it.
-
-				if "match_date" in match["extended_data"]["match_player"]["player_hero"]:
-					match_date = match["extended_data"]["match_player"]["player_hero"]["match_date"]  # Extract match date
-
-					# Find the participant corresponding to the gamer
-					for participant in match["match_details"]["match_players"]:
-						if participant["nick_name"] == g.nickname:
-							# Aggregate player totals
-							totals["kills"] += participant["kills"]
-							totals["assists"] += participant["assists"]
-							totals["deaths"] += participant["deaths"]
-							totals["damage"] += participant["total_hero_damage"]
-							totals["healing"] += participant["total_hero_heal"]
-							totals["tanked"] += participant["total_damage_taken"]
-							totals["seconds_played"] += self.duration_to_seconds(match["extended_data"]["match_play_duration"])
-
-							if participant["is_win"] == 0:
-								totals["losses"] += 1
-								totals["unique_matches"].append({"match_id":match["match_details"]["match_uid"],"win":"loss", "duration":self.duration_to_seconds(match["extended_data"]["match_play_duration"])})
-							if participant["is_win"] == 1:
-								totals["wins"] += 1
-								totals["unique_matches"].append({"match_id":match["match_details"]["match_uid"],"win":"win", "duration":self.duration_to_seconds(match["extended_data"]["match_play_duration"])})
-							if participant["is_win"] == 2:
-								totals["draws"] += 1
-								totals["unique_matches"].append({"match_id":match["match_details"]["match_uid"],"win":"draw", "duration":self.duration_to_seconds(match["extended_data"]["match_play_duration"])})
-
-							# Track arrays for consistency calculations
-							deaths_array.append(participant["deaths"])
-							kills_array.append(participant["kills"])
-							assists_array.append(participant["assists"])
-
-							# --- GROUP MATCH SCORES BY DATE ---
-							if match_date not in grouped_match_scores:
-								grouped_match_scores[match_date] = {
-									"kills": 0, "assists": 0, "deaths": 0, "wins": 0, "draws": 0, "losses": 0,
-									"damage": 0, "healing": 0, "tanked": 0, "seconds_played": 0,
-									"match_count": 0, "unique_matches" : []
-								}
-
-							# Aggregate stats per date
-							grouped_match_scores[match_date]["kills"] += participant["kills"]
-							grouped_match_scores[match_date]["assists"] += participant["assists"]
-							grouped_match_scores[match_date]["deaths"] += participant["deaths"]
-							grouped_match_scores[match_date]["seconds_played"] += self.duration_to_seconds(match["extended_data"]["match_play_duration"])
-
-							grouped_match_scores[match_date]["damage"] += participant["total_hero_damage"]
-							grouped_match_scores[match_date]["healing"] += participant["total_hero_heal"]
-							grouped_match_scores[match_date]["tanked"] += participant["total_damage_taken"]
-							grouped_match_scores[match_date]["match_count"] += 1
-							if participant["is_win"] == 0:
-								grouped_match_scores[match_date]["losses"] += 1
-								grouped_match_scores[match_date]["unique_matches"].append({"match_id":match["match_details"]["match_uid"],"win":"loss", "duration":self.duration_to_seconds(match["extended_data"]["match_play_duration"])})
-							if participant["is_win"] == 1:
-								grouped_match_scores[match_date]["wins"] += 1
-								grouped_match_scores[match_date]["unique_matches"].append({"match_id":match["match_details"]["match_uid"],"win":"win", "duration":self.duration_to_seconds(match["extended_data"]["match_play_duration"])})
-							if participant["is_win"] == 2:
-								grouped_match_scores[match_date]["draws"] += 1
-								grouped_match_scores[match_date]["unique_matches"].append({"match_id":match["match_details"]["match_uid"],"win":"draw", "duration":self.duration_to_seconds(match["extended_data"]["match_play_duration"])})
-							grouped_match_scores[match_date]["heroes"] = []
-							if "secondaries" not in grouped_match_scores[match_date]:
-								grouped_match_scores[match_date]["secondaries"] = []
-							primaries = []
-							for hero in g.top_heroes:
-								if "grouped_match_scores" in hero:
-									if match_date in hero["grouped_match_scores"]:
-										primaries.append(hero["hero_id"])
-										added_hero = hero["grouped_match_scores"][match_date]
-										added_hero["name"] = self.secure_name(hero["name"])
-										added_hero["hero_id"] = hero["hero_id"]
-										added_hero["role"] = hero["role"]
-										grouped_match_scores[match_date]["heroes"].append(added_hero)
-							for hero in participant["player_heroes"]:
-								if hero["hero_id"] not in primaries:
-									second = self.get_hero_from_id(hero["hero_id"])
-									hero["name"] = self.secure_name(second["name"])
-									grouped_match_scores[match_date]["secondaries"].append(hero)
+			# Track arrays for consistency calculations
+			deaths_array = table.deaths[rows].tolist()
+			kills_array = table.kills[rows].tolist()
+			assists_array = table.assists[rows].tolist()
+
+			# --- GROUP MATCH SCORES BY DATE ---
+			grouped_match_scores = {}
+			nights, night_of_row = table.group(rows, "night")
+			night_count = len(nights)
+			night_totals = {column: table.group_totals(column, rows, night_of_row, night_count) for column in ["kills", "assists", "deaths", "damage", "heal", "taken", "play_time"]}
+			wins = table.win[rows]
+			night_wins = table.group_counts(night_of_row, night_count, wins == 1)
+			night_draws = table.group_counts(night_of_row, night_count, wins == 2)
+			night_losses = table.group_counts(night_of_row, night_count, wins == 0)
+			night_matches = table.group_counts(night_of_row, night_count)
+			night_results = [[] for _ in nights]
+			for row, night in zip(results, night_of_row[np.isin(wins, [0, 1, 2])]):
+				night_results[night].append(table.match_result(row))
+			night_participants = [[] for _ in nights]
+			for row, night in zip(rows, night_of_row):
+				night_participants[night].append(g.match_data[table.match_pos[row]]["match_details"]["match_players"][table.participant_pos[row]])
+
+			for n, match_date in enumerate(nights):
+				grouped_match_scores[match_date] = {
+					"kills": night_totals["kills"][n], "assists": night_totals["assists"][n], "deaths": night_totals["deaths"][n],
+					"wins": night_wins[n], "draws": night_draws[n], "losses": night_losses[n],
+					"damage": night_totals["damage"][n], "healing": night_totals["heal"][n], "tanked": night_totals["taken"][n],
+					"seconds_played": night_totals["play_time"][n],
+					"match_count": night_matches[n], "unique_matches" : night_results[n]
+				}
+				grouped_match_scores[match_date]["heroes"] = []
+				grouped_match_scores[match_date]["secondaries"] = []
+				primaries = []
+				for hero in g.top_heroes:
+					if "grouped_match_scores" in hero:
+						if match_date in hero["grouped_match_scores"]:
+							primaries.append(hero["hero_id"])
+							added_hero = hero["grouped_match_scores"][match_date]
+							added_hero["name"] = self.secure_name(hero["name"])
+							added_hero["hero_id"] = hero["hero_id"]
+							added_hero["role"] = hero["role"]
+							grouped_match_scores[match_date]["heroes"].append(added_hero)
+				for participant in night_participants[n]:
+					for hero in participant["player_heroes"]:
+						if hero["hero_id"] not in primaries:
+							second = self.get_hero_from_id(hero["hero_id"])
+							hero["name"] = self.secure_name(second["name"])
+							grouped_match_scores[match_date]["secondaries"].append(hero)
 
 
 			# --- Derived Statistics Calculations ---
@@ -818,12 +702,11 @@ class Gamer_master():
 		return minutes * 60 + seconds
 
 	def calculate_hero_scores(self):
+		# One pass over the matches builds the hero totals and the per-night totals.
+		# Only the running match score needs the totals as they were at that match, everything else is derived once at the end.
 		for g in self.gamers:
 			for hero in g.top_heroes:
 				# Initialize total counters
-				healing_array = []
-				damage_array = []
-				tank_array = []
 				deaths_array = []
 				kills_array = []
 				assists_array = []
@@ -833,16 +716,16 @@ class Gamer_master():
 					"kills": 0, "assists": 0, "deaths": 0, "wins": 0, "losses": 0,
 					"damage": 0, "healing": 0, "tanked": 0, "seconds_played": 0
 				}
-				count = 1
 				for match in hero["match_stats"]:
 					if match["primary"]:  # Only count matches where this hero was primary
 						match_date = match["match_date"]  # Get the date for grouping
+						seconds_played = self.duration_to_seconds(match["play_time"])
 
 						# Aggregate data per match
 						totals["kills"] += match["kills"]
 						totals["assists"] += match["assists"]
 						totals["deaths"] += match["deaths"]
-						totals["seconds_played"] += self.duration_to_seconds(match["play_time"])
+						totals["seconds_played"] += seconds_played
 						totals["damage"] += match["total_hero_damage"]
 						totals["healing"] += match["total_hero_heal"]
 						totals["tanked"] += match["total_damage_taken"]
@@ -855,9 +738,6 @@ class Gamer_master():
 						deaths_array.append(match["deaths"])
 						kills_array.append(match["kills"])
 						assists_array.append(match["assists"])
-						healing_array.append(match["total_hero_heal"])
-						damage_array.append(match["total_hero_damage"])
-						tank_array.append(match["total_damage_taken"])
 
 						# --- GROUP MATCH SCORES BY DATE ---
 						if match_date not in grouped_match_scores:
@@ -868,78 +748,84 @@ class Gamer_master():
 							}
 
 						# Aggregate per day
-						grouped_match_scores[match_date]["kills"] += match["kills"]
-						grouped_match_scores[match_date]["assists"] += match["assists"]
-						grouped_match_scores[match_date]["deaths"] += match["deaths"]
-						grouped_match_scores[match_date]["seconds_played"] += self.duration_to_seconds(match["play_time"])
-						grouped_match_scores[match_date]["damage"] += match["total_hero_damage"]
-						grouped_match_scores[match_date]["healing"] += match["total_hero_heal"]
-						grouped_match_scores[match_date]["tanked"] += match["total_damage_taken"]
-						grouped_match_scores[match_date]["match_count"] += 1
+						night = grouped_match_scores[match_date]
+						night["kills"] += match["kills"]
+						night["assists"] += match["assists"]
+						night["deaths"] += match["deaths"]
+						night["seconds_played"] += seconds_played
+						night["damage"] += match["total_hero_damage"]
+						night["healing"] += match["total_hero_heal"]
+						night["tanked"] += match["total_damage_taken"]
+						night["match_count"] += 1
 						if match["win"] == "win":
-							grouped_match_scores[match_date]["wins"] += 1
+							night["wins"] += 1
 						if match["win"] == "loss":
-							grouped_match_scores[match_date]["losses"] += 1
-
-						# --- Derived Statistics Calculations ---
-						derived = {}
-						match_count = totals["wins"] + totals["losses"]
-
-						# KDA calculation: handle zero deaths to avoid division by zero
-						derived["kda"] = (totals["kills"] + totals["assists"]) / totals["deaths"] if totals["deaths"] > 0 else totals["kills"] + totals["assists"]
-
-						# Minutes played (avoid division by zero)
-						minutes_played = totals["seconds_played"] / 60 if totals["seconds_played"] > 0 else 0
-						derived["damage_per_minute"] = totals["damage"] / minutes_played if minutes_played > 0 else 0
-						derived["healing_per_minute"] = totals["healing"] / minutes_played if minutes_played > 0 else 0
-						derived["tanking_per_minute"] = totals["tanked"] / minutes_played if minutes_played > 0 else 0
-						derived["kills_per_minute"] = totals["kills"] / minutes_played if minutes_played > 0 else 0
-
-						# Win rate calculation
-						derived["win_rate"] = totals["wins"] / match_count if match_count > 0 else 0
-
-						# Per-game stats
-						derived["kills_per_game"] = totals["kills"] / match_count if match_count > 0 else 0
-						derived["assists_per_game"] = totals["assists"] / match_count if match_count > 0 else 0
-						derived["deaths_per_game"] = totals["deaths"] / match_count if match_count > 0 else 0
-
-						# Add the derived stats into the totals dictionary
-						totals["derived_stats"] = derived
-
-						# Compute consistency
-						totals["kills_consistency"] = self.compute_consistency(kills_array)
-						totals["deaths_consistency"] = self.compute_consistency(deaths_array)
-						totals["assists_consistency"] = self.compute_consistency(assists_array)
-
-						# Store final stats in hero object
-						hero["match_scores"] = totals
-						hero["match_scores"]["role"] = hero["role"]
-						hero["match_scores"]["hero_id"] = hero["hero_id"]
-
-						# Store grouped match scores
-						hero["grouped_match_scores"] = grouped_match_scores
-
-						# Compute final hero score using improved formula
-						hero["match_scores"]["score"] = self.compute_composite_value(hero["match_scores"]["derived_stats"], role=hero["role"])
-						hero["match_scores"]["derived_stats"]["score"] = totals["score"]
-						match["score"] = totals["score"]
-
-						# Compute scores for grouped matches by date
-						for match_date, stats in hero["grouped_match_scores"].items():
-							# Calculate per-minute values for proper scoring
-							minutes_played = stats["seconds_played"] / 60 if stats["seconds_played"] > 0 else 0
-							derived = {
-								"damage_per_minute": stats["damage"] / minutes_played if minutes_played > 0 else 0,
-								"healing_per_minute": stats["healing"] / minutes_played if minutes_played > 0 else 0,
-								"tanking_per_minute": stats["tanked"] / minutes_played if minutes_played > 0 else 0,
-								"kills_per_minute": stats["kills"] / minutes_played if minutes_played > 0 else 0,
-								"win_rate": stats["wins"] / stats["match_count"] if stats["match_count"] > 0 else 0,
-								"kda": (stats["kills"] + stats["assists"]) / stats["deaths"] if stats["deaths"] > 0 else stats["kills"] + stats["assists"],
-								"kills_per_game": stats["kills"] / stats["match_count"] if stats["match_count"] > 0 else 0,
-								"assists_per_game": stats["assists"] / stats["match_count"] if stats["match_count"] > 0 else 0,
-								"deaths_per_game": stats["deaths"] / stats["match_count"] if stats["match_count"] > 0 else 0
-							}
-							stats["score"] = self.compute_composite_value(derived, role=hero["role"])
+							night["losses"] += 1
+
+						# Running score, the hero's score as it stood after this match
+						totals["derived_stats"] = self.derive_hero_stats(totals)
+						match["score"] = self.compute_composite_value(totals["derived_stats"], role=hero["role"])
+
+				if not kills_array:
+					# Never played as primary, nothing to score
+					continue
+
+				# Compute consistency
+				totals["kills_consistency"] = self.compute_consistency(kills_array)
+				totals["deaths_consistency"] = self.compute_consistency(deaths_array)
+				totals["assists_consistency"] = self.compute_consistency(assists_array)
+
+				# Store final stats in hero object
+				hero["match_scores"] = totals
+				hero["match_scores"]["role"] = hero["role"]
+				hero["match_scores"]["hero_id"] = hero["hero_id"]
+
+				# Store grouped match scores
+				hero["grouped_match_scores"] = grouped_match_scores
+
+				# Final hero score is the running score after the last match
+				hero["match_scores"]["score"] = self.compute_composite_value(hero["match_scores"]["derived_stats"], role=hero["role"])
+				hero["match_scores"]["derived_stats"]["score"] = totals["score"]
+
+				# Compute scores for grouped matches by date
+				for match_date, stats in hero["grouped_match_scores"].items():
+					# Calculate per-minute values for proper scoring
+					minutes_played = stats["seconds_played"] / 60 if stats["seconds_played"] > 0 else 0
+					derived = {
+						"damage_per_minute": stats["damage"] / minutes_played if minutes_played > 0 else 0,
+						"healing_per_minute": stats["healing"] / minutes_played if minutes_played > 0 else 0,
+						"tanking_per_minute": stats["tanked"] / minutes_played if minutes_played > 0 else 0,
+						"kills_per_minute": stats["kills"] / minutes_played if minutes_played > 0 else 0,
+						"win_rate": stats["wins"] / stats["match_count"] if stats["match_count"] > 0 else 0,
+						"kda": (stats["kills"] + stats["assists"]) / stats["deaths"] if stats["deaths"] > 0 else stats["kills"] + stats["assists"],
+						"kills_per_game": stats["kills"] / stats["match_count"] if stats["match_count"] > 0 else 0,
+						"assists_per_game": stats["assists"] / stats["match_count"] if stats["match_count"] > 0 else 0,
+						"deaths_per_game": stats["deaths"] / stats["match_count"] if stats["match_count"] > 0 else 0
+					}
+					stats["score"] = self.compute_composite_value(derived, role=hero["role"])
+
+	def derive_hero_stats(self, totals):
+		derived = {}
+		match_count = totals["wins"] + totals["losses"]
+
+		# KDA calculation: handle zero deaths to avoid division by zero
+		derived["kda"] = (totals["kills"] + totals["assists"]) / totals["deaths"] if totals["deaths"] > 0 else totals["kills"] + totals["assists"]
+
+		# Minutes played (avoid division by zero)
+		minutes_played = totals["seconds_played"] / 60 if totals["seconds_played"] > 0 else 0
+		derived["damage_per_minute"] = totals["damage"] / minutes_played if minutes_played > 0 else 0
+		derived["healing_per_minute"] = totals["healing"] / minutes_played if minutes_played > 0 else 0
+		derived["tanking_per_minute"] = totals["tanked"] / minutes_played if minutes_played > 0 else 0
+		derived["kills_per_minute"] = totals["kills"] / minutes_played if minutes_played > 0 else 0
+
+		# Win rate calculation
+		derived["win_rate"] = totals["wins"] / match_count if match_count > 0 else 0
+
+		# Per-game stats
+		derived["kills_per_game"] = totals["kills"] / match_count if match_count > 0 else 0
+		derived["assists_per_game"] = totals["assists"] / match_count if match_count > 0 else 0
+		derived["deaths_per_game"] = totals["deaths"] / match_count if match_count > 0 else 0
+		return derived
 
 	def generate_star_chart_for_heroes(self):
 		for g in self.gamers:
@@ -980,15 +866,17 @@ class Gamer_master():
 					hero["match_scores"]["final_ratings"][stat] = {"stars": stars, "html": stars_html}
 
 	def get_strongest_performances(self):
-		results = {}
-		for stat in performances:
-			results[stat] = []
-			for g in self.gamers:
-				for match in g.match_data:
-					results[stat].append({"stat":stat,"player":g,"metric":match["extended_data"]["match_player"]["player_hero"][stat],"hero":match["extended_data"]["match_player"]["player_hero"]["hero_id"]})
+		table = self.participants
+		# Only the gamers still in the list, sanitize_gamerlist may have dropped some since the table was built
+		gamers = {g.nickname: g for g in self.gamers}
+		candidates = table.gamer_rows(gamers)
 		toppers = []
 		for stat in performances:
-			toppers.append(sorted(results[stat], key=lambda h: h["metric"], reverse=True)[0])
+			# argmax picks the first of equal values, same as the stable sort we used to do
+			row = candidates[int(np.argmax(getattr(table, "primary_"+stat)[candidates]))]
+			g = gamers[table.player[row]]
+			player_hero = g.match_data[table.match_pos[row]]["extended_data"]["match_player"]["player_hero"]
+			toppers.append({"stat":stat,"player":g,"metric":player_hero[stat],"hero":player_hero["hero_id"]})
 
 		return toppers
 
@@ -1118,6 +1006,56 @@ class Gamer_master():
 	    except Exception: # Catch potential conversion issues
 	         return ""
 
+	def night_fingerprint(self, night_data):
+	    """
+	    What a game night file was built from: the matches (with results and who played them) and every player's night totals.
+	    Hero lists are left out on purpose, a player's top heroes shift as new matches come in and that shouldn't rebuild old nights.
+	    match_counts lets us tell late matches apart from a night slowly dropping out of the match_limit window.
+	    """
+	    matches = sorted([match_id, info["result"], info["duration"], sorted(info["players"])] for match_id, info in night_data["matches"].items())
+	    totals = {nickname: {stat: night_stats.get(stat, 0) for stat in NIGHT_FINGERPRINT_TOTALS} for nickname, night_stats in night_data["player_stats"].items()}
+	    content = json.dumps({"matches": matches, "player_totals": totals}, sort_keys=True, default=str)
+	    return {
+	        "version": NIGHT_FINGERPRINT_VERSION,
+	        "hash": hashlib.sha1(content.encode("utf-8")).hexdigest(),
+	        "match_counts": {nickname: night_stats.get("match_count", 0) for nickname, night_stats in night_data["player_stats"].items()}
+	    }
+
+	def night_needs_update(self, file_path, game_night_date, night_data, fingerprint):
+	    """
+	    Returns True if the night has to be (re)built. Files from before fingerprints are stamped when their matches are unchanged.
+	    """
+	    if not os.path.exists(file_path):
+	        return True
+	    with open(file_path, "r", encoding="utf-8") as f:
+	        stored = json.load(f)
+	    stored_uids = set(stored.get("unique_matches", []))
+	    current_uids = set(night_data["matches"].keys())
+
+	    if not current_uids <= stored_uids:
+	        print(f"🔄 {game_night_date} got {len(current_uids - stored_uids)} late match(es), rebuilding.")
+	        return True
+
+	    stored_fingerprint = stored.get("fingerprint")
+	    # Older fingerprints hashed the hero lists too, those get restamped like unstamped files instead of rebuilding every night once
+	    if stored_fingerprint is None or stored_fingerprint.get("version") != NIGHT_FINGERPRINT_VERSION:
+	        if current_uids == stored_uids:
+	            stored["fingerprint"] = fingerprint
+	            with open(file_path, "w", encoding="utf-8") as f:
+	                json.dump(stored, f, indent=4)
+	            print(f"ℹ️ Stamped {game_night_date} with a fingerprint.")
+	        return False
+
+	    if stored_fingerprint["hash"] == fingerprint["hash"]:
+	        return False
+
+	    # Same matches, different stats. Only trust it if nobody lost matches, otherwise the night is just aging out of our window.
+	    stored_counts = stored_fingerprint.get("match_counts", {})
+	    if current_uids == stored_uids and all(fingerprint["match_counts"].get(nickname, 0) >= count for nickname, count in stored_counts.items()):
+	        print(f"🔄 {game_night_date} stats changed, rebuilding.")
+	        return True
+	    return False
+
 	def aggregate_game_night_data(self):
 	    os.makedirs(self.game_nights_folder, exist_ok=True)
 
@@ -1145,14 +1083,17 @@ class Gamer_master():
 	    for game_night_date, night_data in all_game_night_data.items():
 
 	        file_path = os.path.join(self.game_nights_folder, f"{game_night_date.replace('-', '_')}.json")
-	        # 🛠️ Check if the game night file already exists (optional, keep if needed)
-	        if os.path.exists(file_path):
-	            print(f"ℹ️ Skipping {game_night_date}, file already exists.")
-	            continue
 
 	        if not night_data["matches"]: # Skip if no matches found for this date (shouldn't happen with defaultdict)
 	            continue
 
+	        # 🛠️ Only nights that are new, or changed since they were written, are rebuilt.
+	        # A rebuilt night is written without its AI summaries, so process_game_nights makes new ones.
+	        fingerprint = self.night_fingerprint(night_data)
+	        if not self.night_needs_update(file_path, game_night_date, night_data, fingerprint):
+	            print(f"ℹ️ Skipping {game_night_date}, unchanged.")
+	            continue
+
 	        # --- Step 3: Sort matches chronologically ---
 	        sorted_match_ids = sorted(
 	            night_data["matches"].keys(),
@@ -1334,7 +1275,8 @@ class Gamer_master():
 	            "unique_matches": sorted_match_ids, # Already sorted chronologically
 	            "soloqueue": solo_queue_matches, # Populate from event loop
 	            "players": [],
-	            "events": events # Add the generated events list
+	            "events": events, # Add the generated events list
+	            "fingerprint": fingerprint
 	        }
 
 	        # Aggregate totals and player details
@@ -1373,30 +1315,32 @@ class Gamer_master():
 
 
 	        # --- Step 6: Save Data ---
-	        with open(file_path, "w", encoding="utf-8") as f:
+	        tmp_path = file_path + ".tmp"
+	        with open(tmp_path, "w", encoding="utf-8") as f:
 	            json.dump(final_data, f, indent=4)
-	            print(f"✅ Stored {game_night_date} with events in {self.game_nights_folder}")
+	        os.replace(tmp_path, file_path)
+	        print(f"✅ Stored {game_night_date} with events in {self.game_nights_folder}")
 
 
 	def set_synergies(self):
-		self.gamers = synergies.enrich_gamers_with_synergies(self.gamers)
+		self.gamers = synergies.enrich_gamers_with_synergies(self.gamers, self.participants)
 		for g in self.gamers:
 			decoded_bans = []
 			decoded_combos = []
 			decoded_anti_combos = []
 			for ban in g.ban_list:
 				banned = self.get_hero_from_id(ban["hero_id"])
-				ban["name"] = self.secure_name(banned["transformations"][0]["name"])
+				ban["name"] = banned["secure_name"]
 				ban["role"] = banned["role"]
 				decoded_bans.append(ban)
 			for combo in g.combo_list:
 				others = []
 				played_hero = self.get_hero_from_id(combo["player_hero"])
-				combo["player_hero_name"] = self.secure_name(played_hero["transformations"][0]["name"])
+				combo["player_hero_name"] = played_hero["secure_name"]
 				combo["player_role"] = played_hero["role"]
 				for other in combo["hero_combos"]:
 					add = self.get_hero_from_id(other)
-					others.append({"hero":self.secure_name(add["transformations"][0]["name"]),"role":add["role"]})
+					others.append({"hero":add["secure_name"],"role":add["role"]})
 
 				combo["hero_combos"] = others
 				decoded_combos.append(combo)
@@ -1406,7 +1350,7 @@ class Gamer_master():
 			for combo in g.anti_combo_list:
 				others = []
 				played_hero = self.get_hero_from_id(combo["player_hero"])
-				combo["player_hero_name"] = self.secure_name(played_hero["transformations"][0]["name"])
+				combo["player_hero_name"] = played_hero["secure_name"]
 				combo["player_role"] = played_hero["role"]
 				for other in combo["hero_combos"]:
 					others.append(other)
@@ -1524,76 +1468,147 @@ class Gamer_master():
 	            }
 	            current["lowest"].update(extra_data)
 	    
-	    # Loop over files in the folder.
-	    for filename in os.listdir(folder):
+	    def fold_night(data):
+	        """
+	        Folds one game night into the records. Returns its formatted date, so the manifest knows which night holds what.
+	        """
+	        # Format the date as dd.mm.yyyy (input date is expected as yyyy-mm-dd).
+
+	        date_parts = data.get("date", "").split('-')
+	        formatted_date = f"{date_parts[2]}.{date_parts[1]}.{date_parts[0]}" if len(date_parts) == 3 else "Unknown"
+	        
+	        # Use the AI title if available.
+	        title = self.remove_html_tags(data.get("AI_title", ""))
+	        
+	        # Extract raw KPIs.
+	        total_wins = data.get("total_wins", 0)
+	        total_losses = data.get("total_losses", 0)
+	        match_count = data.get("match_count", 1)  # Prevent division by zero.
+	        
+	        win_rate = total_wins / match_count if match_count else 0
+	        total_kills = data.get("total_kills", 0)
+	        total_assists = data.get("total_assists", 0)
+	        total_deaths = data.get("total_deaths", 1)  # Avoid division by zero.
+	        kda = (total_kills + total_assists) / total_deaths
+	        
+	        total_damage = data.get("total_damage", 0)
+	        total_healing = data.get("total_healing", 0)
+	        total_tanked = data.get("total_tanked", 0)
+	        
+	        # Additional custom metric: win-loss difference.
+	        win_loss_diff = total_wins - total_losses
+	        
+	        # Update records for the standard metrics.
+	        update_record("total_wins", total_wins, formatted_date, title)
+	        update_record("total_losses", total_losses, formatted_date, title)
+	        update_record("match_count", match_count, formatted_date, title)
+	        update_record("win_rate", win_rate, formatted_date, title)
+	        update_record("KDA", kda, formatted_date, title)
+	        update_record("total_damage", total_damage, formatted_date, title)
+	        update_record("total_healing", total_healing, formatted_date, title)
+	        update_record("total_tanked", total_tanked, formatted_date, title)
+	        update_record("win_loss_diff", win_loss_diff, formatted_date, title)
+	        
+	        # Process soloqueue: compute the solo win rate for each player.
+	        soloqueue = data.get("soloqueue", [])
+	        solo_data = {}
+	        for entry in soloqueue:
+	            player = entry.get("player")
+	            if player:
+	                if player not in solo_data:
+	                    solo_data[player] = {"wins": 0, "games": 0}
+	                solo_data[player]["games"] += 1
+	                if entry.get("win", False):
+	                    solo_data[player]["wins"] += 1
+	        
+	        # Update records for soloqueue for each player in this file.
+	        for player, stats in solo_data.items():
+	            solo_win_rate = stats["wins"] / stats["games"] if stats["games"] > 0 else 0
+	            update_record("soloqueue", solo_win_rate, formatted_date, title, extra_data={"player": player})
+	        return formatted_date
+
+	    def record_dates():
+	        return set(record["date"] for metric in records.values() for record in metric.values() if record)
+
+	    # Records from the last run carry a manifest of the nights they were built from (mtime, hash and date).
+	    # Unchanged nights are not parsed again, new or changed ones are folded into the existing records,
+	    # and we only rebuild from scratch if a night that holds a record changed or was deleted.
+	    manifest = None
+	    if os.path.exists(records_location):
+	        try:
+	            with open(records_location, 'r') as f:
+	                previous = json.load(f)
+	            if "_manifest" in previous:
+	                manifest = previous.pop("_manifest")
+	                records.update(previous)
+	        except json.JSONDecodeError:
+	            manifest = None
+
+	    nights = {}
+	    for filename in sorted(os.listdir(folder)):
 	        if filename.endswith('.json') and filename != 'happenings.json':
-	            filepath = os.path.join(folder, filename)
-	            with open(filepath, 'r') as f:
-	                try:
-	                    data = json.load(f)
-	                except json.JSONDecodeError:
-	                    print(f"Error decoding {filename}. Skipping...")
-	                    continue
-	            
-	            # Format the date as dd.mm.yyyy (input date is expected as yyyy-mm-dd).
-
-	            date_parts = data.get("date", "").split('-')
-	            formatted_date = f"{date_parts[2]}.{date_parts[1]}.{date_parts[0]}" if len(date_parts) == 3 else "Unknown"
-	            
-	            # Use the AI title if available.
-	            title = self.remove_html_tags(data.get("AI_title", ""))
-	            
-	            # Extract raw KPIs.
-	            total_wins = data.get("total_wins", 0)
-	            total_losses = data.get("total_losses", 0)
-	            match_count = data.get("match_count", 1)  # Prevent division by zero.
-	            
-	            win_rate = total_wins / match_count if match_count else 0
-	            total_kills = data.get("total_kills", 0)
-	            total_assists = data.get("total_assists", 0)
-	            total_deaths = data.get("total_deaths", 1)  # Avoid division by zero.
-	            kda = (total_kills + total_assists) / total_deaths
-	            
-	            total_damage = data.get("total_damage", 0)
-	            total_healing = data.get("total_healing", 0)
-	            total_tanked = data.get("total_tanked", 0)
-	            
-	            # Additional custom metric: win-loss difference.
-	            win_loss_diff = total_wins - total_losses
-	            
-	            # Update records for the standard metrics.
-	            update_record("total_wins", total_wins, formatted_date, title)
-	            update_record("total_losses", total_losses, formatted_date, title)
-	            update_record("match_count", match_count, formatted_date, title)
-	            update_record("win_rate", win_rate, formatted_date, title)
-	            update_record("KDA", kda, formatted_date, title)
-	            update_record("total_damage", total_damage, formatted_date, title)
-	            update_record("total_healing", total_healing, formatted_date, title)
-	            update_record("total_tanked", total_tanked, formatted_date, title)
-	            update_record("win_loss_diff", win_loss_diff, formatted_date, title)
-	            
-	            # Process soloqueue: compute the solo win rate for each player.
-	            soloqueue = data.get("soloqueue", [])
-	            solo_data = {}
-	            for entry in soloqueue:
-	                player = entry.get("player")
-	                if player:
-	                    if player not in solo_data:
-	                        solo_data[player] = {"wins": 0, "games": 0}
-	                    solo_data[player]["games"] += 1
-	                    if entry.get("win", False):
-	                        solo_data[player]["wins"] += 1
-	            
-	            # Update records for soloqueue for each player in this file.
-	            for player, stats in solo_data.items():
-	                solo_win_rate = stats["wins"] / stats["games"] if stats["games"] > 0 else 0
-	                update_record("soloqueue", solo_win_rate, formatted_date, title, extra_data={"player": player})
-	    
-	    # Save the records dictionary to a file named records.json.
-	    with open(records_location, "w") as outfile:
+	            nights[filename] = os.stat(os.path.join(folder, filename)).st_mtime_ns
+
+	    new_manifest = {}
+	    changed = {}
+	    for filename, mtime in nights.items():
+	        entry = manifest.get(filename) if manifest is not None else None
+	        if entry and entry["mtime"] == mtime:
+	            new_manifest[filename] = entry
+	            continue
+	        with open(os.path.join(folder, filename), 'rb') as f:
+	            raw = f.read()
+	        digest = hashlib.sha1(raw).hexdigest()
+	        if entry and entry["hash"] == digest:
+	            new_manifest[filename] = dict(entry, mtime=mtime)
+	            continue
+	        changed[filename] = (raw, mtime, digest)
+	    deleted = [filename for filename in manifest if filename not in nights] if manifest is not None else []
+
+	    full_rebuild = manifest is None
+	    if not full_rebuild:
+	        holders = record_dates()
+	        for filename in deleted + list(changed):
+	            if filename in manifest and manifest[filename]["date"] in holders:
+	                print(f"{filename} holds a record and changed, rebuilding all records.")
+	                full_rebuild = True
+	                break
+
+	    if full_rebuild:
+	        records = {metric: {"highest": None, "lowest": None} for metric in metrics}
+	        records["win_loss_diff"] = {"highest": None, "lowest": None}
+	        to_fold = list(nights)
+	        new_manifest = {}
+	    else:
+	        to_fold = list(changed)
+	        if not to_fold and not deleted and new_manifest == manifest:
+	            print("Records up to date.")
+	            return
+
+	    for filename in to_fold:
+	        if filename in changed:
+	            raw, mtime, digest = changed[filename]
+	        else:
+	            with open(os.path.join(folder, filename), 'rb') as f:
+	                raw = f.read()
+	            mtime = nights[filename]
+	            digest = hashlib.sha1(raw).hexdigest()
+	        try:
+	            data = json.loads(raw)
+	        except json.JSONDecodeError:
+	            print(f"Error decoding {filename}. Skipping...")
+	            new_manifest[filename] = {"mtime": mtime, "hash": digest, "date": None}
+	            continue
+	        new_manifest[filename] = {"mtime": mtime, "hash": digest, "date": fold_night(data)}
+
+	    # Save the records dictionary to a file named records.json, with the manifest for next time.
+	    records["_manifest"] = new_manifest
+	    tmp_path = records_location + ".tmp"
+	    with open(tmp_path, "w") as outfile:
 	        json.dump(records, outfile, indent=4)
+	    os.replace(tmp_path, records_location)
 	    
-	    print(f"Records saved!")
+	    print("Records saved!")
 
 	def debug(self):
 		self.set_synergies()
@@ -1629,6 +1644,5 @@ if __name__ == '__main__':
 
 	
 	g_master.initiate()
-	g_master.export_data_objects()
 	g_master.compute_kpi_records()
 	g_master.debug()
@@ -1,28 +1,64 @@
 import os
 from decouple import config
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import json
 import random
 import datetime
 import time
+import asyncio
+
+import gpt_cache
+from config import squadname, gpt_poll_interval, openai_base_url
+
+ASSISTANT_ID = "asst_Kv3GInzYub9DcnL3KczhbtpP"
+
+
+def assistant_text(messages):
+	"""
+	Returns the assistant's reply from a thread's message list.
+	"""
+	for message in messages.data:
+		if message.role == "assistant":
+			return message.content[0].text.value.strip()
+	return ""
+
+
+def parse_reply(raw_text):
+	"""
+	The JSON in an assistant reply, with any ```json fence around it stripped. Raises if it isn't valid JSON.
+	"""
+	if raw_text.startswith("```json"):
+		raw_text = raw_text.replace("```json", "").replace("```", "").strip()
+	return json.loads(raw_text.replace("—"," — "))
+
+
+def parses(response):
+	try:
+		parse_reply(response)
+		return True
+	except ValueError:
+		return False
 
-from config import squadname
 
 class GPT():
-	def __init__(self, test=True):
+	def __init__(self, test=True, use_cache=True):
 		self.test = test
+		# False skips the reply cache lookup, fresh replies still replace the cached ones
+		self.use_cache = use_cache
 		self.client = OpenAI(
-	    	api_key = config("OPENAI_API_KEY")
+	    	api_key = config("OPENAI_API_KEY"),
+	    	base_url = openai_base_url
+		)
+		# Used by process_game_nights to run many summaries at once
+		self.async_client = AsyncOpenAI(
+	    	api_key = config("OPENAI_API_KEY"),
+	    	base_url = openai_base_url
 		)
 
-	def create_game_night_summary(self, game_night_summary):
-		"""
-		Sends the formatted game night summary to OpenAI Assistant
-		and retrieves Galacta's response.
-		"""
+	def game_night_prompt(self, game_night_summary):
 		happenings = self.get_notable_happenings()
 
-		prompt = f"""
+		return f"""
 		Here is a summary of a game night, of {squadname}:
 		{game_night_summary}
 
@@ -34,37 +70,9 @@ class GPT():
 		{happenings}
 		"""
 
-		if self.test:
-			return prompt
-		else:
-			print("Sending to GPT Assistant...")
-
-			thread = self.client.beta.threads.create()
-			message = self.client.beta.threads.messages.create(
-				thread_id=thread.id,
-				role="user",
-				content=prompt
-			)
-
-			run = self.client.beta.threads.runs.create(
-				thread_id=thread.id,
-				assistant_id="asst_Kv3GInzYub9DcnL3KczhbtpP",
-			)
-
-			while run.status in ["queued", "in_progress"]:
-				time.sleep(2)
-				run = self.client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
-
-			messages = self.client.beta.threads.messages.list(thread_id=thread.id)
-			return messages
-
-	def create_personal_game_night_summary(self, personal_summary):
-		"""
-		Sends the formatted game night summary to OpenAI Assistant
-		and retrieves Galacta's response.
-		"""
+	def personal_game_night_prompt(self, personal_summary):
 		happenings = self.get_notable_happenings()
-		prompt = f"""
+		return f"""
 		Here is a personal performance for the night:
 		{personal_summary}
 
@@ -78,30 +86,99 @@ class GPT():
 		{happenings}
 		"""
 
+	def create_game_night_summary(self, game_night_summary):
+		"""
+		Sends the formatted game night summary to OpenAI Assistant
+		and retrieves Galacta's response.
+		"""
+		prompt = self.game_night_prompt(game_night_summary)
+		if self.test:
+			return prompt
+		else:
+			return self.ask_assistant(prompt, "create_game_night_summary")
 
+	def create_personal_game_night_summary(self, personal_summary):
+		"""
+		Sends the formatted game night summary to OpenAI Assistant
+		and retrieves Galacta's response.
+		"""
+		prompt = self.personal_game_night_prompt(personal_summary)
 		if self.test:
 			return prompt
 		else:
-			print("Sending to GPT Assistant...")
+			return self.ask_assistant(prompt, "create_personal_game_night_summary")
+
+	def cached(self, prompt, call_type):
+		if not self.use_cache:
+			return None
+		response = gpt_cache.get(gpt_cache.cache_key(call_type, ASSISTANT_ID, prompt))
+		if response is None:
+			return None
+		# Replies cached before we checked them can be broken, ask again and let the new reply replace it
+		if not parses(response):
+			return None
+		print("Reusing cached GPT reply.")
+		return response
+
+	def remember(self, prompt, call_type, response):
+		# An empty or unparseable reply is a failed run, ask again next time
+		if response and parses(response):
+			gpt_cache.put(gpt_cache.cache_key(call_type, ASSISTANT_ID, prompt), response)
+
+	def ask_assistant(self, prompt, call_type="ask_assistant"):
+		response = self.cached(prompt, call_type)
+		if response is not None:
+			return response
+		print("Sending to GPT Assistant...")
+
+		thread = self.client.beta.threads.create()
+		message = self.client.beta.threads.messages.create(
+			thread_id=thread.id,
+			role="user",
+			content=prompt
+		)
+
+		run = self.client.beta.threads.runs.create(
+			thread_id=thread.id,
+			assistant_id=ASSISTANT_ID,
+		)
 
-			thread = self.client.beta.threads.create()
-			message = self.client.beta.threads.messages.create(
-				thread_id=thread.id,
-				role="user",
-				content=prompt
-			)
+		while run.status in ["queued", "in_progress"]:
+			time.sleep(gpt_poll_interval)
+			run = self.client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
 
-			run = self.client.beta.threads.runs.create(
-				thread_id=thread.id,
-				assistant_id="asst_Kv3GInzYub9DcnL3KczhbtpP",
-			)
+		messages = self.client.beta.threads.messages.list(thread_id=thread.id)
+		response = assistant_text(messages)
+		self.remember(prompt, call_type, response)
+		return response
+
+	async def ask_assistant_async(self, prompt, call_type="ask_assistant"):
+		"""
+		Same as ask_assistant, but waits without blocking, so other summaries can run meanwhile.
+		"""
+		response = self.cached(prompt, call_type)
+		if response is not None:
+			return response
+		thread = await self.async_client.beta.threads.create()
+		await self.async_client.beta.threads.messages.create(
+			thread_id=thread.id,
+			role="user",
+			content=prompt
+		)
+
+		run = await self.async_client.beta.threads.runs.create(
+			thread_id=thread.id,
+			assistant_id=ASSISTANT_ID,
+		)
 
-			while run.status in ["queued", "in_progress"]:
-				time.sleep(2)
-				run = self.client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+		while run.status in ["queued", "in_progress"]:
+			await asyncio.sleep(gpt_poll_interval)
+			run = await self.async_client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
 
-			messages = self.client.beta.threads.messages.list(thread_id=thread.id)
-			return messages
+		messages = await self.async_client.beta.threads.messages.list(thread_id=thread.id)
+		response = assistant_text(messages)
+		self.remember(prompt, call_type, response)
+		return response
 
 	def get_notable_happenings(self):
 		# If you want the AI to reference fun stuff about the squad, add them to a json file referenced here:
@@ -118,4 +195,4 @@ class GPT():
 			for happening in notable:
 				returnstr += f"- **{happening["title"]}** ({happening["date"]}) : {happening["event"]}\r\n"
 			returnstr += "\r\n"
-			return returnstr
\ No newline at end of file
+			return returnstr
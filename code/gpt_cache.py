@@ -0,0 +1,71 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from config import cache_dir, gpt_cache_entries
+
+# On-disk cache of assistant replies. The key is a hash of the call type, the assistant id and the full prompt,
+# so re-running a night whose stats (and happenings) did not change gets the same reply back without asking again.
+# Holds at most gpt_cache_entries replies, the least recently used ones are dropped first.
+CACHE_FILE = os.path.join(cache_dir, "gpt_responses.json")
+
+_entries = None
+_dirty = False
+_lock = threading.Lock()
+
+
+def cache_key(call_type, assistant_id, prompt):
+	return hashlib.sha256(f"{call_type}\n{assistant_id}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def _load():
+	global _entries
+	if _entries is None:
+		_entries = {}
+		if os.path.exists(CACHE_FILE):
+			try:
+				with open(CACHE_FILE, 'r', encoding="utf-8") as f:
+					_entries = json.load(f)
+			except json.JSONDecodeError:
+				_entries = {}
+	return _entries
+
+
+def _save():
+	global _dirty
+	_dirty = False
+	os.makedirs(cache_dir, exist_ok=True)
+	tmp_path = CACHE_FILE + ".tmp"
+	with open(tmp_path, "w", encoding="utf-8") as f:
+		json.dump(_entries, f)
+	os.replace(tmp_path, CACHE_FILE)
+
+
+def get(key):
+	global _dirty
+	with _lock:
+		entry = _load().get(key)
+		if entry is None:
+			return None
+		# Written out by the next put, or by flush()
+		entry["used"] = time.time()
+		_dirty = True
+		return entry["response"]
+
+
+def put(key, response, max_entries=gpt_cache_entries):
+	with _lock:
+		entries = _load()
+		entries[key] = {"response": response, "used": time.time()}
+		if len(entries) > max_entries:
+			for old_key in sorted(entries, key=lambda k: entries[k]["used"])[:len(entries) - max_entries]:
+				del entries[old_key]
+		_save()
+
+
+def flush():
+	with _lock:
+		if _dirty:
+			_save()
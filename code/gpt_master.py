@@ -2,12 +2,15 @@ import os
 import json
 import sys
 import re
+import time
+import asyncio
 
-from gpt import GPT
+import gpt_cache
+from gpt import GPT, parse_reply
 from collections import defaultdict
 from datetime import datetime
 
-from config import player_max_score, hero_max_score, squadname, ai_enabled
+from config import player_max_score, hero_max_score, squadname, ai_enabled, gpt_concurrency
 
 
 
@@ -86,6 +89,8 @@ def format_game_night_summary(game_night_data,records_location="records.json"):
 	if records != "":
 		formatted_records = f"\r\n(for context) Highest and lowest achieved metrics by {squadname}:\r\n"
 		for key,value in records.items():
+			if key == "_manifest": # Bookkeeping for compute_kpi_records, not a record
+				continue
 			formatted_records += f"\r\n- {key} : {value}"
 	records = formatted_records
 	"""
@@ -289,28 +294,132 @@ def extract_json_from_response(response):
 	Parses the JSON content from the AI response.
 	"""
 	try:
-		# Extract message content
-		messages = response.data  # Extract list of messages from response object
-		for message in messages:
-			if message.role == "assistant":
-				raw_text = message.content[0].text.value.strip()
-				if raw_text.startswith("```json"):
-					raw_text = raw_text.replace("```json", "").replace("```", "").strip()
-				return json.loads(raw_text.replace("—"," — "))
+		if isinstance(response, str):
+			# GPT already picked out the assistant's reply
+			messages = [response]
+		else:
+			messages = [message.content[0].text.value.strip() for message in response.data if message.role == "assistant"]  # Extract list of messages from response object
+		for raw_text in messages:
+			return parse_reply(raw_text)
 	except Exception as e:
 		print(f"❌ Failed to parse AI response: {e}")
 		return {"title": "Unknown Game Night", "content": "AI response could not be processed."}
 
-def process_game_nights(game_night_folder="./game_nights/", records_location="records.json",test=False, force_personal=False, force_general=False, only_this=False):
+def apply_general_summary(game_night_data, parsed_response):
+	game_night_data["AI_title"] = parsed_response.get("title", "")
+	if game_night_data["AI_title"] == "":
+		game_night_data["AI_title"] = parsed_response.get("wtf", "This went bad, Butler is giving you all the content so bro can bugfix: "+str(parsed_response))
+	game_night_data["AI_summary"] = parsed_response.get("content", "")
+	if game_night_data["AI_summary"] == "":
+		game_night_data["AI_summary"] = parsed_response.get("verdict", "This went bad, Butler is giving you all the content so bro can bugfix: "+str(parsed_response))
+	game_night_data["AI_enhanced"] = True  # Mark file as enhanced
+
+def personal_summary_entry(player, parsed_response):
+	content = parsed_response.get("content", "")
+	if content == "":
+		content = parsed_response.get("verdict", "")
+
+	if content == "":
+		print("ERROR BROTHER!!")
+		print(parsed_response)
+
+	return {
+		"nickname": player["nickname"],
+		"title": parsed_response.get("title", "AI did not return a title."),
+		"content": content
+	}
+
+def game_night_files(game_night_folder, only_this=False):
+	filenames = []
+	for filename in os.listdir(game_night_folder):
+		if filename.endswith(".json") and not filename == "happenings.json":
+			if only_this and filename != only_this:
+				continue
+			filenames.append(filename)
+	return filenames
+
+async def process_game_nights_async(gpt, game_night_folder="./game_nights/", records_location="records.json", force_personal=False, force_general=False, only_this=False, concurrency=gpt_concurrency):
+	"""
+	Sends every missing general and personal summary at once, at most `concurrency` running at the same time.
+	Each game night file is written as soon as all of its own summaries are back.
+	"""
+	semaphore = asyncio.Semaphore(concurrency)
+	start = time.monotonic()
+
+	async def ask(prompt, call_type):
+		async with semaphore:
+			try:
+				return await gpt.ask_assistant_async(prompt, call_type)
+			except Exception as e:
+				print(f"❌ AI call failed: {e}")
+				return None
+
+	async def process_night(filename):
+		file_path = os.path.join(game_night_folder, filename)
+		with open(file_path, "r", encoding="utf-8") as f:
+			game_night_data = json.load(f)
+
+		general = None
+		if not game_night_data.get("AI_enhanced") or force_general:
+			print(f"🚀 Enhancing {filename} with AI insights...")
+			game_night_summary = format_game_night_summary(game_night_data,records_location=records_location)
+			general = asyncio.ensure_future(ask(gpt.game_night_prompt(game_night_summary), "create_game_night_summary"))
+
+		personal = None
+		if not game_night_data.get("AI_personal_summaries") or force_personal:
+			print(f"🚀 Generating AI summaries for players in {filename}...")
+			personal = []
+			for player in game_night_data["players"]:
+				personal_summary_prompt = format_personal_summary(player, game_night_data["date"])
+				personal.append((player, asyncio.ensure_future(ask(gpt.personal_game_night_prompt(personal_summary_prompt), "create_personal_game_night_summary"))))
+
+		if general is None and personal is None:
+			return 0
+
+		calls = [general] if general is not None else []
+		calls += [task for player, task in personal or []]
+		responses = await asyncio.gather(*calls)
+		if None in responses:
+			# Leave the file as it was, it is picked up again next run
+			print(f"❌ {filename} not updated, some AI calls failed.")
+			return len(calls)
+
+		if general is not None:
+			apply_general_summary(game_night_data, extract_json_from_response(general.result()))
+			print(f"✅ {filename} now has a general AI summary!")
+		if personal is not None:
+			game_night_data["personal_AI_summaries"] = [personal_summary_entry(player, extract_json_from_response(task.result())) for player, task in personal]
+			game_night_data["AI_personal_summaries"] = True
+			print(f"✅ {filename} now has personal AI summaries!")
+
+		tmp_path = file_path + ".tmp"
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump(game_night_data, f, indent=4)
+		os.replace(tmp_path, file_path)
+		print(f"✅ {filename} fully processed!\n")
+		return len(calls)
+
+	filenames = game_night_files(game_night_folder, only_this)
+	calls = await asyncio.gather(*[process_night(filename) for filename in filenames])
+	if sum(calls):
+		print(f"{sum(calls)} AI summaries in {time.monotonic() - start:.1f}s, {concurrency} at a time.")
+	return sum(calls)
+
+def process_game_nights(game_night_folder="./game_nights/", records_location="records.json",test=False, force_personal=False, force_general=False, only_this=False, use_cache=True):
 	"""
 	Loops through all game night JSON files and enhances them with AI insights
 	if they haven't already been processed.
+	use_cache=False asks the AI again even when an identical prompt was answered before.
 	"""
 
-	gpt = GPT(test=test)  # Set to True for testing, False for real AI calls
+	gpt = GPT(test=test, use_cache=use_cache)  # Set to True for testing, False for real AI calls
 	# Loop through all game night JSON files
 	if not test and ai_enabled:
 		get_latest_tts()
+		# Real AI calls run concurrently
+		asyncio.run(process_game_nights_async(gpt, game_night_folder, records_location, force_personal, force_general, only_this))
+		gpt_cache.flush()
+		return
 	for filename in os.listdir(game_night_folder):
 		if filename.endswith(".json") and not filename == "happenings.json":
 			if only_this:
@@ -459,6 +568,7 @@ if __name__ == '__main__':
 	if len(sys.argv) > 1:
 		game_night_folder="./game_nights/"
 		records_location="records.json"
+		use_cache = True
 
 		for arg in sys.argv:
 			if arg == "--bronze":
@@ -467,10 +577,13 @@ if __name__ == '__main__':
 				game_night_folder="./game_nights_bronze/"
 			if arg == "--test":
 				test = True
+			if arg == "--no-cache":
+				# Regenerate for real, instead of reusing the replies to identical prompts
+				use_cache = False
 
 		print(f"Trying to force update on {sys.argv[1]}")
 		# False means go, actually. If True is passed as param, that means test = True
-		process_game_nights(game_night_folder=game_night_folder, records_location=records_location, test=test, force_personal=True, force_general=True, only_this=sys.argv[1])
+		process_game_nights(game_night_folder=game_night_folder, records_location=records_location, test=test, force_personal=True, force_general=True, only_this=sys.argv[1], use_cache=use_cache)
 	else:
 		# False means go, actually. If True is passed as param, that means test = True
 		process_game_nights(test=test, force_personal=False, force_general=False, only_this=False)
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import time
+import uuid
+import asyncio
+from aiohttp import web
+
+from config import Bcol
+
+# Local stand-in for the OpenAI assistants API (threads, messages and runs), so the AI summaries can be
+# exercised and benchmarked without a key or a bill. Runs "complete" after a fixed latency.
+#
+#   python gpt_stub.py --serve                  (listens on 127.0.0.1:8765, set OPENAI_BASE_URL=http://127.0.0.1:8765/v1)
+#   python gpt_stub.py --benchmark              (runs 24 prompts through GPT.ask_assistant_async at a few concurrency levels)
+HOST = "127.0.0.1"
+PORT = 8765
+RUN_LATENCY = 1.0
+
+bcol = Bcol()
+
+
+class AssistantStub():
+
+	def __init__(self, latency=RUN_LATENCY):
+		self.latency = latency
+		self.threads = {}
+		self.runs = {}
+		self.requests = 0
+
+	def message(self, thread_id, role, text):
+		return {
+			"id": "msg_"+uuid.uuid4().hex, "object": "thread.message", "created_at": int(time.time()),
+			"thread_id": thread_id, "role": role, "status": "completed", "attachments": [], "metadata": {},
+			"content": [{"type": "text", "text": {"value": text, "annotations": []}}]
+		}
+
+	def run(self, run_id):
+		run = self.runs[run_id]
+		elapsed = time.monotonic() - run["started"]
+		status = "queued" if elapsed < self.latency / 4 else "in_progress" if elapsed < self.latency else "completed"
+		if status == "completed" and not run["answered"]:
+			run["answered"] = True
+			reply = json.dumps({"title": "Stub verdict", "content": f"Reply to a {run['prompt_length']} character prompt."})
+			self.threads[run["thread_id"]].append(self.message(run["thread_id"], "assistant", reply))
+		return {
+			"id": run_id, "object": "thread.run", "created_at": int(time.time()), "thread_id": run["thread_id"],
+			"assistant_id": run["assistant_id"], "status": status, "model": "stub", "instructions": "",
+			"tools": [], "metadata": {}, "parallel_tool_calls": True
+		}
+
+	@web.middleware
+	async def count(self, request, handler):
+		self.requests += 1
+		return await handler(request)
+
+	async def create_thread(self, request):
+		thread_id = "thread_"+uuid.uuid4().hex
+		self.threads[thread_id] = []
+		return web.json_response({"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}})
+
+	async def create_message(self, request):
+		thread_id = request.match_info["thread_id"]
+		body = await request.json()
+		message = self.message(thread_id, body.get("role", "user"), body.get("content", ""))
+		self.threads[thread_id].append(message)
+		return web.json_response(message)
+
+	async def create_run(self, request):
+		thread_id = request.match_info["thread_id"]
+		body = await request.json()
+		prompt = self.threads[thread_id][-1]["content"][0]["text"]["value"] if self.threads[thread_id] else ""
+		run_id = "run_"+uuid.uuid4().hex
+		self.runs[run_id] = {
+			"thread_id": thread_id, "assistant_id": body.get("assistant_id"), "started": time.monotonic(),
+			"prompt_length": len(prompt), "answered": False
+		}
+		return web.json_response(self.run(run_id))
+
+	async def retrieve_run(self, request):
+		return web.json_response(self.run(request.match_info["run_id"]))
+
+	async def list_messages(self, request):
+		# Newest first, like the real API
+		messages = list(reversed(self.threads[request.match_info["thread_id"]]))
+		return web.json_response({"object": "list", "data": messages, "has_more": False})
+
+	def app(self):
+		app = web.Application(middlewares=[self.count])
+		app.router.add_post("/v1/threads", self.create_thread)
+		app.router.add_post("/v1/threads/{thread_id}/messages", self.create_message)
+		app.router.add_get("/v1/threads/{thread_id}/messages", self.list_messages)
+		app.router.add_post("/v1/threads/{thread_id}/runs", self.create_run)
+		app.router.add_get("/v1/threads/{thread_id}/runs/{run_id}", self.retrieve_run)
+		return app
+
+
+async def start_stub(stub, host=HOST, port=PORT):
+	runner = web.AppRunner(stub.app())
+	await runner.setup()
+	await web.TCPSite(runner, host, port).start()
+	return runner
+
+
+async def benchmark(prompts=24, levels=(1, 4, 8)):
+	os.environ.setdefault("OPENAI_API_KEY", "stub")
+	import gpt
+	import gpt_cache
+	gpt.openai_base_url = f"http://{HOST}:{PORT}/v1"
+	gpt.gpt_poll_interval = RUN_LATENCY / 4
+	# Every level has to really ask, and stub replies must not end up in the real reply cache
+	cache_dir = tempfile.mkdtemp()
+	gpt_cache.CACHE_FILE = os.path.join(cache_dir, "gpt_responses.json")
+	gpt_cache._entries = None
+
+	stub = AssistantStub()
+	runner = await start_stub(stub)
+	client = gpt.GPT(test=False, use_cache=False)
+	print(f"{bcol.HEADER}{prompts} prompts, runs take {RUN_LATENCY}s{bcol.ENDC}")
+	try:
+		for concurrency in levels:
+			semaphore = asyncio.Semaphore(concurrency)
+			async def ask(i):
+				async with semaphore:
+					return await client.ask_assistant_async(f"prompt {i}")
+			start = time.monotonic()
+			replies = await asyncio.gather(*[ask(i) for i in range(prompts)])
+			elapsed = time.monotonic() - start
+			assert all(json.loads(reply)["title"] for reply in replies)
+			print(f"concurrency {concurrency:<3} {elapsed:>6.1f}s")
+	finally:
+		await runner.cleanup()
+		shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+async def serve():
+	await start_stub(AssistantStub())
+	print(f"GPT stub listening on http://{HOST}:{PORT}/v1")
+	while True:
+		await asyncio.sleep(3600)
+
+
+if __name__ == '__main__':
+	for arg in sys.argv:
+		if arg == "--serve":
+			asyncio.run(serve())
+		if arg == "--benchmark":
+			asyncio.run(benchmark())
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import asyncio
+import aiohttp
+
+import api_client
+from config import base_image_api, asset_download_concurrency, Bcol
+
+# Incremental hero asset sync. Every avatar, icon, lord and costume image we expect is listed from heroes.json,
+# the image folder is scanned once, and everything is fetched concurrently (bounded by asset_download_concurrency).
+# ETag / Last-Modified of every file is kept in a manifest, so files we already have are revalidated with
+# conditional requests, and only re-downloaded when the server says they changed.
+HERO_IMAGE_DIR = "../img/heroes/"
+MANIFEST_FILE = "hero_assets.json"
+
+bcol = Bcol()
+
+
+def expected_assets(heroes):
+	"""
+	Returns [(filename, url, label)] for every image a hero should have.
+	"""
+	assets = []
+	for hero in heroes:
+		h_id = str(hero["id"])
+		name = hero["name"]
+		assets.append((f"{h_id}.png", base_image_api+hero["imageUrl"], f"default {name} avatar"))
+		assets.append((f"{h_id}_icon.webp", base_image_api+"/rivals"+hero["transformations"][0]["icon"], f"secondary {name} avatar"))
+		if not len(hero["transformations"]) > 1:
+			assets.append((f"{h_id}_lord.png", base_image_api+f"/rivals/lord/{h_id}_lord.png", f"{name} lord avatar"))
+		else:
+			for n in range(len(hero["transformations"])):
+				count = str(n+1)
+				assets.append((f"{h_id}_{count}_lord.png", base_image_api+f"/rivals/lord/{h_id}_{count}_lord.png", f"{name} lord {count} avatar"))
+		for costume_count, costume in enumerate(hero["costumes"]):
+			assets.append((f"{h_id}_costume_{costume_count}.png", base_image_api+"/rivals{}".format(costume["icon"]), f"{name} costume {costume_count}"))
+	return assets
+
+
+def load_manifest(filepath=MANIFEST_FILE):
+	if os.path.exists(filepath):
+		with open(filepath, 'r') as f:
+			return json.load(f)
+	return {}
+
+
+def save_manifest(manifest, filepath=MANIFEST_FILE):
+	tmp_path = filepath + ".tmp"
+	with open(tmp_path, "w") as f:
+		json.dump(manifest, f, indent=1, sort_keys=True)
+	os.replace(tmp_path, filepath)
+
+
+def http_date(timestamp):
+	return time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(timestamp))
+
+
+class AssetSync():
+
+	def __init__(self, manifest, existing, image_dir=HERO_IMAGE_DIR, concurrency=asset_download_concurrency):
+		self.manifest = manifest
+		self.existing = existing
+		self.image_dir = image_dir
+		self.semaphore = asyncio.Semaphore(concurrency)
+		self.downloaded = 0
+		self.unchanged = 0
+		self.failed = 0
+		self.bytes = 0
+
+	def conditional_headers(self, filename):
+		if filename not in self.existing:
+			return {}
+		entry = self.manifest.get(filename, {})
+		request_headers = {}
+		if entry.get("etag"):
+			request_headers["If-None-Match"] = entry["etag"]
+		if entry.get("last_modified"):
+			request_headers["If-Modified-Since"] = entry["last_modified"]
+		elif not request_headers:
+			# Files from before the manifest existed, our own copy is as new as its mtime
+			request_headers["If-Modified-Since"] = http_date(self.existing[filename])
+		return request_headers
+
+	async def sync(self, filename, url, label):
+		# The image host doesn't want the API key, just the conditions
+		request_headers = self.conditional_headers(filename)
+		try:
+			status, body, response_headers = await api_client.get_async(url, request_headers=request_headers, timeout=60,
+				throttle=lambda: self.semaphore)
+		except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+			self.failed += 1
+			print(f"{bcol.WARNING}!! WARNING: {label} not collected: {e}{bcol.ENDC}")
+			return
+		if status == 304:
+			self.unchanged += 1
+			return
+		if status != 200:
+			self.failed += 1
+			print(f"{bcol.WARNING}!! WARNING: {label} not collected, {status} returned ({url}){bcol.ENDC}")
+			return
+		etag = response_headers.get("ETag")
+		last_modified = response_headers.get("Last-Modified")
+		path = os.path.join(self.image_dir, filename)
+		if filename in self.existing and os.path.getsize(path) == len(body):
+			with open(path, "rb") as f:
+				same = f.read() == body
+		else:
+			same = False
+		if same:
+			self.unchanged += 1
+		else:
+			tmp_path = path + ".tmp"
+			with open(tmp_path, "wb") as outfile:
+				outfile.write(body)
+			os.replace(tmp_path, path)
+			self.downloaded += 1
+			self.bytes += len(body)
+			print(f"{bcol.OKBLUE}Collected {label} ({filename}).{bcol.ENDC}")
+		self.manifest[filename] = {"url": url, "etag": etag, "last_modified": last_modified}
+
+	def report(self, elapsed):
+		print(f"{bcol.HEADER}Hero assets: {self.downloaded} downloaded ({self.bytes / 1024:.0f} KB), {self.unchanged} unchanged, "
+			f"{self.failed} failed in {elapsed:.1f}s.{bcol.ENDC}")
+
+
+async def sync_hero_assets_async(heroes, image_dir=HERO_IMAGE_DIR, manifest_file=MANIFEST_FILE):
+	start = time.monotonic()
+	os.makedirs(image_dir, exist_ok=True)
+	# One scan of the folder instead of an exists() per file
+	existing = {entry.name: entry.stat().st_mtime for entry in os.scandir(image_dir) if entry.is_file()}
+	manifest = load_manifest(manifest_file)
+	assets = expected_assets(heroes)
+	print(f"Syncing {len(assets)} hero assets ({len(existing)} already on disk)...")
+	syncer = AssetSync(manifest, existing, image_dir=image_dir)
+	await asyncio.gather(*[syncer.sync(filename, url, label) for filename, url, label in assets])
+	save_manifest(manifest, manifest_file)
+	syncer.report(time.monotonic() - start)
+	return syncer
+
+
+def sync_hero_assets(heroes_file="heroes.json", image_dir=HERO_IMAGE_DIR, manifest_file=MANIFEST_FILE):
+	if not os.path.exists(heroes_file):
+		print(f"{bcol.FAIL}{heroes_file} not found, nothing to sync. Run async_broker.py --heroes.{bcol.ENDC}")
+		return None
+	with open(heroes_file, 'r') as f:
+		heroes = json.load(f)
+	return asyncio.run(sync_hero_assets_async(heroes, image_dir=image_dir, manifest_file=manifest_file))
+
+
+if __name__ == '__main__':
+	sync_hero_assets()
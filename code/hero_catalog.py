@@ -0,0 +1,61 @@
+import os
+import json
+import threading
+
+from config import Bcol
+
+# Process-wide hero catalog. heroes.json is parsed once and kept in memory keyed by
+# integer hero id. It is only re-read when the file's mtime changes (i.e. after async_broker.py --heroes).
+HEROES_FILE = "heroes.json"
+
+_catalog = {}
+_catalog_mtime = None
+_lock = threading.Lock()
+
+
+def secure_name(name):
+	if name == "Dagger":
+		return "Cloak & Dagger"
+	if name == "Bruce Banner":
+		return "Hulk"
+	return name
+
+
+def _build_entry(hero):
+	"""
+	Resolves the id and display name up front. name, role and difficulty come straight from the API object,
+	which is kept as-is, so transformations, costumes etc. are still available.
+	"""
+	entry = dict(hero)
+	entry["id"] = int(hero["id"])
+	entry["secure_name"] = secure_name(hero["transformations"][0]["name"])
+	return entry
+
+
+def load_catalog(filepath=HEROES_FILE):
+	global _catalog, _catalog_mtime
+	with _lock:
+		try:
+			mtime = os.stat(filepath).st_mtime_ns
+		except FileNotFoundError:
+			_catalog = {}
+			_catalog_mtime = None
+			return _catalog
+		if mtime != _catalog_mtime:
+			with open(filepath, 'r') as f:
+				heroes = json.load(f)
+			_catalog = {int(hero["id"]): _build_entry(hero) for hero in heroes}
+			_catalog_mtime = mtime
+		return _catalog
+
+
+def get_hero(h_id, filepath=HEROES_FILE):
+	bcol = Bcol()
+	hero = load_catalog(filepath).get(int(h_id))
+	if not hero:
+		exit(f"{bcol.FAIL}Hero {h_id} is not present in {filepath}. Try to run broker with --heroes param. If it still fails, maybe it is a new season, and you need to wait for the hero to be added?{bcol.ENDC}")
+	return hero
+
+
+def all_heroes(filepath=HEROES_FILE):
+	return list(load_catalog(filepath).values())
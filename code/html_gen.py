@@ -5,15 +5,52 @@ import re
 import math
 import random
 import sys 
+import time
+import shutil
+import hashlib
+import tempfile
+import tracemalloc
 from datetime import datetime
 
 from gamer_master import Gamer_master
 import gpt_master
+import fragment_cache
 
-from config import gamer_card_hero_count, rank_history_count, squadname, gamerlist, gamerlist_bronze, ai_enabled
+from config import site_data_folder, gamer_card_hero_count, rank_history_count, squadname, gamerlist, gamerlist_bronze, ai_enabled
 from config import rank_chart_break_points, rank_chart_break_points_colors, rank_chart_break_points_names, display_chart_rank_names
 
 
+class SiteWriter():
+  """
+  Streams the page to a temp file next to the target, and swaps it into place when everything is written.
+  The sections yield their html piece by piece, so the whole page is never held in memory,
+  and a crash halfway through leaves the previous page up.
+  """
+
+  def __init__(self, path, buffer_size=256*1024):
+    self.path = path
+    self.tmp_path = path + ".tmp"
+    self.buffer_size = buffer_size
+    self.bytes = 0
+
+  def __enter__(self):
+    self.file = open(self.tmp_path, "w", encoding="utf-8", buffering=self.buffer_size)
+    return self
+
+  def write(self, fragments):
+    for fragment in fragments:
+      self.file.write(fragment)
+      self.bytes += len(fragment)
+
+  def __exit__(self, exc_type, exc, tb):
+    self.file.close()
+    if exc_type is None:
+      os.replace(self.tmp_path, self.path)
+    else:
+      os.remove(self.tmp_path)
+    return False
+
+
 def remove_html_tags(text):
     clean = re.compile(r'<[^>]+>')
     return re.sub(clean, '', text)
@@ -112,7 +149,7 @@ def format_text(g_master,text):
   return colored_text.replace("\\n","<br>")
 
 def generate_top(g_master):
-  ret =f"""
+  yield f"""
 <!doctype html>
 <html lang="en">
   <head>
@@ -130,13 +167,13 @@ def generate_top(g_master):
     <link href="./custom.css?v=1" rel="stylesheet">
     <style>"""
   for gamer in g_master.gamers:
-    ret +=""".text-color-{} {{
+    yield """.text-color-{} {{
         color: rgb({},{},{});
         background-color: rgba({}, {}, {}, 0.3);
         padding: 1px 8px;
         border-radius: 15px;
       }}""".format(gamer.nickname_safe,gamer.color_light_r,gamer.color_light_g,gamer.color_light_b,gamer.color_dark_r,gamer.color_dark_g,gamer.color_dark_b)
-  ret +="""
+  yield """
     </style>
 
     <script src="./dist/js/jquery-3.6.3.min.js"></script>
@@ -155,7 +192,6 @@ def generate_top(g_master):
 """
   #<img src="./img/full_logo_s4.png">
 
-  return ret
 
 def generate_progress_bar(value, title, g):
 
@@ -208,26 +244,61 @@ def generate_progress_bar(value, title, g):
     </style>
     """
 
-def generate_gamer_cards(g_master):
+def generate_gamer_cards(g_master, page):
   global_min_score, global_max_score = get_global_score_range(g_master.gamers)
   globalMinSR, globalMaxSR = get_global_sr_range(g_master.gamers)
-  html = f"""<div class='container mt-4'><img src="img/mainlogo.png" id="banner"><h2 class='gradient-header'>Performance Overview <img src="img/Galacta.webp" id="galacta"></h2>
+  yield f"""<div class='container mt-4'><img src="img/mainlogo.png" id="banner"><h2 class='gradient-header'>Performance Overview <img src="img/Galacta.webp" id="galacta"></h2>
   <script>
   var globalMinScore = {global_min_score};
   var globalMaxScore = {global_max_score};</script>"""
   for g in g_master.gamers:
-    g.set_rank_and_sr()
-    gamer_sr = g.sr
-    top = g.top_heroes[0]
+    card = gamer_card_context(g, g_master, globalMinSR, globalMaxSR)
+    yield fragment_cache.render(page, "gamer_card", g.nickname_safe, render_gamer_card, card)
+
+def gamer_card_context(g, g_master, global_min_sr, global_max_sr):
+  """
+  Everything a gamer card shows, as plain data. The card is only rendered again when this changes.
+  """
+  g.set_rank_and_sr()
+  rank_history_size = min(len(g.match_data), rank_history_count)
+  labels = []
+  datapoints = []
+  for n in range(rank_history_size):
+    labels.append("'"+g_master.convert_timestamp_to_date(g.match_data[n]["extended_data"]["match_time_stamp"])+"',")
+    datapoints.append(str(int(g.match_data[n]["extended_data"]["match_player"]["score_info"]["new_score"]))+",")
+  return {
+    "nickname_safe": g.nickname_safe,
+    "color_light": [g.color_light_r, g.color_light_g, g.color_light_b],
+    "color_dark": [g.color_dark_r, g.color_dark_g, g.color_dark_b],
+    "icon_id": g.data["player"]["icon"]["player_icon_id"],
+    "top_heroes": [{"hero_id": hero["hero_id"], "role": hero["role"], "match_scores": hero["match_scores"]} for hero in g.top_heroes[:gamer_card_hero_count]],
+    "rank": g.rank,
+    "sr": g.sr,
+    "stack_score": g.match_scores["score"],
+    "progress_bar": generate_progress_bar(g.sr, g.full_rank, g),
+    "styled_feedback": g.get_styled_feedback(),
+    "labels": "".join(labels),
+    "datapoints": "".join(datapoints),
+    "global_min_sr": global_min_sr,
+    "global_max_sr": global_max_sr,
+    "rank_annotations": get_rank_breakpoint_annotations(global_min_sr, global_max_sr)
+  }
+
+def render_gamer_card(card):
+    nick = card["nickname_safe"]
+    light_r, light_g, light_b = card["color_light"]
+    dark_r, dark_g, dark_b = card["color_dark"]
+    top_heroes = card["top_heroes"]
+    top = top_heroes[0]
 #        <div class="col-4 d-flex flex-column justify-content-end">
 #                <img src="img/heroes/{top["hero_id"]}_costume_0.png" class="top_hero_costume">
 #        </div>
-    html = html + f"""<div class="profile_card p-3" 
-                    style="background: radial-gradient(circle at top right, rgba({g.color_light_r}, {g.color_light_g}, {g.color_light_b}, 0.8), rgba(255, 0, 150, 0) 65%);">
+    yield f"""<div class="profile_card p-3" 
+                    style="background: radial-gradient(circle at top right, rgba({light_r}, {light_g}, {light_b}, 0.8), rgba(255, 0, 150, 0) 65%);">
                     <div class="row">
                         <div class="col-7">
                             <div class="row d-flex justify-content-between">"""
-    hero_count = len(g.top_heroes)
+    hero_count = len(top_heroes)
     if hero_count > gamer_card_hero_count:
       hero_count = gamer_card_hero_count
     col_size = int(12 / hero_count)
@@ -236,52 +307,52 @@ def generate_gamer_cards(g_master):
       active_class = "non_active_hero"
       if not active_set:
         active_class = "active_hero"
-      html = html+f"""<div class="col-{col_size} {active_class} d-flex justify-content-center {g.nickname_safe}_{g.top_heroes[n]["hero_id"]}_card">
-           <img src="img/heroes/{g.top_heroes[n]["hero_id"]}.png" class="hero_vertical img-fluid">
-           </div><script type="text/javascript">var {g.nickname_safe}_{g.top_heroes[n]["hero_id"]}_card = {json.dumps(g.top_heroes[n]["match_scores"])}</script>"""
+      yield f"""<div class="col-{col_size} {active_class} d-flex justify-content-center {nick}_{top_heroes[n]["hero_id"]}_card">
+           <img src="img/heroes/{top_heroes[n]["hero_id"]}.png" class="hero_vertical img-fluid">
+           </div>"""
       active_set = True
     contributions = ""
     if top["role"] == "Vanguard":
       contributions += f"""<tr>
-                            <td id="{g.nickname_safe}_contribution1">Tanking</td>
-                            <td id="{g.nickname_safe}_overall_c1">{int(top["match_scores"]["derived_stats"]["tanking_per_minute"])}</td>
-                            <td id="{g.nickname_safe}_c1_rating">{top["match_scores"]["final_ratings"]["tanking_per_minute"]["html"]}</td>
+                            <td id="{nick}_contribution1">Tanking</td>
+                            <td id="{nick}_overall_c1">{int(top["match_scores"]["derived_stats"]["tanking_per_minute"])}</td>
+                            <td id="{nick}_c1_rating">{top["match_scores"]["final_ratings"]["tanking_per_minute"]["html"]}</td>
                           </tr>
                           <tr>
-                            <td id="{g.nickname_safe}_contribution2">Damage</td>
-                            <td id="{g.nickname_safe}_overall_c2">{int(top["match_scores"]["derived_stats"]["damage_per_minute"])}</td>
-                            <td id="{g.nickname_safe}_c2_rating">{top["match_scores"]["final_ratings"]["damage_per_minute"]["html"]}</td>
+                            <td id="{nick}_contribution2">Damage</td>
+                            <td id="{nick}_overall_c2">{int(top["match_scores"]["derived_stats"]["damage_per_minute"])}</td>
+                            <td id="{nick}_c2_rating">{top["match_scores"]["final_ratings"]["damage_per_minute"]["html"]}</td>
                           </tr>
-                          <tr><td colspan="3" class="hero_chart"><canvas id="{g.nickname_safe}_hero_chart"></canvas></td></tr>
+                          <tr><td colspan="3" class="hero_chart"><canvas id="{nick}_hero_chart"></canvas></td></tr>
                           """
     elif top["role"] == "Duelist":
       contributions += f"""<tr>
-                            <td id="{g.nickname_safe}_contribution1">Damage</td>
-                            <td id="{g.nickname_safe}_overall_c1">{int(top["match_scores"]["derived_stats"]["damage_per_minute"])}</td>
-                            <td id="{g.nickname_safe}_c1_rating">{top["match_scores"]["final_ratings"]["damage_per_minute"]["html"]}</td>
+                            <td id="{nick}_contribution1">Damage</td>
+                            <td id="{nick}_overall_c1">{int(top["match_scores"]["derived_stats"]["damage_per_minute"])}</td>
+                            <td id="{nick}_c1_rating">{top["match_scores"]["final_ratings"]["damage_per_minute"]["html"]}</td>
                           </tr>
                           <tr>
-                            <td id="{g.nickname_safe}_contribution2">Kills</td>
-                            <td id="{g.nickname_safe}_overall_c2">{round(top["match_scores"]["derived_stats"]["kills_per_minute"],2)}</td>
-                            <td id="{g.nickname_safe}_c2_rating">{top["match_scores"]["final_ratings"]["kills_per_minute"]["html"]}</td>
+                            <td id="{nick}_contribution2">Kills</td>
+                            <td id="{nick}_overall_c2">{round(top["match_scores"]["derived_stats"]["kills_per_minute"],2)}</td>
+                            <td id="{nick}_c2_rating">{top["match_scores"]["final_ratings"]["kills_per_minute"]["html"]}</td>
                           </tr>
-                          <tr><td colspan="3" class="hero_chart"><canvas id="{g.nickname_safe}_hero_chart"></canvas></td></tr>
+                          <tr><td colspan="3" class="hero_chart"><canvas id="{nick}_hero_chart"></canvas></td></tr>
                           """
     else:
       contributions += f"""<tr>
-                            <td id="{g.nickname_safe}_contribution1">Healing</td>
-                            <td id="{g.nickname_safe}_overall_c1">{int(top["match_scores"]["derived_stats"]["healing_per_minute"])}</td>
-                            <td id="{g.nickname_safe}_c1_rating">{top["match_scores"]["final_ratings"]["healing_per_minute"]["html"]}</td>
+                            <td id="{nick}_contribution1">Healing</td>
+                            <td id="{nick}_overall_c1">{int(top["match_scores"]["derived_stats"]["healing_per_minute"])}</td>
+                            <td id="{nick}_c1_rating">{top["match_scores"]["final_ratings"]["healing_per_minute"]["html"]}</td>
                           </tr>
                           <tr>
-                            <td id="{g.nickname_safe}_contribution2">Damage</td>
-                            <td id="{g.nickname_safe}_overall_c2">{int(top["match_scores"]["derived_stats"]["damage_per_minute"])}</td>
-                            <td id="{g.nickname_safe}_c2_rating">{top["match_scores"]["final_ratings"]["damage_per_minute"]["html"]}</td>
+                            <td id="{nick}_contribution2">Damage</td>
+                            <td id="{nick}_overall_c2">{int(top["match_scores"]["derived_stats"]["damage_per_minute"])}</td>
+                            <td id="{nick}_c2_rating">{top["match_scores"]["final_ratings"]["damage_per_minute"]["html"]}</td>
                           </tr>
-                          <tr><td colspan="3"><canvas class="hero_chart" id="{g.nickname_safe}_hero_chart"></canvas></td></tr>
+                          <tr><td colspan="3"><canvas class="hero_chart" id="{nick}_hero_chart"></canvas></td></tr>
                           """
 
-    html = html +f"""</div>
+    yield f"""</div>
                             <div class="row table-responsive bg-dark">
                                 <table class="table table-dark table-borderless">
                                   <thead class="text-muted">
@@ -296,18 +367,18 @@ def generate_gamer_cards(g_master):
                         <tbody>
                         <tr>
                           <td>Score</td>
-                          <td id="{g.nickname_safe}_overall_score_value">{round(top["match_scores"]["score"])}%</td>
-                          <td id="{g.nickname_safe}_score_rating">{top["match_scores"]["final_ratings"]["score"]["html"]}</td>
+                          <td id="{nick}_overall_score_value">{round(top["match_scores"]["score"])}%</td>
+                          <td id="{nick}_score_rating">{top["match_scores"]["final_ratings"]["score"]["html"]}</td>
                         </tr>
                         <tr>
                           <td>Winrate</td>
-                          <td id="{g.nickname_safe}_overall_winrate">{int(top["match_scores"]["derived_stats"]["win_rate"]*100)}%</td>
-                          <td id="{g.nickname_safe}_win_rating">{top["match_scores"]["final_ratings"]["win_rate"]["html"]}</td>
+                          <td id="{nick}_overall_winrate">{int(top["match_scores"]["derived_stats"]["win_rate"]*100)}%</td>
+                          <td id="{nick}_win_rating">{top["match_scores"]["final_ratings"]["win_rate"]["html"]}</td>
                         </tr>
                         <tr>
                           <td>KDA</td>
-                          <td id="{g.nickname_safe}_overall_kda">{round(top["match_scores"]["derived_stats"]["kda"],2)}</td>
-                          <td id="{g.nickname_safe}_kda_rating">{top["match_scores"]["final_ratings"]["kda"]["html"]}</td>
+                          <td id="{nick}_overall_kda">{round(top["match_scores"]["derived_stats"]["kda"],2)}</td>
+                          <td id="{nick}_kda_rating">{top["match_scores"]["final_ratings"]["kda"]["html"]}</td>
                         </tr>
                         {contributions}
                       </tbody>
@@ -316,33 +387,15 @@ def generate_gamer_cards(g_master):
                         </div>
                         <div class="col-5 text-center profile_column">
                             <div class="row justify-content-between">
-                                <p class="profile_name"><span><img src="img/player_heads/{g.data["player"]["icon"]["player_icon_id"]}.png" class="player_head_image rounded-circle img-fluid"></span> <span>{g.nickname_safe.upper()}</span></p>
+                                <p class="profile_name"><span><img src="img/player_heads/{card["icon_id"]}.png" class="player_head_image rounded-circle img-fluid"></span> <span>{nick.upper()}</span></p>
                             </div>
                             <div class="row sr_chart">
-                                <canvas id="{g.nickname_safe}chart"></canvas>
+                                <canvas id="{nick}chart"></canvas>
                             </div>
                             <script>"""
-    rank_history_size = len(g.match_data)
-    if rank_history_size > rank_history_count:
-      rank_history_size = rank_history_count
-    labels = ""
-    datapoints = ""
-    if g.feedback["percent_difference"] > 0:
-      g.feedback["percent_difference"] = "+"+str(g.feedback["percent_difference"])
-    feedback = '<span class="badge bg-'
-    if g.feedback["sentiment"] == "toast" or g.feedback["sentiment"] == "above":
-      feedback += f'success">{g.feedback["percent_difference"]} %</span>'
-    elif g.feedback["sentiment"] == "neutral":
-      feedback += f'secondary">{g.feedback["percent_difference"]} %</span>'
-    else:
-      feedback += f'danger">{g.feedback["percent_difference"]} %</span>'
-    for n in range(rank_history_size):
-      labels += "'"+g_master.convert_timestamp_to_date(g.match_data[n]["extended_data"]["match_time_stamp"])+"',"
-      datapoints +=str(int(g.match_data[n]["extended_data"]["match_player"]["score_info"]["new_score"]))+","
-    rank_annotations = get_rank_breakpoint_annotations(globalMinSR, globalMaxSR)
-    html = html + f"""
-                              const {g.nickname_safe}labels = [{labels}];
-                              {g.nickname_safe}labels.reverse()
+    yield f"""
+                              const {nick}labels = [{card["labels"]}];
+                              {nick}labels.reverse()
 
                               function createResizedImage(src, width, height, callback) {{
                                 const img = new Image();
@@ -362,33 +415,33 @@ def generate_gamer_cards(g_master):
                               }}
 
                               // Resize the image and then create the chart
-                              createResizedImage('./img/rank/{g.rank}.png', 50, 40, function (customImage) {{
+                              createResizedImage('./img/rank/{card["rank"]}.png', 50, 40, function (customImage) {{
 
-                                const {g.nickname_safe}dataPoints = [{datapoints}];
-                                {g.nickname_safe}dataPoints.reverse()
+                                const {nick}dataPoints = [{card["datapoints"]}];
+                                {nick}dataPoints.reverse()
 
-                                const pointStyles = {g.nickname_safe}dataPoints.map((_, index) =>
-                                  index === {g.nickname_safe}dataPoints.length - 1 ? customImage : 'circle'
+                                const pointStyles = {nick}dataPoints.map((_, index) =>
+                                  index === {nick}dataPoints.length - 1 ? customImage : 'circle'
                                 );
 
-                                const pointRadii = {g.nickname_safe}dataPoints.map((_, index) =>
-                                  index === {g.nickname_safe}dataPoints.length - 1 ? 10 : 3
+                                const pointRadii = {nick}dataPoints.map((_, index) =>
+                                  index === {nick}dataPoints.length - 1 ? 10 : 3
                                 );
 
-                                const globalMinSR = {globalMinSR};
-                                const globalMaxSR = {globalMaxSR};
+                                const globalMinSR = {card["global_min_sr"]};
+                                const globalMaxSR = {card["global_max_sr"]};
 
-                                const rankAnnotations = {rank_annotations};  // ✅ Injected from Python
+                                const rankAnnotations = {card["rank_annotations"]};  // ✅ Injected from Python
 
                                 console.log("Injected Rank Annotations:", rankAnnotations);  // ✅ Debugging
 
                                 const data = {{
-                                  labels: {g.nickname_safe}labels,
+                                  labels: {nick}labels,
                                   datasets: [{{
                                     label: 'SR',
-                                    backgroundColor: 'rgb({g.color_dark_r}, {g.color_dark_g}, {g.color_dark_b})',
-                                    borderColor: 'rgb({g.color_light_r}, {g.color_light_g}, {g.color_light_b})',
-                                    data: {g.nickname_safe}dataPoints,
+                                    backgroundColor: 'rgb({dark_r}, {dark_g}, {dark_b})',
+                                    borderColor: 'rgb({light_r}, {light_g}, {light_b})',
+                                    data: {nick}dataPoints,
                                     pointStyle: pointStyles,
                                     pointRadius: pointRadii,
                                     pointHoverRadius: 5
@@ -416,42 +469,42 @@ def generate_gamer_cards(g_master):
                                   }}
                                 }};
 
-                                const {g.nickname_safe}chart = new Chart(
-                                  document.getElementById('{g.nickname_safe}chart'),
+                                const {nick}chart = new Chart(
+                                  document.getElementById('{nick}chart'),
                                   config
                                 );
                               }});
 
                               // Extract labels & data
-                              let {g.nickname_safe}_heroLabels = {json.dumps([entry["date"] for entry in top["match_scores"]["score_array"]])};
-                              let {g.nickname_safe}_heroData = {json.dumps([entry["score"] for entry in top["match_scores"]["score_array"]])};
+                              let {nick}_heroLabels = {json.dumps([entry["date"] for entry in top["match_scores"]["score_array"]])};
+                              let {nick}_heroData = {json.dumps([entry["score"] for entry in top["match_scores"]["score_array"]])};
 
                               // 🆕 If only one data point exists, create a fake second point to center it
-                              if ({g.nickname_safe}_heroData.length === 1) {{
-                                {g.nickname_safe}_heroLabels = ["", {g.nickname_safe}_heroLabels[0], ""];  // Empty labels on both sides
-                                {g.nickname_safe}_heroData = [null, {g.nickname_safe}_heroData[0], null];  // Keep the real value in the center
+                              if ({nick}_heroData.length === 1) {{
+                                {nick}_heroLabels = ["", {nick}_heroLabels[0], ""];  // Empty labels on both sides
+                                {nick}_heroData = [null, {nick}_heroData[0], null];  // Keep the real value in the center
                               }}
 
                               // 🆕 Determine Chart Type
-                              const {g.nickname_safe}_chartType = ({g.nickname_safe}_heroData.filter(v => v !== null).length > 1) ? 'line' : 'scatter';
+                              const {nick}_chartType = ({nick}_heroData.filter(v => v !== null).length > 1) ? 'line' : 'scatter';
 
                               // Prepare hero chart data
-                              const {g.nickname_safe}_heroChartData = {{
-                                labels: {g.nickname_safe}_heroLabels,
+                              const {nick}_heroChartData = {{
+                                labels: {nick}_heroLabels,
                                 datasets: [{{
                                   label: 'Hero Score Progression',
-                                  backgroundColor: 'rgb({g.color_dark_r}, {g.color_dark_g}, {g.color_dark_b})',
-                                  borderColor: 'rgb({g.color_light_r}, {g.color_light_g}, {g.color_light_b})',
-                                  data: {g.nickname_safe}_heroData,
+                                  backgroundColor: 'rgb({dark_r}, {dark_g}, {dark_b})',
+                                  borderColor: 'rgb({light_r}, {light_g}, {light_b})',
+                                  data: {nick}_heroData,
                                   pointRadius: 7,
                                   pointHoverRadius: 12
                                 }}]
                               }};
 
 
-                                const {g.nickname_safe}_heroChartConfig = {{
-                                  type: {g.nickname_safe}_chartType,
-                                  data: {g.nickname_safe}_heroChartData,
+                                const {nick}_heroChartConfig = {{
+                                  type: {nick}_chartType,
+                                  data: {nick}_heroChartData,
                                   options: {{
                                     maintainAspectRatio: false,
                                     responsive: true,
@@ -476,9 +529,9 @@ def generate_gamer_cards(g_master):
 
 
                               // Store chart globally so we can update it later
-                              window["{g.nickname_safe}_heroChart"] = new Chart(
-                                document.getElementById("{g.nickname_safe}_hero_chart"),
-                                {g.nickname_safe}_heroChartConfig
+                              window["{nick}_heroChart"] = new Chart(
+                                document.getElementById("{nick}_hero_chart"),
+                                {nick}_heroChartConfig
                               );
 
 
@@ -487,30 +540,29 @@ def generate_gamer_cards(g_master):
                             <div class="row mt-3">
                                 <div class="col-6 text-center">
                                     <p>Stack score</p>
-                                    <h5>{g.match_scores["score"]}</h5>
+                                    <h5>{card["stack_score"]}</h5>
                                 </div>
                                 <div class="col-6 text-center">
                                     <p>Rank Score</p>
-                                    <h5>{gamer_sr}</h5>
+                                    <h5>{card["sr"]}</h5>
                                 </div>
                             </div>
                             <div class="row mt-3">
-                              {generate_progress_bar(gamer_sr,g.full_rank,g)}
+                              {card["progress_bar"]}
                             </div>
 
                         </div>
                         </div>
                             <div class="row mt-3 feedback">
-                              {g.get_styled_feedback()}
+                              {card["styled_feedback"]}
                             </div>
                     </div>
 
                 
     """
-  return html
 
 def generate_toppers(g_master):
-    html = """
+    yield """
     <div class="container">
         <div class="row justify-content-center">
           <h2 class='gradient-header text-center'>Biggest Numbers <img src="img/Galacta.webp" id="galacta"></h2>
@@ -529,7 +581,7 @@ def generate_toppers(g_master):
     for top in toppers:
         clean_stat = stat_name_mapping.get(top["stat"], top["stat"].replace("_", " ").title())
 
-        html += f"""
+        yield f"""
         <div class="col-4 topper_wrapper" style="background: radial-gradient(circle at bottom left, rgba({top["player"].color_light_r}, {top["player"].color_light_g}, {top["player"].color_light_b}, 0.8), rgba(255, 0, 150, 0) 65%);">
             <p class="topper-stat">{clean_stat}</p>
             <p class="topper-player"><span><img src="img/player_heads/{top["player"].data["player"]["icon"]["player_icon_id"]}.png" class="player_head_image rounded-circle img-fluid"></span> <span>{top["player"].nickname.upper()}</span></p>
@@ -540,16 +592,15 @@ def generate_toppers(g_master):
         </div>
         """
 
-    html += """
+    yield """
                 </div>
               </div>
         </div>
     </div>
     """
-    return html
 
 def generate_superstars(g_master):
-    html = """
+    yield """
     <div class="container">
         <div class="row justify-content-center">
           <h2 class='gradient-header text-center'>Our superstars <img src="img/Galacta.webp" id="galacta"></h2>
@@ -560,7 +611,7 @@ def generate_superstars(g_master):
     sizes = [6,4,2]
     count = 0
     for star in superstars:
-        html += f"""
+        yield f"""
         <div class="col-{sizes[count]} topper_wrapper" style="background: radial-gradient(circle at bottom left, rgba({star["gamer"].color_light_r}, {star["gamer"].color_light_g}, {star["gamer"].color_light_b}, 0.8), rgba(255, 0, 150, 0) 65%);">
             <p class="topper-{sizes[count]}"><span><img src="img/player_heads/{star["gamer"].data["player"]["icon"]["player_icon_id"]}.png" class="player_head_image rounded-circle img-fluid"></span> <span>{star["gamer"].nickname.upper()}</span></p>
             <p class="mvp-count"><span class="">{star["hero"]["mvp_count"]}</span></p>
@@ -570,16 +621,15 @@ def generate_superstars(g_master):
         """
         count += 1
 
-    html += """
+    yield """
                 </div>
               </div>
         </div>
     </div>
     """
-    return html
 
 def generate_hero_highlights(top_heroes):
-  html = """
+  yield """
   <div class="container mt-5">
     <h2 class='gradient-header text-center'>Heroes & Villains <img src="img/Galacta.webp" id="galacta"></h2>
     <div class="row">
@@ -591,7 +641,7 @@ def generate_hero_highlights(top_heroes):
 
   # 🆕 Generate Top 3 List Items
   for star in top_heroes:
-    html += f"""
+    yield f"""
         <li class="list-group-item text-light border-secondary" style="background-color: rgba(0,0,0,0);">
           <div class="row highlight_row">
             <div class="col-5 custom_vertical">
@@ -609,16 +659,15 @@ def generate_hero_highlights(top_heroes):
         </li>
     """
 
-  html += """
+  yield """
         </ul>
       </div>
     </div>
   </div>
   """
 
-  return html
 
-def generate_timeline(g_master, bronze):
+def generate_timeline(g_master, audiopath):
     """
     Builds an HTML section that shows:
       1) A chronological event timeline for the latest game night.
@@ -626,11 +675,7 @@ def generate_timeline(g_master, bronze):
       3) A Chart.js line chart (canvas) with a custom tooltip.
     """
 
-    game_night_folder = "./game_nights/"
-    audiopath = "../audio/"
-    if bronze:
-        game_night_folder = "./game_nights_bronze/"
-        audiopath = "../audio_bronze/"
+    game_night_folder = g_master.game_nights_folder
 
 
     # Arrays for the chart & latest data
@@ -696,7 +741,8 @@ def generate_timeline(g_master, bronze):
 
     # --- Check if any data was processed ---
     if not dates_obj:
-        return "<p>No game night data found to generate timeline.</p>"
+        yield "<p>No game night data found to generate timeline.</p>"
+        return
 
 
     # --- Combine, sort by date, and unzip for the chart ---
@@ -824,7 +870,7 @@ def generate_timeline(g_master, bronze):
 
     # --- Build final HTML ---
     # Added CSS within a <style> tag for simplicity. Move to your CSS file if preferred.
-    html = f"""
+    yield f"""
 <div class="container mt-4">
 
     <!-- *NEW* Event Timeline Section -->
@@ -944,14 +990,63 @@ def generate_timeline(g_master, bronze):
   }}
 </script>
 """
-    return html
 
 
 
 
 
-def generate_matchups(g_master):
-    html = """
+def matchup_card_context(g):
+    return {
+        "nickname_safe": g.nickname_safe,
+        "color_light": [g.color_light_r, g.color_light_g, g.color_light_b],
+        "icon_id": g.data["player"]["icon"]["player_icon_id"],
+        "strong": g.strongest_matchup,
+        "weak": g.weakest_matchup
+    }
+
+def render_matchup_card(matchup):
+    nick = matchup["nickname_safe"]
+    light_r, light_g, light_b = matchup["color_light"]
+    strong = matchup["strong"]
+    weak = matchup["weak"]
+    style_strong = "secondary"
+    style_weak = "secondary"
+    if strong['win_rate'] > 60:
+      style_strong = "success"
+    if weak['win_rate'] < 40: 
+      style_weak = "danger"
+    
+    wr_strong = f"""<span class="badge ">{strong['win_rate']} %</span>"""
+    wr_weak = f"""<span class="badge ">{weak['win_rate']} %</span>"""
+
+    yield f"""
+    <div class="matchup-card" style="background: radial-gradient(circle at top right, rgba({light_r}, {light_g}, {light_b}, 0.8), rgba(255, 0, 150, 0) 65%);">
+        <div class="matchup-header">
+            <p class="matchup-player"><span><img src="img/player_heads/{matchup["icon_id"]}.png" class="player_head_image rounded-circle img-fluid"></span> <span>{nick.upper()}</span></p>
+        </div>
+        
+        <div class="matchup-body">
+            <div class="matchup-block">
+                <p class="matchup-label strong">Loves to see</p>
+                <img src="img/heroes/{strong['hero_id']}_icon.webp" class="matchup-hero">
+                <p class="matchup-count"><span class="badge">{strong["matches"]}</span></p>
+                <p class="matchup-hero-name">{strong['hero_name'].title()}</p>
+                <p class="matchup-winrate">Winrate: {wr_strong}</p>
+            </div>
+
+            <div class="matchup-block">
+                <p class="matchup-label weak">Hates to see</p>
+                <img src="img/heroes/{weak['hero_id']}_icon.webp" class="matchup-hero">
+                <p class="matchup-count"><span class="badge">{weak["matches"]}</span></p>
+                <p class="matchup-hero-name">{weak['hero_name'].title()}</p>
+                <p class="matchup-winrate">Winrate: {wr_weak}</p>
+            </div>
+        </div>
+    </div>
+    """
+
+def generate_matchups(g_master, page):
+    yield """
     <div class="container">
         <div class="row justify-content-center">
             <div class="col-lg-10">
@@ -960,62 +1055,31 @@ def generate_matchups(g_master):
     """
 
     for g in g_master.gamers:
-        strong = g.strongest_matchup
-        weak = g.weakest_matchup
-        style_strong = "secondary"
-        style_weak = "secondary"
-        if strong['win_rate'] > 60:
-          style_strong = "success"
-        if weak['win_rate'] < 40: 
-          style_weak = "danger"
-        
-        wr_strong = f"""<span class="badge ">{strong['win_rate']} %</span>"""
-        wr_weak = f"""<span class="badge ">{weak['win_rate']} %</span>"""
+        yield fragment_cache.render(page, "matchup_card", g.nickname_safe, render_matchup_card, matchup_card_context(g))
 
-        html += f"""
-        <div class="matchup-card" style="background: radial-gradient(circle at top right, rgba({g.color_light_r}, {g.color_light_g}, {g.color_light_b}, 0.8), rgba(255, 0, 150, 0) 65%);">
-            <div class="matchup-header">
-                <p class="matchup-player"><span><img src="img/player_heads/{g.data["player"]["icon"]["player_icon_id"]}.png" class="player_head_image rounded-circle img-fluid"></span> <span>{g.nickname_safe.upper()}</span></p>
-            </div>
-            
-            <div class="matchup-body">
-                <div class="matchup-block">
-                    <p class="matchup-label strong">Loves to see</p>
-                    <img src="img/heroes/{strong['hero_id']}_icon.webp" class="matchup-hero">
-                    <p class="matchup-count"><span class="badge">{strong["matches"]}</span></p>
-                    <p class="matchup-hero-name">{strong['hero_name'].title()}</p>
-                    <p class="matchup-winrate">Winrate: {wr_strong}</p>
-                </div>
-
-                <div class="matchup-block">
-                    <p class="matchup-label weak">Hates to see</p>
-                    <img src="img/heroes/{weak['hero_id']}_icon.webp" class="matchup-hero">
-                    <p class="matchup-count"><span class="badge">{weak["matches"]}</span></p>
-                    <p class="matchup-hero-name">{weak['hero_name'].title()}</p>
-                    <p class="matchup-winrate">Winrate: {wr_weak}</p>
-                </div>
-            </div>
-        </div>
-        """
-
-    html += """
+    yield """
                 </div>
             </div>
         </div>
     
     """
-    return html
 
 
-def generate_bottom(g_master):
-	html = """
+def generate_bottom(g_master, data_file):
+	yield f"""
 	<footer class="pt-5 border-top">
 	Created by MegabyteBro &middot; &copy; 2025
 	</footer>
   </div>
 	</div>
+      <script>const siteDataUrl = "{data_file}";</script>"""
+	yield """
       <script>
   $(document).ready(function () {
+   // Card and chart data lives in a separate file, named after its content so the browser can keep it
+   fetch(siteDataUrl).then(response => response.json()).then(function (data) {
+    window.siteData = data;
+    drawAnalyticsCharts(siteData.charts);
     $(".profile_card").each(function () {
       let parentCard = $(this); // Get the current profile card
 
@@ -1025,8 +1089,8 @@ def generate_bottom(g_master):
       if (firstActiveHero.length) {
         let matchingClass = firstActiveHero.attr("class").split(/\\s+/).find(cls => cls.endsWith("_card"));
 
-        if (matchingClass && typeof window[matchingClass] !== "undefined") {
-          let jsonData = window[matchingClass]; // ✅ Access hero data
+        if (matchingClass && typeof siteData.cards[matchingClass] !== "undefined") {
+          let jsonData = siteData.cards[matchingClass]; // ✅ Access hero data
           console.log("Setting initial background for:", matchingClass, jsonData);
 
           // Get the correct hero image URL
@@ -1040,6 +1104,7 @@ def generate_bottom(g_master):
     $(".profile_card").each(function () {
       attachClickHandlers($(this));
     });
+   });
 
 function attachClickHandlers(parentCard) {
   parentCard.find(".non_active_hero").off("click").on("click", function () {
@@ -1055,8 +1120,8 @@ function attachClickHandlers(parentCard) {
     let matchingClass = $(this).attr("class").split(/\\s+/).find(cls => cls.endsWith("_card"));
     console.log("Matching class found:", matchingClass); // ✅ Debugging log
 
-    if (matchingClass && typeof window[matchingClass] !== "undefined") {
-      let jsonData = window[matchingClass]; // ✅ Access the global variable
+    if (matchingClass && typeof siteData.cards[matchingClass] !== "undefined") {
+      let jsonData = siteData.cards[matchingClass]; // ✅ Access the hero's data
       console.log("Extracted JSON:", jsonData); // ✅ Should now print correct data
 
       // Extract the player's nickname from the class name
@@ -1162,31 +1227,29 @@ if (window[chartKey]) {
   });
 </script>
 """
-	return html
 
 
 def generate_tabs(g_master):
     """
     Creates a tabbed navigation for squad insights.
     """
-    html = """
+    yield """
     <ul class="nav nav-tabs" id="playerTabs">
     """
     for g in g_master.gamers:
         active_class = "active" if g == g_master.gamers[0] else ""
-        html += f"""
+        yield f"""
         <li class="nav-item">
             <a class="nav-link {active_class}" data-bs-toggle="tab" href="#{g.nickname_safe.lower()}">{g.nickname_safe}</a>
         </li>
         """
-    html += "</ul>"
-    return html
+    yield "</ul>"
 
 def generate_player_insights(g,g_master):
     """
     Generates an HTML section for a player's insights, including their ban list, synergies, and worst matchups.
     """
-    html = f"""
+    yield f"""
     <div id="{g.nickname_safe.lower()}" class="tab-pane fade {'show active' if g == g_master.gamers[0] else ''}">
         <h3>{g.nickname_safe} Insights</h3>
 
@@ -1196,38 +1259,38 @@ def generate_player_insights(g,g_master):
             <ul class="list-group list-group-flush">
     """
     for ban in g.ban_list:
-        html += f"""
+        yield f"""
             <li class="list-group-item">{ban["name"]} ({ban["role"]}) - Win Rate: {ban["win_percent"]}%</li>
         """
-    html += "</ul></div>"
+    yield "</ul></div>"
 
     # Best & Worst Synergies
-    html += f"""
+    yield f"""
         <div class="card mb-3">
             <div class="card-header">Best Hero Synergies</div>
             <ul class="list-group list-group-flush">
     """
     for combo in g.combo_list:
         combo_names = ", ".join([f"{h['hero']} ({h['role']})" for h in combo["hero_combos"]])
-        html += f"""
+        yield f"""
             <li class="list-group-item">{combo["player_hero_name"]} + {combo_names} - WR: {combo["win_percent"]}%</li>
         """
-    html += "</ul></div>"
+    yield "</ul></div>"
 
-    html += f"""
+    yield f"""
         <div class="card mb-3">
             <div class="card-header">Worst Hero Synergies</div>
             <ul class="list-group list-group-flush">
     """
     for anti_combo in g.anti_combo_list:
         anti_names = ", ".join([f"{h['hero']} ({h['role']})" for h in anti_combo["hero_combos"]])
-        html += f"""
+        yield f"""
             <li class="list-group-item">{anti_combo["player_hero_name"]} + {anti_names} - WR: {anti_combo["win_percent"]}%</li>
         """
-    html += "</ul></div>"
+    yield "</ul></div>"
 
     # Charts placeholder
-    html += f"""
+    yield f"""
         <div class="row">
             <div class="col-md-6">
                 <canvas id="banChart_{g.nickname_safe.lower()}"></canvas>
@@ -1238,214 +1301,296 @@ def generate_player_insights(g,g_master):
         </div>
     """
 
-    html += "</div>"
-    return html
+    yield "</div>"
 
 def generate_chart_scripts(g_master):
     """
-    Generates Chart.js scripts dynamically for each player's analytics.
+    Draws each player's analytics charts, from the "charts" part of the site data bundle.
     """
-    html = "<script>"
-
-    for g in g_master.gamers:
-        # Ban Effectiveness Chart (Dual-Axis)
-        ban_labels = [ban["name"] for ban in g.ban_list]
-        ban_win_data = [ban["win_percent"] for ban in g.ban_list]
-        ban_count_data = [ban["bans"] for ban in g.ban_list]
-
-        html += f"""
-        new Chart(document.getElementById('banChart_{g.nickname_safe.lower()}').getContext('2d'), {{
+    yield """<script>
+    function drawAnalyticsCharts(charts) {
+      for (const [nick, chart] of Object.entries(charts)) {
+        // Ban Effectiveness Chart (Dual-Axis)
+        new Chart(document.getElementById('banChart_' + nick).getContext('2d'), {
             type: 'bar',
-            data: {{
-                labels: {ban_labels},
+            data: {
+                labels: chart.ban.labels,
                 datasets: [
-                    {{
+                    {
                         label: 'Win Rate (%)',
-                        data: {ban_win_data},
+                        data: chart.ban.win_data,
                         backgroundColor: 'rgba(255, 99, 132, 0.6)', // Red color
                         borderColor: 'rgba(255, 99, 132, 1)',
                         borderWidth: 1,
                         yAxisID: 'y-win-rate',
-                    }},
-                    {{
+                    },
+                    {
                         label: 'Bans Count',
-                        data: {ban_count_data},
+                        data: chart.ban.count_data,
                         backgroundColor: 'rgba(54, 162, 235, 0.4)', // Blue color
                         borderColor: 'rgba(54, 162, 235, 1)',
                         borderWidth: 1,
                         yAxisID: 'y-ban-count',
-                    }}
+                    }
                 ]
-            }},
-            options: {{
+            },
+            options: {
                 responsive: true,
-                plugins: {{
-                    legend: {{
+                plugins: {
+                    legend: {
                         display: true
-                    }}
-                }},
-                scales: {{
-                    'y-win-rate': {{
+                    }
+                },
+                scales: {
+                    'y-win-rate': {
                         type: 'linear',
                         position: 'left',
                         beginAtZero: true,
                         max: 100,
-                        title: {{
+                        title: {
                             display: true,
                             text: 'Win Rate (%)',
-                        }}
-                    }},
-                    'y-ban-count': {{
+                        }
+                    },
+                    'y-ban-count': {
                         type: 'linear',
                         position: 'right',
                         beginAtZero: true,
-                        title: {{
+                        title: {
                             display: true,
                             text: 'Bans Count',
-                        }}
-                    }}
-                }}
-            }}
-        }});"""
-
-        # Synergies grouped by played hero (Dual-Axis)
-        hero_synergies = {}
-        for combo in g.combo_list:
-            played_hero = combo["player_hero_name"]
-            if played_hero not in hero_synergies:
-                hero_synergies[played_hero] = {"labels": [], "win_data": [], "games_data": []}
-            synergy_names = ", ".join([h["hero"] for h in combo["hero_combos"]])
-            hero_synergies[played_hero]["labels"].append(synergy_names)
-            hero_synergies[played_hero]["win_data"].append(combo["win_percent"])
-            hero_synergies[played_hero]["games_data"].append(combo["games_played"])
-
-        for hero, synergy_data in hero_synergies.items():
-            chart_id = f"synergyChart_{g.nickname_safe.lower()}_{hero.replace(' ', '')}"
-            html += f"""
-            new Chart(document.getElementById('{chart_id}').getContext('2d'), {{
+                        }
+                    }
+                }
+            }
+        });
+
+        // Synergies grouped by played hero (Dual-Axis)
+        for (const synergy of chart.synergies) {
+            new Chart(document.getElementById(synergy.chart_id).getContext('2d'), {
                 type: 'bar',
-                data: {{
-                    labels: {synergy_data["labels"]},
+                data: {
+                    labels: synergy.labels,
                     datasets: [
-                        {{
+                        {
                             label: 'Win Rate (%)',
-                            data: {synergy_data["win_data"]},
-                            backgroundColor: 'rgb({g.color_dark_r}, {g.color_dark_g}, {g.color_dark_b})',
-                            borderColor: 'rgb({g.color_light_r}, {g.color_light_g}, {g.color_light_b})',
+                            data: synergy.win_data,
+                            backgroundColor: chart.color_dark,
+                            borderColor: chart.color_light,
                             borderWidth: 1,
                             yAxisID: 'y-win-rate',
-                        }},
-                        {{
+                        },
+                        {
                             label: 'Games Played',
-                            data: {synergy_data["games_data"]},
-                        backgroundColor: 'rgba(54, 162, 235, 0.4)', // Blue color
-                        borderColor: 'rgba(54, 162, 235, 1)',
+                            data: synergy.games_data,
+                            backgroundColor: 'rgba(54, 162, 235, 0.4)', // Blue color
+                            borderColor: 'rgba(54, 162, 235, 1)',
                             borderWidth: 1,
                             yAxisID: 'y-games-played',
-                        }}
+                        }
                     ]
-                }},
-                options: {{
+                },
+                options: {
                     responsive: true,
-                    plugins: {{
-                        legend: {{
+                    plugins: {
+                        legend: {
                             display: true
-                        }}
-                    }},
-                    scales: {{
-                        'y-win-rate': {{
+                        }
+                    },
+                    scales: {
+                        'y-win-rate': {
                             type: 'linear',
                             position: 'left',
                             beginAtZero: true,
                             max: 100,
-                            title: {{
+                            title: {
                                 display: true,
                                 text: 'Win Rate (%)',
-                            }}
-                        }},
-                        'y-games-played': {{
+                            }
+                        },
+                        'y-games-played': {
                             type: 'linear',
                             position: 'right',
                             beginAtZero: true,
-                            title: {{
+                            title: {
                                 display: true,
                                 text: 'Games Played',
-                            }}
-                        }}
-                    }}
-                }}
-            }});"""
+                            }
+                        }
+                    }
+                }
+            });
+        }
+      }
+    }
+    </script>"""
 
-    html += "</script>"
-    return html
 
+def synergy_chart_id(nickname, hero):
+    return f"synergyChart_{nickname.lower()}_{hero.replace(' ', '')}"
+
+def analytics_tab_context(g, active):
+    return {
+        "nickname_safe": g.nickname_safe,
+        "active": active,
+        "banner": g.get_banner(),
+        "bans": [{"hero_id": ban["hero_id"]} for ban in g.ban_list[:3]],
+        # In order of first appearance, so the tab (and its cache key) is the same every run
+        "synergy_heroes": list(dict.fromkeys(combo["player_hero_name"] for combo in g.combo_list))
+    }
 
+def render_analytics_tab(tab):
+    nick = tab["nickname_safe"]
+    imgrow = ""
+    for ban in tab["bans"]:
+      imgrow += f"<img class='player_head_image_chart rounded-circle img-fluid' src='./img/heroes/{ban["hero_id"]}_icon.webp'>"
+    yield f"""
+    <div id="{nick.lower()}" class="tab-pane fade {'show active' if tab['active'] else ''}">
+        <div class="row analytics_header">
+          <img class="player_banner" src="{tab["banner"]}">
+          <h3>{nick} Analytics</h3>
+        </div>
+
+        <!-- Ban Effectiveness -->
+        <div class="row">
+            <div class="col-md-12 outer_analytics_container">
+              <div class="analytics_container">
+                <h4 class="chart_header"><p>{nick} Ban Effects</p>{imgrow}</h4>
+                <canvas class="ban_chart" id="banChart_{nick.lower()}"></canvas>
+              </div>
+            </div>
+        </div>
+    """
+
+    # Generate hero synergy charts
+    hero_synergies = tab["synergy_heroes"]
+
+    yield """<div class="row">"""
+    for hero in hero_synergies:
+        chart_id = synergy_chart_id(nick, hero)
+        yield f"""
+            <div class="col-md-6 outer_analytics_container">
+              <div class="analytics_container">
+                <h4 class="chart_header"><p>{hero} Synergies</p></h4>
+                <canvas class="synergy_chart" id="{chart_id}"></canvas>
+              </div>
+            </div>
+        """
 
+    yield "</div></div>"
 
-def generate_squad_analysis(g_master):
+def generate_squad_analysis(g_master, page):
     """
     Generates the full squad insights page with player tabs and analytics charts.
     """
-    html = "<div class='container mt-4'>"
-    html += generate_tabs(g_master)
-    html += "<div class='tab-content'>"
+    yield "<div class='container mt-4'>"
+    yield from generate_tabs(g_master)
+    yield "<div class='tab-content'>"
 
     for g in g_master.gamers:
-        imgrow = ""
-        for ban in g.ban_list[:3]:
-          imgrow += f"<img class='player_head_image_chart rounded-circle img-fluid' src='./img/heroes/{ban["hero_id"]}_icon.webp'>"
-        html += f"""
-        <div id="{g.nickname_safe.lower()}" class="tab-pane fade {'show active' if g == g_master.gamers[0] else ''}">
-            <div class="row analytics_header">
-              <img class="player_banner" src="{g.get_banner()}">
-              <h3>{g.nickname_safe} Analytics</h3>
-            </div>
+        tab = analytics_tab_context(g, g == g_master.gamers[0])
+        yield fragment_cache.render(page, "analytics_tab", g.nickname_safe, render_analytics_tab, tab)
 
-            <!-- Ban Effectiveness -->
-            <div class="row">
-                <div class="col-md-12 outer_analytics_container">
-                  <div class="analytics_container">
-                    <h4 class="chart_header"><p>{g.nickname_safe} Ban Effects</p>{imgrow}</h4>
-                    <canvas class="ban_chart" id="banChart_{g.nickname_safe.lower()}"></canvas>
-                  </div>
-                </div>
-            </div>
-        """
+    yield "</div></div>"  # Close tab-content & container
+    yield from generate_chart_scripts(g_master)
 
-        # Generate hero synergy charts
-        hero_synergies = set(combo["player_hero_name"] for combo in g.combo_list)
-
-        html += """<div class="row">"""
-        for hero in hero_synergies:
-            chart_id = f"synergyChart_{g.nickname_safe.lower()}_{hero.replace(' ', '')}"
-            html += f"""
-                <div class="col-md-6 outer_analytics_container">
-                  <div class="analytics_container">
-                    <h4 class="chart_header"><p>{hero} Synergies</p></h4>
-                    <canvas class="synergy_chart" id="{chart_id}"></canvas>
-                  </div>
-                </div>
-            """
 
-        html += "</div></div>"
+CARD_STATS = ["win_rate", "kda", "tanking_per_minute", "damage_per_minute", "kills_per_minute", "healing_per_minute"]
 
-    html += "</div></div>"  # Close tab-content & container
-    html += generate_chart_scripts(g_master)
-    return html
+def site_data(g_master):
+    """
+    Everything the page's scripts read, and nothing more: the stats behind every hero on the gamer cards,
+    and the data for the analytics charts.
+    """
+    cards = {}
+    charts = {}
+    for g in g_master.gamers:
+      for hero in g.top_heroes[:gamer_card_hero_count]:
+        scores = hero["match_scores"]
+        cards[f"{g.nickname_safe}_{hero['hero_id']}_card"] = {
+          "costume": scores.get("costume"),
+          "role": hero["role"],
+          "score": scores["score"],
+          "derived_stats": {stat: scores["derived_stats"][stat] for stat in CARD_STATS if stat in scores["derived_stats"]},
+          "final_ratings": {stat: {"html": rating["html"]} for stat, rating in scores.get("final_ratings", {}).items() if stat in CARD_STATS+["score"]},
+          "score_array": [{"date": entry["date"], "score": entry["score"]} for entry in scores.get("score_array", [])]
+        }
 
+      # Synergies grouped by played hero
+      hero_synergies = {}
+      for combo in g.combo_list:
+        played_hero = combo["player_hero_name"]
+        if played_hero not in hero_synergies:
+          hero_synergies[played_hero] = {"chart_id": synergy_chart_id(g.nickname_safe, played_hero), "labels": [], "win_data": [], "games_data": []}
+        hero_synergies[played_hero]["labels"].append(", ".join([h["hero"] for h in combo["hero_combos"]]))
+        hero_synergies[played_hero]["win_data"].append(combo["win_percent"])
+        hero_synergies[played_hero]["games_data"].append(combo["games_played"])
+
+      charts[g.nickname_safe.lower()] = {
+        "color_dark": f"rgb({g.color_dark_r}, {g.color_dark_g}, {g.color_dark_b})",
+        "color_light": f"rgb({g.color_light_r}, {g.color_light_g}, {g.color_light_b})",
+        "ban": {
+          "labels": [ban["name"] for ban in g.ban_list],
+          "win_data": [ban["win_percent"] for ban in g.ban_list],
+          "count_data": [ban["bans"] for ban in g.ban_list]
+        },
+        "synergies": list(hero_synergies.values())
+      }
+    return {"cards": cards, "charts": charts}
 
-def build_site(gamerlist, bronze):
+def page_name(sitename):
+    # "../index.html" -> "index", names the page's data bundle and its fragments in the fragment cache
+    return os.path.splitext(os.path.basename(sitename))[0]
+
+def site_data_prefix(sitename):
+    return page_name(sitename) + "_data."
+
+def write_site_data(data, sitename):
+    """
+    Writes the bundle to site_data_folder as <page>_data.<content hash>.json. The name changes whenever the content does,
+    so the browser can cache it for as long as it likes. Returns the path the page fetches it from.
+    """
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    filename = site_data_prefix(sitename) + hashlib.sha1(raw).hexdigest()[:12] + ".json"
+    folder = os.path.join(os.path.dirname(sitename), site_data_folder)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+      tmp_path = path + ".tmp"
+      with open(tmp_path, "wb") as f:
+        f.write(raw)
+      os.replace(tmp_path, path)
+    return f"{site_data_folder}/{filename}"
+
+def remove_stale_site_data(sitename, data_file):
+    folder = os.path.join(os.path.dirname(sitename), site_data_folder)
+    prefix = site_data_prefix(sitename)
+    for filename in os.listdir(folder):
+      if filename.startswith(prefix) and filename.endswith(".json") and f"{site_data_folder}/{filename}" != data_file:
+        os.remove(os.path.join(folder, filename))
+
+def build_site(gamerlist, bronze, g_master=None, benchmark=False, squad=None):
 
     game_nights_folder = "./game_nights/"
     sitename="../index.html"
+    audio_folder = "../audio/"
     if bronze:
       game_nights_folder = "./game_nights_bronze/"
       sitename="../bronze.html"
-
-    g_master = Gamer_master(gamerlist,game_nights_folder=game_nights_folder)
-    g_master.initiate()
+      audio_folder = "../audio_bronze/"
+    if squad is not None:
+      # One of config.squads, from the pipeline
+      game_nights_folder = squad["game_nights_folder"]
+      sitename = squad["page"]
+      audio_folder = squad["audio_folder"]
+
+    if g_master is None:
+      g_master = Gamer_master(gamerlist,game_nights_folder=game_nights_folder)
+      g_master.initiate()
+    else:
+      # The pipeline hands us its model. GPT has run since it was analysed, so pick up the new summaries.
+      g_master.classify_performances()
     g_master.sort_gamers()
-    g_master.export_data_objects()
     g_master.sort_hero_scores()
 
     # Create lists to store all heroes with their scores
@@ -1470,30 +1615,99 @@ def build_site(gamerlist, bronze):
     # Compute and store min/max scores
 
 
-    html = ""
-    html += generate_top(g_master)
-    html += generate_gamer_cards(g_master)
-    html += generate_squad_analysis(g_master)  # **INSERTED HERE!**
-    html += generate_hero_highlights(top_heroes)
-    html += generate_timeline(g_master,bronze)    # <--- Insert our new timeline section here!
-    html += generate_toppers(g_master)
-    html += generate_superstars(g_master)
-    html += generate_matchups(g_master)
-    html += generate_bottom(g_master)
-    html += "</body></html>"
-
-    with open(sitename,"w", encoding="utf-8") as outfile:
+    if benchmark:
+      compare_builds(g_master, audio_folder, top_heroes, sitename)
+      return
+
+    data_file = write_site_data(site_data(g_master), sitename)
+
+    start = time.perf_counter()
+    fragment_cache.reset_stats()
+    with SiteWriter(sitename) as writer:
+      writer.write(generate_site(g_master, audio_folder, top_heroes, data_file, page_name(sitename)))
+    # The new page is up, older bundles are not referenced anymore
+    remove_stale_site_data(sitename, data_file)
+    elapsed = time.perf_counter() - start
+    # No memory figure here, the process peak is mostly the analysis. --benchmark measures the build on its own.
+    print(f"Site built! {writer.bytes / 1024:.0f} KB written in {elapsed:.2f}s.")
+    stats = fragment_cache.get_stats()
+    print(f"Player fragments: {stats['reused']} reused, {stats['rendered']} rendered.")
+
+def site_sections(g_master, audio_folder, top_heroes, data_file, page):
+    return [
+      generate_top(g_master),
+      generate_gamer_cards(g_master, page),
+      generate_squad_analysis(g_master, page),  # **INSERTED HERE!**
+      generate_hero_highlights(top_heroes),
+      generate_timeline(g_master,audio_folder),    # <--- Insert our new timeline section here!
+      generate_toppers(g_master),
+      generate_superstars(g_master),
+      generate_matchups(g_master, page),
+      generate_bottom(g_master, data_file),
+      iter(["</body></html>"])
+    ]
+
+def generate_site(g_master, audio_folder, top_heroes, data_file, page):
+    for section in site_sections(g_master, audio_folder, top_heroes, data_file, page):
+      yield from section
+
+def compare_builds(g_master, audio_folder, top_heroes, sitename):
+    """
+    Renders the page the old way and streamed, and compares time and the peak memory each build allocated
+    (tracemalloc, so it is the build's own peak and not the process's). Both write next to sitename, the real page is left alone.
+    The old way is what build_site did before streaming: every section grew its own string with +=, those were
+    added onto the page's string, and the whole page was written at the end.
+    The data bundle and the player fragments go to a temp folder, so the live data/ folder and fragment cache are
+    left alone too, and each build starts with an empty fragment cache instead of reusing the one before it.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    fragment_dir = fragment_cache.FRAGMENT_DIR
+    data_file = write_site_data(site_data(g_master), os.path.join(tmp_dir, os.path.basename(sitename)))
+
+    def as_string(path):
+      html = ""
+      for section in site_sections(g_master, audio_folder, top_heroes, data_file, page_name(sitename)):
+        section_html = ""
+        for fragment in section:
+          section_html += fragment
+        html += section_html
+      with open(path, "w", encoding="utf-8") as outfile:
         outfile.write(html)
-    print("Site built!")
+
+    def streamed(path):
+      with SiteWriter(path) as writer:
+        writer.write(generate_site(g_master, audio_folder, top_heroes, data_file, page_name(sitename)))
+
+    print(f"{'build':<10}{'time':>10}{'peak alloc':>14}{'size':>12}")
+    try:
+      for name, build in (("string", as_string), ("streamed", streamed)):
+        path = sitename + "." + name
+        fragment_cache.FRAGMENT_DIR = os.path.join(tmp_dir, "fragments_" + name)
+        tracemalloc.start()
+        start = time.perf_counter()
+        build(path)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        size = os.path.getsize(path)
+        os.remove(path)
+        print(f"{name:<10}{elapsed:>9.2f}s{peak / 1024 / 1024:>12.1f}MB{size / 1024:>10.0f}KB")
+    finally:
+      fragment_cache.FRAGMENT_DIR = fragment_dir
+      shutil.rmtree(tmp_dir, ignore_errors=True)
 
 if __name__ == '__main__':
 
   gamers = gamerlist
   bronze = False
+  benchmark = False
   for arg in sys.argv:
     if arg == "--bronze":
       gamers = gamerlist_bronze
       bronze = True
+    if arg == "--benchmark":
+      # Compare the old build-one-string approach with the streamed one, without touching the page
+      benchmark = True
 
-  build_site(gamers, bronze)
+  build_site(gamers, bronze, benchmark=benchmark)
 
@@ -0,0 +1,112 @@
+import json
+import time
+import asyncio
+import aiohttp
+import contextlib
+
+import match_store
+import api_client
+
+from config import base_api, Bcol
+from config import api_requests_per_second, api_burst, match_download_concurrency
+
+bcol = Bcol()
+
+
+class TokenBucket():
+	"""
+	Shared rate limiter. Allows bursts of up to `capacity` requests, refilled at `rate` requests per second.
+	"""
+
+	def __init__(self, rate=api_requests_per_second, capacity=api_burst):
+		self.rate = rate
+		self.capacity = capacity
+		self.tokens = capacity
+		self.updated = time.monotonic()
+		self.lock = asyncio.Lock()
+
+	async def acquire(self):
+		async with self.lock:
+			while True:
+				now = time.monotonic()
+				self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+				self.updated = now
+				if self.tokens >= 1:
+					self.tokens -= 1
+					return
+				await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MatchDownloader():
+	"""
+	Downloads match details concurrently into the shared match store.
+	A match_uid that is already being fetched is never requested twice, callers get the same task back.
+	"""
+
+	def __init__(self, bucket=None, concurrency=match_download_concurrency):
+		self.bucket = bucket or TokenBucket()
+		self.semaphore = asyncio.Semaphore(concurrency)
+		self.store = match_store.get_store()
+		self.in_flight = {}
+		self.downloaded = 0
+		self.failed = 0
+		self.requests = 0
+		self.bytes = 0
+
+	def fetch(self, match_uid):
+		match_uid = str(match_uid)
+		if match_uid not in self.in_flight:
+			self.in_flight[match_uid] = asyncio.ensure_future(self.download(match_uid))
+		return self.in_flight[match_uid]
+
+	async def download(self, match_uid):
+		# Not kept in the API cache, the match store is where matches are cached
+		url = base_api+"match/"+match_uid
+		# The client retries rate limits and server errors (waiting outside the slot, so the other matches keep going),
+		# and gives up on a request after api_timeout
+		try:
+			status, body, _ = await api_client.get_async(url, throttle=self.slot)
+			self.bytes += len(body)
+			if status == 200:
+				data = json.loads(body)
+				# Write as soon as it arrives, a crash later on won't lose it
+				self.store.write(match_uid, data)
+				self.downloaded += 1
+				print(f"{bcol.OKBLUE}Downloaded and saved match {match_uid}.{bcol.ENDC}")
+				return True
+			print(f"{bcol.FAIL}Failed to download match {match_uid}, {status} returned.{bcol.ENDC}")
+		except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+			print(f"{bcol.FAIL}Failed to download match {match_uid}: {e}{bcol.ENDC}")
+		self.failed += 1
+		return False
+
+	@contextlib.asynccontextmanager
+	async def slot(self):
+		# One request: a place among the concurrent downloads, and a token from the rate limiter
+		async with self.semaphore:
+			await self.bucket.acquire()
+			self.requests += 1
+			yield
+
+	def report(self, elapsed):
+		rate = self.downloaded / elapsed if elapsed > 0 else 0
+		print(f"{bcol.HEADER}Match downloads: {self.downloaded} stored, {self.failed} failed, {self.requests} requests, "
+			f"{self.bytes / 1024:.0f} KB in {elapsed:.1f}s ({rate:.2f} matches/s).{bcol.ENDC}")
+
+
+async def download_matches_async(match_uids):
+	start = time.monotonic()
+	downloader = MatchDownloader()
+	results = await asyncio.gather(*[downloader.fetch(uid) for uid in match_uids])
+	downloader.report(time.monotonic() - start)
+	return dict(zip([str(uid) for uid in match_uids], results))
+
+
+def download_matches(match_uids):
+	"""
+	Downloads the given matches into the match store. Returns {match_uid: success}.
+	"""
+	if not match_uids:
+		return {}
+	print(f"Downloading {len(match_uids)} matches, at most {api_requests_per_second} requests per second...")
+	return asyncio.run(download_matches_async(match_uids))
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+try:
+	import msgpack
+except ImportError:
+	msgpack = None
+
+from config import profile_dir, match_store_dir, match_store_format, Bcol
+
+# Shared match store. Every match detail file is stored once, keyed by match_uid, in match_store_dir,
+# instead of every gamer keeping their own copy of every match they shared with the squad. Which matches belong to
+# a gamer is already in their latest_comp_games.json.
+# The store directory is scanned once per run, and parsed matches are kept in memory,
+# so a match shared by a 6-stack is read from disk once.
+# Matches are stored as msgpack when it is installed (smaller, and much faster to parse), otherwise as compact JSON.
+# Both can be read, so a half converted store is fine.
+# matches.json is a per-gamer manifest older stores wrote, not a match
+NON_MATCH_FILES = ["latest_comp_games.json", "matches.json"]
+EXTENSIONS = {"json": ".json", "msgpack": ".msgpack"}
+
+bcol = Bcol()
+
+
+def storage_format(requested=match_store_format):
+	if requested == "msgpack" and msgpack is None:
+		return "json"
+	return requested
+
+
+def encode_match(data, fmt):
+	if fmt == "msgpack":
+		return msgpack.packb(data, use_bin_type=True)
+	return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def decode_match(raw, fmt):
+	if fmt == "msgpack":
+		if msgpack is None:
+			exit(f"{bcol.FAIL}The match store holds msgpack files, but msgpack is not installed. Run pip install msgpack.{bcol.ENDC}")
+		return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+	return json.loads(raw)
+
+
+class MatchStore():
+
+	def __init__(self, root=match_store_dir, profiles=profile_dir, fmt=match_store_format):
+		self.root = root
+		self.profiles = profiles
+		self.format = storage_format(fmt)
+		# match_uid -> the format it is stored in
+		self.uids = {}
+		self.root_mtime = None
+		self.loaded = {}
+		self.lock = threading.RLock()
+		os.makedirs(self.root, exist_ok=True)
+		self.refresh()
+
+	def refresh(self):
+		# Only re-scan when something outside this process has touched the store
+		with self.lock:
+			mtime = os.stat(self.root).st_mtime_ns
+			if mtime == self.root_mtime:
+				return
+			uids = {}
+			for filename in os.listdir(self.root):
+				match_uid, ext = os.path.splitext(filename)
+				for fmt, fmt_ext in EXTENSIONS.items():
+					# If a match exists in both formats, prefer the one we write
+					if ext == fmt_ext and (match_uid not in uids or fmt == self.format):
+						uids[match_uid] = fmt
+			self.uids = uids
+			self.root_mtime = mtime
+
+	def path(self, match_uid, fmt=None):
+		fmt = fmt or self.uids.get(str(match_uid), self.format)
+		return os.path.join(self.root, f"{match_uid}{EXTENSIONS[fmt]}")
+
+	def has(self, match_uid):
+		return str(match_uid) in self.uids
+
+	def load(self, match_uid):
+		"""
+		Returns the parsed match, or None if it is not in the store.
+		The object is shared between every gamer that loads it, so callers should copy before adding their own keys.
+		"""
+		match_uid = str(match_uid)
+		with self.lock:
+			if match_uid in self.loaded:
+				return self.loaded[match_uid]
+			if match_uid not in self.uids:
+				return None
+			fmt = self.uids[match_uid]
+			with open(self.path(match_uid, fmt), 'rb') as f:
+				data = decode_match(f.read(), fmt)
+			self.loaded[match_uid] = data
+			return data
+
+	def write(self, match_uid, data):
+		match_uid = str(match_uid)
+		path = self.path(match_uid, self.format)
+		tmp_path = path + ".tmp"
+		with open(tmp_path, "wb") as f:
+			f.write(encode_match(data, self.format))
+		os.replace(tmp_path, path)
+		with self.lock:
+			previous = self.uids.get(match_uid)
+			self.uids[match_uid] = self.format
+			self.loaded[match_uid] = data
+		# Converted from the other format, drop the old copy
+		if previous and previous != self.format:
+			os.remove(self.path(match_uid, previous))
+
+	def convert(self):
+		"""
+		Rewrites every stored match that is not in the configured format yet.
+		"""
+		pending = [match_uid for match_uid, fmt in self.uids.items() if fmt != self.format]
+		if not pending:
+			return 0
+		print(f"Converting {len(pending)} stored matches to {self.format}...")
+		for match_uid in pending:
+			self.write(match_uid, self.load(match_uid))
+			# A one-off, no need to keep the whole store in memory
+			self.loaded.pop(match_uid, None)
+		print(f"{bcol.OKGREEN}Converted {len(pending)} matches to {self.format}.{bcol.ENDC}")
+		return len(pending)
+
+	# --- Migration from per-gamer copies ---
+
+	def legacy_match_files(self, nickname):
+		gamer_dir = os.path.join(self.profiles, nickname)
+		files = []
+		for filename in os.listdir(gamer_dir):
+			if not filename.endswith(".json") or filename in NON_MATCH_FILES or filename == f"{nickname}.json":
+				continue
+			files.append(filename)
+		return files
+
+	def migrate(self):
+		"""
+		Moves every profiles/<nick>/<match_uid>.json into the store (keeping one copy).
+		Safe to run again, it only touches leftover copies.
+		"""
+		moved = 0
+		removed = 0
+		for entry in os.scandir(self.profiles):
+			if not entry.is_dir() or os.path.abspath(entry.path) == os.path.abspath(self.root):
+				continue
+			nickname = entry.name
+			legacy_files = self.legacy_match_files(nickname)
+			if not legacy_files:
+				continue
+			print(f"Migrating {len(legacy_files)} match files for {nickname} into the shared match store...")
+			for filename in legacy_files:
+				match_uid = filename[:-5]
+				source = os.path.join(entry.path, filename)
+				if self.has(match_uid):
+					os.remove(source)
+					removed += 1
+				else:
+					# Rewrite rather than move, so the store only holds compact files
+					try:
+						with open(source, 'r') as f:
+							data = json.load(f)
+					except json.JSONDecodeError:
+						print(f"{bcol.WARNING}Skipping unreadable match file {source}{bcol.ENDC}")
+						continue
+					self.write(match_uid, data)
+					os.remove(source)
+					moved += 1
+		if moved or removed:
+			print(f"{bcol.OKGREEN}Match store migration done: {moved} matches stored, {removed} duplicate copies removed.{bcol.ENDC}")
+		self.convert()
+		return moved, removed
+
+	def needs_migration(self):
+		for entry in os.scandir(self.profiles):
+			if entry.is_dir() and os.path.abspath(entry.path) != os.path.abspath(self.root):
+				if self.legacy_match_files(entry.name):
+					return True
+		return False
+
+	# --- Benchmark ---
+
+	def benchmark(self, rounds=3):
+		"""
+		Writes every stored match in each format to a temp dir, and compares disk size and the time to parse them all.
+		"indented json" is what get_player_matches used to write into every profile folder.
+		"""
+		matches = [self.load(match_uid) for match_uid in sorted(self.uids)]
+		if not matches:
+			print("The match store is empty, nothing to benchmark.")
+			return []
+		variants = [("indented json", "json", lambda data: json.dumps(data, indent=4).encode("utf-8"))]
+		variants.append(("compact json", "json", lambda data: encode_match(data, "json")))
+		if msgpack is not None:
+			variants.append(("msgpack", "msgpack", lambda data: encode_match(data, "msgpack")))
+
+		results = []
+		tmp_dir = tempfile.mkdtemp()
+		try:
+			for name, fmt, encode in variants:
+				paths = []
+				for i, data in enumerate(matches):
+					path = os.path.join(tmp_dir, f"{i}{EXTENSIONS[fmt]}")
+					with open(path, "wb") as f:
+						f.write(encode(data))
+					paths.append(path)
+				size = sum(os.path.getsize(path) for path in paths)
+				best = None
+				for _ in range(rounds):
+					start = time.perf_counter()
+					for path in paths:
+						with open(path, 'rb') as f:
+							decode_match(f.read(), fmt)
+					elapsed = time.perf_counter() - start
+					best = elapsed if best is None else min(best, elapsed)
+				for path in paths:
+					os.remove(path)
+				results.append({"format": name, "bytes": size, "load_seconds": best})
+		finally:
+			shutil.rmtree(tmp_dir, ignore_errors=True)
+
+		print(f"{bcol.HEADER}{len(matches)} matches{bcol.ENDC}")
+		print(f"{'format':<16}{'disk size':>12}{'load time':>12}")
+		for result in results:
+			print(f"{result['format']:<16}{result['bytes'] / 1024 / 1024:>10.2f}MB{result['load_seconds'] * 1000:>10.0f}ms")
+		return results
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+	global _store
+	with _store_lock:
+		if _store is None:
+			_store = MatchStore()
+			if _store.needs_migration():
+				_store.migrate()
+		else:
+			_store.refresh()
+		return _store
+
+
+if __name__ == '__main__':
+	for arg in sys.argv:
+		if arg == "--migrate":
+			# Moves per-gamer match files into the store, and converts it to match_store_format
+			MatchStore().migrate()
+		if arg == "--benchmark":
+			MatchStore().benchmark()
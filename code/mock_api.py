@@ -0,0 +1,374 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import hashlib
+import datetime
+import tempfile
+from aiohttp import web
+from zoneinfo import ZoneInfo
+
+import match_store
+import synthetic
+from config import Bcol, time_zone, default_player_head
+
+# Local stand-in for marvelrivalsapi.com, serving a synthetic squad (synthetic.py), so the fetch stage
+# (async_broker.py, Gamer_master.get_player_matches, match_fetcher.py, hero_assets.py) can be run and load-tested offline.
+# Implements find-player, player, player update, v2 match-history, match, heroes, patch-notes and the image paths.
+# Latency, random 429s and 5xx errors, a rate limit and how long a requested profile update takes are configurable.
+# Which requests fail is decided from the seed, the path and how often that path was asked for, so the same run fails
+# the same way whatever order the requests come in.
+#
+#   python mock_api.py --serve        (listens on 127.0.0.1:8766, then run the pipeline with
+#                                      RIVALS_BASE_API=http://127.0.0.1:8766/api/v1/
+#                                      RIVALS_BASE_API_V2=http://127.0.0.1:8766/api/v2/
+#                                      RIVALS_IMAGE_API=http://127.0.0.1:8766
+#                                      and the gamerlist it prints)
+#   python mock_api.py --load-test    (runs the whole fetch stage against it, from an empty install in a temp folder)
+#
+# Options for both: --players 6 --matches 30 --seed 1 --latency 0.05 --jitter 0.05 --error-rate 0 --throttle-rate 0
+#                   --rate-limit 0 (requests per second per key, 0 is unlimited) --update-delay 3
+#                   --rounds 1 (--load-test only, runs the fetch stage again in the same folder, like the next day's run)
+HOST = "127.0.0.1"
+PORT = 8766
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Profiles start out this old, so the broker has to ask for an update and poll for it
+STALE_HOURS = 48
+# Every image claims to be this old, for If-Modified-Since
+IMAGE_DATE = "Mon, 06 Jan 2025 00:00:00 GMT"
+RESULT_PREFIX = "MOCK_API_RESULT "
+
+bcol = Bcol()
+
+
+class RivalsApiStub():
+
+	def __init__(self, fixtures, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, rate_limit=0, update_delay=3.0, seed=1):
+		"""
+		fixtures is a folder written by synthetic.generate(). rate_limit is requests per second per API key (0 is unlimited),
+		update_delay is how many seconds a requested profile update takes before last_history_update moves.
+		"""
+		self.latency = latency
+		self.jitter = jitter
+		self.error_rate = error_rate
+		self.throttle_rate = throttle_rate
+		self.rate_limit = rate_limit
+		self.update_delay = update_delay
+		self.seed = seed
+		self.profiles = {}
+		self.uids = {}
+		profiles = os.path.join(fixtures, "profiles")
+		for nickname in sorted(os.listdir(profiles)):
+			path = os.path.join(profiles, nickname, f"{nickname}.json")
+			if not os.path.exists(path):
+				continue
+			with open(path, 'r') as f:
+				profile = json.load(f)
+			self.profiles[str(profile["uid"])] = profile
+			self.uids[nickname.lower()] = profile
+		self.store = match_store.MatchStore(root=os.path.join(profiles, "_matches"), profiles=profiles)
+		with open(os.path.join(fixtures, "code", "heroes.json"), 'r') as f:
+			self.heroes = json.load(f)
+		self.heads = os.path.join(fixtures, "img", "player_heads")
+		stale = datetime.datetime.now(ZoneInfo(time_zone)) - datetime.timedelta(hours=STALE_HOURS)
+		# uid -> when an update was last asked for, when the history last moved, and when the pending update lands
+		self.updates = {uid: {"requested": stale, "history": stale, "ready_at": None} for uid in self.profiles}
+		self.seen = {}
+		self.buckets = {}
+		self.requests = {}
+		self.statuses = {}
+
+	def faults(self, request):
+		# One generator per request, seeded from the path and how many times it was asked for
+		key = request.path_qs
+		self.seen[key] = self.seen.get(key, 0) + 1
+		return random.Random(f"{self.seed}:{key}:{self.seen[key]}")
+
+	def allowed(self, api_key):
+		# Token bucket per key, a second's worth of burst
+		if not self.rate_limit:
+			return True
+		now = time.monotonic()
+		tokens, updated = self.buckets.get(api_key, (self.rate_limit, now))
+		tokens = min(self.rate_limit, tokens + (now - updated) * self.rate_limit)
+		if tokens < 1:
+			self.buckets[api_key] = (tokens, now)
+			return False
+		self.buckets[api_key] = (tokens - 1, now)
+		return True
+
+	@web.middleware
+	async def inject(self, request, handler):
+		route = request.match_info.route.name or "unknown"
+		self.requests[route] = self.requests.get(route, 0) + 1
+		response = await self.respond(request, handler)
+		self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+		return response
+
+	async def respond(self, request, handler):
+		rng = self.faults(request)
+		if self.latency or self.jitter:
+			await asyncio.sleep(self.latency + rng.uniform(0, self.jitter))
+		if request.path.startswith("/api/"):
+			api_key = request.headers.get("x-api-key")
+			if not api_key:
+				return web.json_response({"error": True, "message": "Missing API key"}, status=401)
+			if not self.allowed(api_key):
+				return web.json_response({"error": True, "message": "Rate limit exceeded"}, status=429, headers={"Retry-After": "1"})
+		if rng.random() < self.throttle_rate:
+			return web.json_response({"error": True, "message": "Too many requests"}, status=429, headers={"Retry-After": "1"})
+		if rng.random() < self.error_rate:
+			return web.json_response({"error": True, "message": "Internal server error"}, status=rng.choice([500, 502, 503]))
+		response = await handler(request)
+		if request.path.startswith("/api/") and response.status == 200:
+			# ETags on the API answers too, so clients can revalidate
+			etag = '"' + hashlib.sha1(response.body).hexdigest() + '"'
+			if request.headers.get("If-None-Match") == etag:
+				return web.Response(status=304, headers={"ETag": etag})
+			response.headers["ETag"] = etag
+		return response
+
+	def profile(self, uid):
+		profile = dict(self.profiles[uid])
+		state = self.updates[uid]
+		if state["ready_at"] and datetime.datetime.now(ZoneInfo(time_zone)) >= state["ready_at"]:
+			state["history"] = state["ready_at"]
+			state["ready_at"] = None
+		profile["updates"] = dict(profile["updates"],
+			last_update_request=synthetic.api_date(state["requested"]), last_history_update=synthetic.api_date(state["history"]))
+		return profile
+
+	def not_found(self, what):
+		return web.json_response({"error": True, "message": f"{what} not found"}, status=404)
+
+	async def find_player(self, request):
+		profile = self.uids.get(request.match_info["name"].lower())
+		if not profile:
+			return self.not_found("Player")
+		return web.json_response({"name": profile["name"], "uid": profile["uid"]})
+
+	async def player(self, request):
+		uid = request.match_info["uid"]
+		if uid not in self.profiles:
+			return self.not_found("Player")
+		return web.json_response(self.profile(uid))
+
+	async def update_player(self, request):
+		uid = request.match_info["uid"]
+		if uid not in self.profiles:
+			return self.not_found("Player")
+		now = datetime.datetime.now(ZoneInfo(time_zone))
+		self.updates[uid]["requested"] = now
+		self.updates[uid]["ready_at"] = now + datetime.timedelta(seconds=self.update_delay)
+		return web.json_response({"success": True, "message": "Player data update requested"})
+
+	async def match_history(self, request):
+		profile = self.profiles.get(request.match_info["uid"])
+		if not profile:
+			return self.not_found("Player")
+		limit = int(request.query.get("limit", 20))
+		history = profile["match_history"]
+		if "game_mode" in request.query:
+			history = [match for match in history if str(match["game_mode_id"]) == request.query["game_mode"]]
+		return web.json_response({"match_history": history[:limit]})
+
+	async def match(self, request):
+		data = self.store.load(request.match_info["match_uid"])
+		if data is None:
+			return self.not_found("Match")
+		return web.json_response(data)
+
+	async def heroes_list(self, request):
+		return web.json_response(self.heroes)
+
+	async def patch_notes(self, request):
+		limit = int(request.query.get("limit", 10))
+		patches = [{"id": f"patch-{n}", "title": f"Version 20250{n % 9 + 1}", "date": f"2025-0{n % 9 + 1}-15",
+			"overview": f"Balance changes {n}", "full_content": ""} for n in range(limit)]
+		return web.json_response({"total_patches": limit, "formatted_patches": patches})
+
+	async def image(self, request):
+		path = request.match_info["path"]
+		if not path.endswith((".png", ".webp", ".jpg")):
+			return self.not_found("Page")
+		# Player heads are the real ones, everything else gets the default head
+		head = os.path.join(self.heads, path.rsplit("player_head_", 1)[-1]) if "player_head_" in path else None
+		if not head or not os.path.exists(head):
+			head = os.path.join(self.heads, default_player_head)
+		with open(head, 'rb') as f:
+			body = f.read()
+		etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+		if request.headers.get("If-None-Match") == etag or request.headers.get("If-Modified-Since") == IMAGE_DATE:
+			return web.Response(status=304, headers={"ETag": etag})
+		return web.Response(body=body, content_type="image/png", headers={"ETag": etag, "Last-Modified": IMAGE_DATE})
+
+	def app(self):
+		app = web.Application(middlewares=[self.inject])
+		app.router.add_get("/api/v1/find-player/{name}", self.find_player, name="find-player")
+		app.router.add_get("/api/v1/player/{uid}/update", self.update_player, name="update")
+		app.router.add_get("/api/v1/player/{uid}", self.player, name="player")
+		app.router.add_get("/api/v2/player/{uid}/match-history", self.match_history, name="match-history")
+		app.router.add_get("/api/v1/match/{match_uid}", self.match, name="match")
+		app.router.add_get("/api/v1/heroes", self.heroes_list, name="heroes")
+		app.router.add_get("/api/v1/patch-notes", self.patch_notes, name="patch-notes")
+		app.router.add_get("/{path:.*}", self.image, name="image")
+		return app
+
+	def report(self):
+		print(f"{bcol.HEADER}Mock API served {sum(self.requests.values())} requests{bcol.ENDC}")
+		for route, count in sorted(self.requests.items(), key=lambda item: item[1], reverse=True):
+			print(f"  {route:<15}{count:>6}")
+		print("  statuses: " + ", ".join(f"{status}: {count}" for status, count in sorted(self.statuses.items())))
+
+
+async def start_stub(stub, host=HOST, port=PORT):
+	runner = web.AppRunner(stub.app())
+	await runner.setup()
+	await web.TCPSite(runner, host, port).start()
+	return runner
+
+
+def api_env(host=HOST, port=PORT):
+	"""
+	The settings that point config.py at the mock.
+	"""
+	return {
+		"RIVALS_BASE_API": f"http://{host}:{port}/api/v1/",
+		"RIVALS_BASE_API_V2": f"http://{host}:{port}/api/v2/",
+		"RIVALS_IMAGE_API": f"http://{host}:{port}",
+	}
+
+
+def make_fixtures(settings):
+	fixtures = tempfile.mkdtemp(prefix="rivals_fixtures_")
+	nicknames = synthetic.generate(fixtures, players=settings["players"], matches_per_player=settings["matches"],
+		seed=settings["seed"], ai_summaries=False, game_nights=False)
+	return fixtures, nicknames
+
+
+def make_stub(fixtures, settings):
+	return RivalsApiStub(fixtures, latency=settings["latency"], jitter=settings["jitter"], error_rate=settings["error_rate"],
+		throttle_rate=settings["throttle_rate"], rate_limit=settings["rate_limit"], update_delay=settings["update_delay"], seed=settings["seed"])
+
+
+def fetch(nicknames):
+	"""
+	Runs in the child process of --load-test, from an empty install, with config.py pointed at the mock.
+	Every step of the fetch stage is timed, a failing step is reported rather than stopping the others.
+	"""
+	import async_broker
+	import hero_assets
+	import api_cache
+	import api_client
+	from gamer_master import Gamer_master
+
+	steps = [
+		("heroes", async_broker.get_heroes),
+		("uids", lambda: async_broker.get_gamer_uids(nicknames)),
+		("profiles", lambda: asyncio.run(async_broker.update_gamer_data(nicknames, force_update=False))),
+		("matches", lambda: async_broker.download_gamer_assets(Gamer_master(nicknames, load_matches=False))),
+		("assets", hero_assets.sync_hero_assets),
+		("patches", async_broker.get_latest_patches),
+	]
+	results = {}
+	for name, step in steps:
+		start = time.perf_counter()
+		try:
+			step()
+			error = None
+		except (Exception, SystemExit) as e:
+			# Some of the broker exit()s when something it needs is missing
+			error = f"{type(e).__name__}: {e}"
+		results[name] = {"seconds": time.perf_counter() - start, "error": error}
+	return {"steps": results, "api_cache": api_cache.stats, "api_client": api_client.counters()}
+
+
+async def load_test(settings):
+	fixtures, nicknames = make_fixtures(settings)
+	client = tempfile.mkdtemp(prefix="rivals_client_")
+	stub = make_stub(fixtures, settings)
+	runner = await start_stub(stub)
+	try:
+		# An empty install, like a fresh clone with the gamerlist filled in
+		for folder in ("code", "profiles", os.path.join("img", "player_heads")):
+			os.makedirs(os.path.join(client, folder), exist_ok=True)
+		env = dict(os.environ, **api_env())
+		# Short waits, the mock answers in seconds rather than minutes
+		env.update({"RIVALS_POLL_TIMEOUT": "60", "RIVALS_RATE_LIMITER": "0", "RIVALS_RETRY_DELAY": "1",
+			"RIVALS_REQUESTS_PER_SECOND": "50", "MARVEL_RIVALS_KEY": "mock",
+			"PYTHONPATH": os.pathsep.join([HERE, os.environ.get("PYTHONPATH", "")])})
+		# Later rounds run again in the same folder, like the next pipeline run
+		for round in range(settings["rounds"]):
+			print(f"{bcol.HEADER}Round {round + 1}: fetching {len(nicknames)} players from the mock API{bcol.ENDC}")
+			stub.requests, stub.statuses = {}, {}
+			start = time.monotonic()
+			child = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), "--fetch", json.dumps(nicknames),
+				cwd=os.path.join(client, "code"), env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+			stdout, stderr = await child.communicate()
+			elapsed = time.monotonic() - start
+			results = None
+			for line in stdout.decode("utf-8", "replace").splitlines():
+				if line.startswith(RESULT_PREFIX):
+					results = json.loads(line[len(RESULT_PREFIX):])
+			if results is None:
+				print(stdout.decode("utf-8", "replace")[-3000:])
+				raise RuntimeError(f"The fetch process did not finish:\n{stderr.decode('utf-8', 'replace')[-2000:]}")
+			if "--verbose" in sys.argv:
+				print(stdout.decode("utf-8", "replace"))
+
+			for name, result in results["steps"].items():
+				colour = bcol.FAIL if result["error"] else bcol.OKGREEN
+				print(f"  {colour}{name:<10}{result['seconds']:>7.1f}s{bcol.ENDC}" + (f"  {result['error']}" if result["error"] else ""))
+			expected = match_store.MatchStore(root=os.path.join(fixtures, "profiles", "_matches"), profiles=os.path.join(fixtures, "profiles"))
+			fetched = match_store.MatchStore(root=os.path.join(client, "profiles", "_matches"), profiles=os.path.join(client, "profiles"))
+			profiles = [nickname for nickname in nicknames if os.path.exists(os.path.join(client, "profiles", nickname, f"{nickname}.json"))]
+			print(f"Profiles {len(profiles)}/{len(nicknames)}, matches {len(fetched.uids)}/{len(expected.uids)}, in {elapsed:.1f}s")
+			print("API cache: " + ", ".join(f"{key} {value}" for key, value in results["api_cache"].items()))
+			print("API client: " + ", ".join(f"{key} {value}" for key, value in results["api_client"].items()))
+			stub.report()
+	finally:
+		await runner.cleanup()
+		if "--keep" in sys.argv:
+			print(f"Kept {fixtures} and {client}")
+		else:
+			shutil.rmtree(fixtures, ignore_errors=True)
+			shutil.rmtree(client, ignore_errors=True)
+
+
+async def serve(settings):
+	fixtures, nicknames = make_fixtures(settings)
+	stub = make_stub(fixtures, settings)
+	await start_stub(stub)
+	print(f"Mock API listening on http://{HOST}:{PORT}, serving {fixtures}")
+	for key, value in api_env().items():
+		print(f"  {key}={value}")
+	print(f"gamerlist = {nicknames}")
+	try:
+		while True:
+			await asyncio.sleep(3600)
+	finally:
+		stub.report()
+		shutil.rmtree(fixtures, ignore_errors=True)
+
+
+if __name__ == '__main__':
+	if "--fetch" in sys.argv:
+		nicknames = json.loads(sys.argv[sys.argv.index("--fetch") + 1])
+		print(RESULT_PREFIX + json.dumps(fetch(nicknames)))
+		sys.exit(0)
+
+	settings = {"players": 6, "matches": 30, "seed": 1, "latency": 0.05, "jitter": 0.05, "error_rate": 0.0, "throttle_rate": 0.0,
+		"rate_limit": 0, "update_delay": 3.0, "rounds": 1}
+	args = sys.argv[1:]
+	for i, arg in enumerate(args):
+		key = arg[2:].replace("-", "_")
+		if arg.startswith("--") and key in settings and i + 1 < len(args):
+			settings[key] = type(settings[key])(args[i + 1])
+
+	if "--serve" in sys.argv:
+		asyncio.run(serve(settings))
+	if "--load-test" in sys.argv:
+		asyncio.run(load_test(settings))
@@ -0,0 +1,186 @@
+import numpy as np
+
+import hero_catalog
+
+# Columnar view of every squad match. g.match_data is walked once, and each gamer's own participant row is flattened
+# into NumPy columns, so the analyses in Gamer_master can select and sum with masks instead of re-walking
+# match_details.match_players for every hero, night and stat.
+#
+# One participant row per (gamer, match in g.match_data), in gamer order and then match order, which is the order
+# the old loops visited them in. match_pos/participant_pos point back at the raw objects for the few places
+# that still need them (hero dicts, match_array).
+# Rows are looked up by nickname, never by position in Gamer_master.gamers, which shrinks once sanitize_gamerlist runs.
+# The gamer column is the table's own numbering (gamer_of maps a nickname to it).
+# Every hero a participant played also gets a row in the hero columns (hero_*), pointing at its participant row.
+
+MATCH_RESULTS = {0: "loss", 1: "win", 2: "draw"}
+
+
+def to_column(values, dtype=None):
+	# Let NumPy pick int64 or float64 from the data, so integer stats stay integers
+	if not values:
+		return np.array([], dtype=dtype or np.int64)
+	return np.array(values, dtype=dtype)
+
+
+class ParticipantTable():
+
+	def __init__(self, gamers, night_of, duration_of, performance_stats=()):
+		"""
+		night_of(timestamp) and duration_of(duration) are Gamer_master.get_game_night_date / duration_to_seconds.
+		performance_stats are extra stats taken from the match history's own hero entry (primary_<stat> columns).
+		"""
+		catalog = hero_catalog.load_catalog()
+		rows = {
+			"gamer": [], "player": [], "player_uid": [], "match_pos": [], "participant_pos": [],
+			"match_uid": [], "timestamp": [], "night": [],
+			"hero_id": [], "role": [], "played_primary": [], "has_participant": [],
+			"kills": [], "deaths": [], "assists": [], "damage": [], "heal": [], "taken": [],
+			"play_time": [], "win": [], "camp": [], "mvp": [], "svp": [],
+			"top_hero_id": [], "team_heroes": [], "synergy_win": [], "bans": []
+		}
+		for stat in performance_stats:
+			rows["primary_"+stat] = []
+		hero_rows = {"hero_row": [], "hero_gamer": [], "hero_hero_id": [], "hero_play_time": []}
+		nights = {}
+		self.gamer_of = {}
+
+		for gamer_index, g in enumerate(gamers):
+			self.gamer_of[g.nickname] = gamer_index
+			for match_pos, match in enumerate(g.match_data):
+				details = match["match_details"]
+				extended = match["extended_data"]
+				player_hero = extended["match_player"]["player_hero"]
+
+				participant_pos = -1
+				for pos, participant in enumerate(details["match_players"]):
+					if participant["nick_name"] == g.nickname:
+						participant_pos = pos
+						break
+				participant = details["match_players"][participant_pos] if participant_pos >= 0 else {}
+				# The synergy columns (player_uid, top_hero_id, team_heroes, synergy_win) follow the participant with the
+				# gamer's uid, like analyze_player_synergy always has. The rest follow the nickname, like the scoring did.
+				synergy_participant = next((p for p in details["match_players"] if p["player_uid"] == g.id), None)
+				synergy_heroes = synergy_participant.get("player_heroes") if synergy_participant else None
+				played = participant.get("player_heroes") or []
+
+				timestamp = extended["match_time_stamp"]
+				if timestamp not in nights:
+					nights[timestamp] = night_of(timestamp)
+				hero_id = player_hero["hero_id"]
+
+				row = len(rows["gamer"])
+				rows["gamer"].append(gamer_index)
+				rows["player"].append(g.nickname)
+				rows["player_uid"].append(synergy_participant["player_uid"] if synergy_participant else None)
+				rows["match_pos"].append(match_pos)
+				rows["participant_pos"].append(participant_pos)
+				rows["match_uid"].append(details["match_uid"])
+				rows["timestamp"].append(timestamp)
+				rows["night"].append(nights[timestamp])
+				rows["hero_id"].append(hero_id)
+				rows["role"].append(catalog.get(int(hero_id), {}).get("role"))
+				rows["played_primary"].append(any(h["hero_id"] == hero_id for h in played))
+				rows["has_participant"].append(participant_pos >= 0)
+				rows["kills"].append(participant.get("kills", 0))
+				rows["deaths"].append(participant.get("deaths", 0))
+				rows["assists"].append(participant.get("assists", 0))
+				rows["damage"].append(participant.get("total_hero_damage", 0))
+				rows["heal"].append(participant.get("total_hero_heal", 0))
+				rows["taken"].append(participant.get("total_damage_taken", 0))
+				rows["play_time"].append(duration_of(extended["match_play_duration"]))
+				rows["win"].append(participant.get("is_win", -1))
+				rows["camp"].append(participant.get("camp", -1))
+				rows["mvp"].append(details["mvp_uid"] == g.id)
+				rows["svp"].append(details["svp_uid"] == g.id)
+				rows["top_hero_id"].append(max(synergy_heroes, key=lambda h: h["play_time"])["hero_id"] if synergy_heroes else -1)
+				rows["team_heroes"].append(tuple(
+					p["cur_hero_id"] for p in details["match_players"]
+					if synergy_participant and p["camp"] == synergy_participant["camp"] and p["player_uid"] != g.id
+				))
+				rows["synergy_win"].append(synergy_participant.get("is_win", -1) if synergy_participant else -1)
+				rows["bans"].append(tuple(
+					bp["hero_id"] for bp in details.get("dynamic_fields", {}).get("ban_pick_info", []) if bp["is_pick"] == 0
+				))
+				for stat in performance_stats:
+					rows["primary_"+stat].append(player_hero.get(stat, 0))
+
+				for h in played:
+					hero_rows["hero_row"].append(row)
+					hero_rows["hero_gamer"].append(gamer_index)
+					hero_rows["hero_hero_id"].append(h["hero_id"])
+					hero_rows["hero_play_time"].append(h["play_time"])
+
+		object_columns = ["player", "player_uid", "match_uid", "night", "role", "team_heroes", "bans"]
+		for name, values in rows.items():
+			if name in object_columns:
+				column = np.empty(len(values), dtype=object)
+				column[:] = values
+			elif name in ["played_primary", "has_participant", "mvp", "svp"]:
+				column = to_column(values, dtype=bool)
+			else:
+				column = to_column(values)
+			setattr(self, name, column)
+		for name, values in hero_rows.items():
+			setattr(self, name, to_column(values))
+		self.size = len(rows["gamer"])
+
+	def rows(self, nickname, mask=None):
+		"""
+		Row indices of one gamer, optionally narrowed by a boolean mask over the whole table. Always in match order.
+		"""
+		selected = self.gamer == self.gamer_of.get(nickname, -1)
+		if mask is not None:
+			selected &= mask
+		return np.flatnonzero(selected)
+
+	def hero_match_rows(self, nickname, hero_id):
+		"""
+		Participant rows where this gamer played the hero, once per time it shows up in player_heroes.
+		"""
+		selected = (self.hero_gamer == self.gamer_of.get(nickname, -1)) & (self.hero_hero_id == hero_id)
+		return self.hero_row[selected]
+
+	def total(self, column, rows):
+		# Running sum rather than np.sum, so floats add up in the same order (and to the same value) as a plain loop
+		values = getattr(self, column)[rows]
+		if len(values) == 0:
+			return 0
+		return np.cumsum(values)[-1].item()
+
+	def count(self, column, rows, value):
+		return int(np.count_nonzero(getattr(self, column)[rows] == value))
+
+	def group(self, rows, column):
+		"""
+		Splits rows by the value of a column. Returns (keys, group_of_row), keys in order of first appearance,
+		and for every row the index of its key. Feed group_of_row to group_totals / group_counts.
+		"""
+		keys = getattr(self, column)[rows]
+		values, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+		order = np.argsort(first, kind="stable")
+		rank = np.empty_like(order)
+		rank[order] = np.arange(len(order))
+		return values[order].tolist(), rank[inverse.reshape(-1)]
+
+	def group_totals(self, column, rows, group_of_row, group_count):
+		# bincount adds the weights in row order, so each group sums exactly like a plain loop would
+		values = getattr(self, column)[rows]
+		sums = np.bincount(group_of_row, weights=values, minlength=group_count)
+		if values.dtype.kind in "iub":
+			return sums.astype(np.int64).tolist()
+		return sums.tolist()
+
+	def group_counts(self, group_of_row, group_count, mask=None):
+		if mask is not None:
+			group_of_row = group_of_row[mask]
+		return np.bincount(group_of_row, minlength=group_count).tolist()
+
+	def gamer_rows(self, nicknames):
+		"""
+		Row indices of every gamer in nicknames, in table order.
+		"""
+		return np.flatnonzero(np.isin(self.gamer, [self.gamer_of[nickname] for nickname in nicknames if nickname in self.gamer_of]))
+
+	def match_result(self, row):
+		return {"match_id": self.match_uid[row], "win": MATCH_RESULTS[int(self.win[row])], "duration": self.play_time[row].item()}
@@ -1,69 +1,185 @@
+import os
 import asyncio
+import threading
 import async_broker
+import api_client
+import gamer
 import gamer_master
 import gpt_master
+import hero_assets
 import html_gen
+import profiler
+import config
 import sys
 
-from config import site,squadname,Bcol,base_api, polling_rate, timeout, gamerlist, gamerlist_bronze
+from scheduler import Stage, Scheduler, value_fingerprint
+from config import site,squadname,Bcol,base_api, polling_rate, polling_first_probe, timeout, squads, profile_dir, match_store_dir
+
+bcol = Bcol()
+
+# The config.py values the game nights and the page are built from (scoring weights, thresholds, chart breakpoints...).
+# They go in the stages' params, so changing one reruns the stage like a new match would.
+ANALYSIS_SETTINGS = [
+	"current_season", "time_zone", "role_lock", "gamer_card_hero_count", "match_limit", "game_mode", "average_match_time",
+	"CATEGORY_MAX_POINTS", "MAX_STAT_VALUES", "MAX_STEPS", "STAR_ICONS", "performances", "matchup_threshold", "ROLE_SCORING_CATEGORIES",
+	"player_max_score", "ai_enabled", "minimum_time_played_to_count_match", "stack_score_count",
+	"TOAST_MESSAGES", "ROAST_MESSAGES", "NEUTRAL_MESSAGES", "BELOW_MESSAGES", "ABOVE_MESSAGES",
+	"color_threshold", "color_min_saturation", "costume_attachments", "default_player_head", "level_to_rank_map",
+]
+SITE_SETTINGS = ANALYSIS_SETTINGS + [
+	"site_data_folder", "rank_history_count", "squadname",
+	"rank_chart_break_points", "rank_chart_break_points_colors", "rank_chart_break_points_names", "display_chart_rank_names",
+]
+
+
+def settings_hash(names):
+	return value_fingerprint({name: getattr(config, name) for name in names})
+
+
+def squad_stages(squad, shared_after):
+	"""
+	The analysis, records, AI, TTS and site stages for one squad, named "<squad>:<stage>".
+	They only touch the squad's own folders, so every squad's stages can run side by side.
+	"""
+	name = squad["name"]
+	gamers = squad["gamers"]
+	game_nights_folder = squad["game_nights_folder"]
+	records_location = squad["records"]
+	audio_folder = squad["audio_folder"]
+	profile_files = [os.path.join(profile_dir, gamer, f"{gamer}.json") for gamer in gamers]
+	# What the matches stage downloads: each gamer's match list, and the match details in the shared store
+	match_files = [os.path.join(profile_dir, gamer, "latest_comp_games.json") for gamer in gamers] + [match_store_dir]
+	# The code the game nights and the page come out of, the page's templates are html_gen's f-strings
+	analysis_code = [gamer_master.__file__]
+	site_code = [gamer_master.__file__, html_gen.__file__]
+	# The analysis model, shared by the stages after it. Built by the analysis stage, or by the site if analysis was skipped.
+	shared = {"g_master": None}
+	model_lock = threading.Lock()
+
+	def model():
+		with model_lock:
+			if shared["g_master"] is None:
+				g_master = gamer_master.Gamer_master(gamers, game_nights_folder=game_nights_folder)
+				print(f"{bcol.BOLD}Gamer_master performing analysis for {name}:{bcol.ENDC}")
+				# Do all the banckend analysis we need
+				g_master.initiate()
+				shared["g_master"] = g_master
+			return shared["g_master"]
+
+	def compute_records():
+		g_master = shared["g_master"] or gamer_master.Gamer_master.for_game_nights(game_nights_folder)
+		g_master.compute_kpi_records(records_location=records_location)
+
+	def ai_commentary():
+		print(f"{bcol.BOLD}GPT_master getting AI commentary for {name}:{bcol.ENDC}")
+		# Get Galacta to enrich our data with AI bullshit
+		gpt_master.process_game_nights(game_night_folder=game_nights_folder, records_location=records_location)
+
+	def build_site():
+		print(f"{bcol.BOLD}Building site for {name}:{bcol.ENDC}")
+		html_gen.build_site(gamers, False, g_master=model(), squad=squad)
+
+	return [
+		Stage(f"{name}:analysis", model, after=shared_after, inputs=profile_files+match_files+analysis_code, outputs=[game_nights_folder],
+			params=[gamers, game_nights_folder, settings_hash(ANALYSIS_SETTINGS)]),
+		Stage(f"{name}:records", compute_records, after=[f"{name}:analysis"], inputs=[game_nights_folder], outputs=[records_location]),
+		Stage(f"{name}:gpt", ai_commentary, after=[f"{name}:records"], inputs=[game_nights_folder, records_location], outputs=[game_nights_folder]),
+		# TTS and the site only need the summaries, so they run side by side
+		Stage(f"{name}:tts", lambda: gpt_master.get_latest_tts(game_night_folder=game_nights_folder, audio_folder=audio_folder),
+			after=[f"{name}:gpt"], inputs=[game_nights_folder], outputs=[audio_folder]),
+		Stage(f"{name}:site", build_site, after=[f"{name}:analysis", f"{name}:gpt"],
+			inputs=profile_files+match_files+site_code+[game_nights_folder, records_location, audio_folder], outputs=[squad["page"]],
+			params=[gamers, squad, settings_hash(SITE_SETTINGS)]),
+	]
+
 
 if __name__ == '__main__':
 	feature_flag_skip = False
-	feature_flag_bronze = False
 	force = False
+	explain = False
+	profile = False
+	selected = []
 
-	gamers = gamerlist
-
-	for arg in sys.argv:
+	for i, arg in enumerate(sys.argv):
 		if arg == "--skip":
 			feature_flag_skip = True
 		if arg == "--bronze":
-			feature_flag_bronze = True
-			gamers = gamerlist_bronze
+			selected.append("bronze")
+		if arg == "--squad" and i + 1 < len(sys.argv):
+			selected.append(sys.argv[i + 1])
 		if arg == "--force":
 			force = True
+		if arg == "--explain":
+			# Print why every stage ran or was skipped
+			explain = True
+		if arg == "--profile":
+			# Time, CPU, memory and I/O per stage and per Gamer_master step, see profiler.py
+			profile = True
+		if arg == "--cprofile":
+			# --profile, plus a cProfile dump per stage
+			profile = True
+
+	if selected:
+		unknown = [name for name in selected if name not in [squad["name"] for squad in squads]]
+		if unknown:
+			exit(f"{bcol.FAIL}Unknown squad(s) {', '.join(unknown)}, check squads in config.py{bcol.ENDC}")
+		run_squads = [squad for squad in squads if squad["name"] in selected]
+	else:
+		# Squads without members are left out, unless asked for
+		run_squads = [squad for squad in squads if squad["gamers"]] or squads[:1]
 
-	bcol = Bcol()
+	# Everyone in any of the squads, once
+	gamers = list(dict.fromkeys(gamer for squad in run_squads for gamer in squad["gamers"]))
 
 	# Get the data
 	print(f"######")
 	print(f"###### STARTING PIPELINE FOR {bcol.OKCYAN}{squadname}{bcol.ENDC} on {bcol.OKCYAN}{site}{bcol.ENDC}")
 	print(f"###### Running with current parameters:")
 	print(f"###### API: {bcol.OKCYAN}{base_api}{bcol.ENDC}")
-	print(f"###### Polling rate: {bcol.OKCYAN}{polling_rate/60}{bcol.ENDC} minutes. Timeout set to {bcol.OKCYAN}{timeout/60}{bcol.ENDC} minutes")
+	print(f"###### Polling: first check after {bcol.OKCYAN}{polling_first_probe}{bcol.ENDC} seconds, then at most every {bcol.OKCYAN}{polling_rate/60}{bcol.ENDC} minutes. Timeout set to {bcol.OKCYAN}{timeout/60}{bcol.ENDC} minutes")
+	print(f"###### Squads: {bcol.OKCYAN}{', '.join(squad['name'] for squad in run_squads)}{bcol.ENDC}")
 	print(f"######")
-	print(f"{bcol.BOLD}Async broker fetching data:{bcol.ENDC}")
 
-	async_broker.get_gamer_uids(gamers)
-	if not feature_flag_skip:
-		asyncio.run(async_broker.update_gamer_data(gamers,force_update=force))
-	async_broker.enrich_gamers(gamers)
+	if profile:
+		profiler.start(cprofile="--cprofile" in sys.argv)
+		profiler.instrument(gamer_master.Gamer_master, [
+			"get_player_matches", "get_comp_heroes", "load_and_sort_recent_match_data", "build_participant_table",
+			"get_latest_match_night", "get_hero_matches", "get_hero_stats", "calculate_hero_scores", "calculate_scores",
+			"export_data_objects", "set_matchups", "aggregate_game_night_data", "generate_hero_feedbacks",
+			"classify_performances", "set_synergies", "compute_kpi_records",
+		])
+		profiler.instrument(gamer.Gamer, ["extract_color"])
+		profiler.instrument(async_broker, ["fetch_gamer_data", "update_single_profile"])
+		profiler.instrument(async_broker.UpdatePoller, ["probe"])
 
-	print(f"{bcol.BOLD}Gamer_master performing analysis:{bcol.ENDC}")
-	# Do all the banckend analysis we need
-	if not feature_flag_bronze:
-		g_master = gamer_master.Gamer_master(gamers)
-	else:
-		g_master = gamer_master.Gamer_master(gamers,game_nights_folder="game_nights_bronze")
-	g_master.initiate()
-	g_master.export_data_objects()
-	if not feature_flag_bronze:
-		g_master.compute_kpi_records()
-	else:
-		g_master.compute_kpi_records(records_location="records_bronze.json")
-
-	print(f"{bcol.BOLD}GPT_master getting AI commentary:{bcol.ENDC}")
-	# Get Galacta to enrich our data with AI bullshit
-	if not feature_flag_bronze:
-		gpt_master.process_game_nights()
-	else:
-		gpt_master.process_game_nights(game_night_folder="./game_nights_bronze/", records_location="records_bronze.json")
+	def update_profiles():
+		print(f"{bcol.BOLD}Async broker fetching data:{bcol.ENDC}")
+		asyncio.run(async_broker.update_gamer_data(gamers,force_update=force))
 
-	if not feature_flag_bronze:
-		gpt_master.get_latest_tts()
-	else:
-		gpt_master.get_latest_tts(game_night_folder="./game_nights_bronze/",audio_folder="../audio_bronze/")
+	def download_matches():
+		# Matches and player heads for every squad at once, the squads' analyses only read them
+		async_broker.download_gamer_assets(gamer_master.Gamer_master(gamers, load_matches=False))
 
-	print(f"{bcol.BOLD}Building site:{bcol.ENDC}")
-	html_gen.build_site(gamers, feature_flag_bronze)
+	# Shared by all squads, run once
+	stages = [
+		Stage("uids", lambda: async_broker.get_gamer_uids(gamers), inputs=["uids.json"], outputs=["uids.json"], params=gamers),
+		Stage("assets", hero_assets.sync_hero_assets, inputs=["heroes.json"], outputs=[hero_assets.MANIFEST_FILE],
+			enabled=not feature_flag_skip, why_disabled="--skip"),
+		Stage("profiles", update_profiles, after=["uids"], always=True,
+			enabled=not feature_flag_skip, why_disabled="--skip"),
+		# Only fetches what is missing, cheap when there is nothing new
+		Stage("matches", download_matches, after=["profiles"], always=True),
+	]
+	for squad in run_squads:
+		stages += squad_stages(squad, ["matches"])
 
+	# Enough workers for every squad to have its TTS and site going at the same time
+	workers = max(4, 2 * len(run_squads))
+	if profile:
+		# One stage at a time, so each stage's CPU time, memory and I/O are its own
+		workers = 1
+	results = Scheduler(stages, state_key="pipeline", force=force, explain=explain, workers=workers).run()
+	profiler.report()
+	api_client.report()
+	if "failed" in results.values():
+		sys.exit(1)
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import builtins
+import cProfile
+import functools
+import inspect
+import threading
+import tracemalloc
+from contextlib import nullcontext
+
+from config import cache_dir, Bcol
+
+# Opt-in profiling for pipeline.py --profile.
+# Records wall time, CPU time and peak traced memory per pipeline stage and per instrumented function, and counts
+# HTTP requests, bytes downloaded and files opened for reading or writing while each stage runs.
+# Everything is switched on by start(), so a normal run pays nothing. The report is written to
+# cache/profile/report.json and printed as a table. With cprofile=True every stage also gets a cProfile dump
+# (cache/profile/<stage>.prof, open with python -m pstats or snakeviz).
+#
+# Memory is measured with tracemalloc, which slows Python down a fair bit. Compare times between profiled runs.
+PROFILE_DIR = os.path.join(cache_dir, "profile")
+
+bcol = Bcol()
+
+enabled = False
+counters = {"http_requests": 0, "http_bytes": 0, "files_read": 0, "files_written": 0}
+stages = {}
+functions = {}
+
+_cprofile = False
+_started = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def count(name, amount=1):
+	with _lock:
+		counters[name] += amount
+
+
+# --- Timing and memory ---
+
+def _stack():
+	if not hasattr(_local, "stack"):
+		_local.stack = []
+	return _local.stack
+
+
+def _enter():
+	# tracemalloc only has one peak, so a frame saves the peak so far before its children reset it
+	stack = _stack()
+	if stack:
+		stack[-1]["peak"] = max(stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+	tracemalloc.reset_peak()
+	frame = {"peak": 0, "wall": time.perf_counter(), "cpu": time.thread_time()}
+	stack.append(frame)
+	return frame
+
+
+def _exit():
+	stack = _stack()
+	frame = stack.pop()
+	peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+	if stack:
+		stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+	return time.perf_counter() - frame["wall"], time.thread_time() - frame["cpu"], peak
+
+
+def _add_call(name, wall, cpu=None, peak=None):
+	with _lock:
+		record = functions.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": None, "peak_mb": None})
+		record["calls"] += 1
+		record["wall"] += wall
+		if cpu is not None:
+			record["cpu"] = (record["cpu"] or 0.0) + cpu
+		if peak is not None:
+			record["peak_mb"] = max(record["peak_mb"] or 0.0, peak / 1024 / 1024)
+
+
+def _timed(name, func):
+	if inspect.iscoroutinefunction(func):
+		# Coroutines interleave on one thread, so only their wall time (summed over calls) means anything
+		@functools.wraps(func)
+		async def async_wrapper(*args, **kwargs):
+			start = time.perf_counter()
+			try:
+				return await func(*args, **kwargs)
+			finally:
+				_add_call(name, time.perf_counter() - start)
+		return async_wrapper
+
+	@functools.wraps(func)
+	def wrapper(*args, **kwargs):
+		_enter()
+		try:
+			return func(*args, **kwargs)
+		finally:
+			wall, cpu, peak = _exit()
+			_add_call(name, wall, cpu, peak)
+	return wrapper
+
+
+def instrument(owner, names):
+	"""
+	Replaces owner.<name> (a class or a module) with a timed version, reported as "<owner>.<name>".
+	Module functions are looked up at call time, so calls from inside the module are timed too.
+	"""
+	if not enabled:
+		return
+	for name in names:
+		setattr(owner, name, _timed(f"{owner.__name__}.{name}", getattr(owner, name)))
+
+
+def stage(name):
+	"""
+	Context manager the scheduler wraps every stage in. Does nothing unless start() was called.
+	"""
+	if not enabled:
+		return nullcontext()
+	return _Stage(name)
+
+
+class _Stage():
+
+	def __init__(self, name):
+		self.name = name
+
+	def __enter__(self):
+		with _lock:
+			self.counters = dict(counters)
+		self.profile = cProfile.Profile() if _cprofile else None
+		_enter()
+		if self.profile:
+			self.profile.enable()
+
+	def __exit__(self, *exc):
+		if self.profile:
+			self.profile.disable()
+		wall, cpu, peak = _exit()
+		with _lock:
+			record = {"wall": wall, "cpu": cpu, "peak_mb": peak / 1024 / 1024}
+			record.update({key: counters[key] - self.counters[key] for key in counters})
+			stages[self.name] = record
+		if self.profile:
+			os.makedirs(PROFILE_DIR, exist_ok=True)
+			self.profile.dump_stats(os.path.join(PROFILE_DIR, self.name.replace(":", "_") + ".prof"))
+		return False
+
+
+# --- I/O counters ---
+
+def _count_open(original):
+	@functools.wraps(original)
+	def counted_open(file, mode="r", *args, **kwargs):
+		handle = original(file, mode, *args, **kwargs)
+		count("files_written" if any(flag in mode for flag in "wax+") else "files_read")
+		return handle
+	return counted_open
+
+
+def _hook_requests():
+	import requests
+	original = requests.Session.send
+
+	@functools.wraps(original)
+	def send(self, request, **kwargs):
+		response = original(self, request, **kwargs)
+		count("http_requests")
+		if kwargs.get("stream"):
+			# Not read yet, go by what the server says
+			count("http_bytes", int(response.headers.get("Content-Length", 0)))
+		else:
+			count("http_bytes", len(response.content))
+		return response
+	requests.Session.send = send
+
+
+def _hook_aiohttp():
+	try:
+		import aiohttp
+	except ImportError:
+		return
+	trace = aiohttp.TraceConfig()
+
+	async def on_request_end(session, context, params):
+		count("http_requests")
+
+	async def on_chunk(session, context, params):
+		count("http_bytes", len(params.chunk))
+
+	trace.on_request_end.append(on_request_end)
+	trace.on_response_chunk_received.append(on_chunk)
+	original = aiohttp.ClientSession.__init__
+
+	@functools.wraps(original)
+	def init(self, *args, **kwargs):
+		kwargs["trace_configs"] = list(kwargs.get("trace_configs") or []) + [trace]
+		original(self, *args, **kwargs)
+	aiohttp.ClientSession.__init__ = init
+
+
+def _hook_httpx():
+	# What the openai client talks through
+	try:
+		import httpx
+	except ImportError:
+		return
+	original_send = httpx.Client.send
+	original_async_send = httpx.AsyncClient.send
+
+	def counted(response):
+		count("http_requests")
+		count("http_bytes", int(response.headers.get("content-length", 0)))
+		return response
+
+	@functools.wraps(original_send)
+	def send(self, *args, **kwargs):
+		return counted(original_send(self, *args, **kwargs))
+
+	@functools.wraps(original_async_send)
+	async def async_send(self, *args, **kwargs):
+		return counted(await original_async_send(self, *args, **kwargs))
+	httpx.Client.send = send
+	httpx.AsyncClient.send = async_send
+
+
+def start(cprofile=False):
+	global enabled, _cprofile, _started
+	if enabled:
+		return
+	enabled = True
+	_cprofile = cprofile
+	_started = time.perf_counter()
+	tracemalloc.start()
+	builtins.open = _count_open(builtins.open)
+	_hook_requests()
+	_hook_aiohttp()
+	_hook_httpx()
+
+
+# --- Report ---
+
+def report():
+	"""
+	Writes cache/profile/report.json and prints the tables.
+	"""
+	if not enabled:
+		return None
+	data = {
+		"created": time.strftime("%Y-%m-%d %H:%M:%S"),
+		"total_wall": time.perf_counter() - _started,
+		"stages": stages,
+		"functions": functions,
+		"counters": counters,
+	}
+	os.makedirs(PROFILE_DIR, exist_ok=True)
+	path = os.path.join(PROFILE_DIR, "report.json")
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "w") as f:
+		json.dump(data, f, indent=4)
+	os.replace(tmp_path, path)
+	print_report(data)
+	print(f"Profile written to {path}" + (", cProfile dumps next to it." if _cprofile else "."))
+	return data
+
+
+def _number(value, fmt):
+	return "-" if value is None else format(value, fmt)
+
+
+def print_report(data):
+	width = max([len(name) for name in list(data["stages"]) + list(data["functions"])] + [8]) + 2
+	print(f"{bcol.HEADER}{'stage':<{width}}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'http':>7}{'KB in':>9}{'read':>7}{'written':>9}{bcol.ENDC}")
+	for name, record in data["stages"].items():
+		print(f"{name:<{width}}{record['wall']:>9.2f}{record['cpu']:>9.2f}{record['peak_mb']:>9.1f}{record['http_requests']:>7}"
+			f"{record['http_bytes'] / 1024:>9.0f}{record['files_read']:>7}{record['files_written']:>9}")
+	print(f"{bcol.HEADER}{'function':<{width}}{'calls':>9}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{bcol.ENDC}")
+	for name, record in sorted(data["functions"].items(), key=lambda item: item[1]["wall"], reverse=True):
+		print(f"{name:<{width}}{record['calls']:>9}{record['wall']:>9.2f}{_number(record['cpu'], '>9.2f'):>9}{_number(record['peak_mb'], '>9.1f'):>9}")
+	totals = data["counters"]
+	print(f"Total {data['total_wall']:.1f}s, {totals['http_requests']} HTTP requests ({totals['http_bytes'] / 1024:.0f} KB), "
+		f"{totals['files_read']} files read, {totals['files_written']} written.")
+	print(f"{bcol.WARNING}Memory tracing was on, which slows Python down. Async function times are summed over overlapping calls.{bcol.ENDC}")
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import tempfile
+import subprocess
+
+from config import Bcol, cache_dir
+
+# How the analysis scales with the size of the squad. Generates synthetic squads (synthetic.py) of growing size,
+# times the main steps on each in a fresh process, and fits how each step's time grows with the swept setting.
+# A slope of 1 on a log-log scale is linear; steps that grow clearly faster than that are flagged.
+#
+#   python scaling_benchmark.py            (three sweeps: more players, more matches per player, more nights)
+#   python scaling_benchmark.py --quick    (smaller sizes)
+#   python scaling_benchmark.py --keep     (leave the generated squads in the temp folder)
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPORT_FILE = os.path.join(cache_dir, "scaling_report.json")
+RESULT_PREFIX = "SCALING_RESULT "
+STEPS = ["init", "synergies", "initiate", "records", "site"]
+# Steps faster than this on the biggest size are mostly noise, no verdict for those
+MIN_SECONDS = 0.05
+SUPERLINEAR_SLOPE = 1.25
+
+REPEATS = 3
+
+# Each sweep grows one setting (the sweep's name) and keeps the others fixed
+SWEEPS = {
+	"players": {"players": [4, 8, 16, 32], "matches": 100, "nights": 20},
+	"matches": {"players": 8, "matches": [50, 100, 200, 400], "nights": 20},
+	"nights": {"players": 8, "matches": 200, "nights": [10, 20, 40, 80]},
+}
+QUICK_SWEEPS = {
+	"players": {"players": [2, 4, 8], "matches": 40, "nights": 10},
+	"matches": {"players": 4, "matches": [20, 40, 80], "nights": 10},
+	"nights": {"players": 4, "matches": 80, "nights": [5, 10, 20]},
+}
+
+bcol = Bcol()
+
+
+def measure(nicknames, repeats=REPEATS):
+	"""
+	Runs in the child process, from <root>/code. Every step is timed `repeats` times on a fresh model, the best
+	time is kept, so imports and first-call warm up do not count.
+	Every repeat starts from the same files, so none of them gets away with the incremental no-op paths,
+	and with the in-memory caches a new process starts with (match store, hero catalog, colours) emptied.
+	"""
+	import gamer_master
+	import synergies
+	import html_gen
+	import fragment_cache
+	import match_store
+	import hero_catalog
+	import color_cache
+
+	timings = {step: float("inf") for step in STEPS}
+	# Gamer_master's default folder, where synthetic.py wrote the nights
+	game_nights_folder = "./game_nights/"
+	records_location = "records.json"
+	# The nights synthetic.py wrote, with their fake AI summaries, for the records and the site
+	generated_nights = tempfile.mkdtemp()
+	shutil.copytree(game_nights_folder, generated_nights, dirs_exist_ok=True)
+
+	def timed(step, work):
+		start = time.perf_counter()
+		work()
+		timings[step] = min(timings[step], time.perf_counter() - start)
+
+	try:
+		for _ in range(repeats):
+			# Otherwise repeats 2 and 3 read every match and the hero list from memory, and init looks cheaper than it is
+			match_store._store = None
+			hero_catalog._catalog_mtime = None
+			color_cache._entries = None
+			model = {}
+			timed("init", lambda: model.setdefault("g_master", gamer_master.Gamer_master(nicknames)))
+			g_master = model["g_master"]
+			# initiate() runs this too (set_synergies), timed on its own here since it pairs up every teammate
+			timed("synergies", lambda: synergies.enrich_gamers_with_synergies(g_master.gamers, g_master.participants))
+			# No nights on disk, so aggregate_game_night_data builds every one of them instead of skipping unchanged ones
+			shutil.rmtree(game_nights_folder, ignore_errors=True)
+			timed("initiate", g_master.initiate)
+			shutil.rmtree(game_nights_folder, ignore_errors=True)
+			shutil.copytree(generated_nights, game_nights_folder)
+			# No records (and so no night manifest in them), every night is folded in again
+			if os.path.exists(records_location):
+				os.remove(records_location)
+			timed("records", lambda: g_master.compute_kpi_records(records_location=records_location))
+			# Every build renders all fragments, like the first build after a change to the templates
+			shutil.rmtree(fragment_cache.FRAGMENT_DIR, ignore_errors=True)
+			timed("site", lambda: html_gen.build_site(nicknames, False, g_master=g_master))
+	finally:
+		shutil.rmtree(generated_nights, ignore_errors=True)
+	return timings
+
+
+def run_point(players, matches, nights, keep=False):
+	root = tempfile.mkdtemp(prefix=f"squad_{players}x{matches}x{nights}_")
+	env = dict(os.environ, PYTHONPATH=os.pathsep.join([HERE, os.environ.get("PYTHONPATH", "")]))
+	try:
+		subprocess.run([sys.executable, os.path.join(HERE, "synthetic.py"), "--root", root,
+			"--players", str(players), "--matches", str(matches), "--nights", str(nights)],
+			cwd=HERE, env=env, check=True, capture_output=True)
+		nicknames = sorted(name for name in os.listdir(os.path.join(root, "profiles")) if not name.startswith("_"))
+		child = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", json.dumps(nicknames)],
+			cwd=os.path.join(root, "code"), env=env, capture_output=True, text=True)
+		if child.returncode != 0:
+			raise RuntimeError(f"Measuring {players} players x {matches} matches over {nights} nights failed:\n{child.stderr[-2000:]}")
+		for line in child.stdout.splitlines():
+			if line.startswith(RESULT_PREFIX):
+				return json.loads(line[len(RESULT_PREFIX):])
+		raise RuntimeError(f"No result from the measuring process:\n{child.stderr[-2000:]}")
+	finally:
+		if keep:
+			print(f"Kept {root}")
+		else:
+			shutil.rmtree(root, ignore_errors=True)
+
+
+def slope(sizes, times):
+	# Least squares fit of log(time) against log(size)
+	xs = [math.log(size) for size in sizes]
+	ys = [math.log(max(t, 1e-6)) for t in times]
+	mean_x = sum(xs) / len(xs)
+	mean_y = sum(ys) / len(ys)
+	spread = sum((x - mean_x) ** 2 for x in xs)
+	if spread == 0:
+		return None
+	return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+
+def verdict(sizes, times):
+	fitted = slope(sizes, times)
+	if fitted is None:
+		return None, "one size only"
+	if max(times) < MIN_SECONDS:
+		return fitted, "too fast to tell"
+	if fitted > SUPERLINEAR_SLOPE:
+		return fitted, "SUPERLINEAR"
+	return fitted, "ok"
+
+
+def run_sweeps(sweeps, keep=False):
+	report = {}
+	for name, sweep in sweeps.items():
+		points = []
+		for value in sweep[name]:
+			settings = dict(sweep, **{name: value})
+			print(f"{bcol.OKBLUE}{name}: {settings['players']} players x {settings['matches']} matches over {settings['nights']} nights{bcol.ENDC}")
+			settings["timings"] = run_point(settings["players"], settings["matches"], settings["nights"], keep)
+			points.append(settings)
+		sizes = [point[name] for point in points]
+		fits = {}
+		for step in STEPS:
+			fitted, result = verdict(sizes, [point["timings"][step] for point in points])
+			fits[step] = {"slope": fitted, "verdict": result}
+		report[name] = {"points": points, "fits": fits}
+	return report
+
+
+def print_report(report):
+	for name, sweep in report.items():
+		print(f"\n{bcol.HEADER}Sweep: more {name}{bcol.ENDC}")
+		print(f"{'players':>8}{'matches':>9}{'nights':>8}" + "".join(f"{step:>11}" for step in STEPS))
+		for point in sweep["points"]:
+			print(f"{point['players']:>8}{point['matches']:>9}{point['nights']:>8}" + "".join(f"{point['timings'][step]:>10.3f}s" for step in STEPS))
+		print(f"{'slope':>25}" + "".join(f"{fit['slope']:>11.2f}" if fit["slope"] is not None else f"{'-':>11}" for fit in sweep["fits"].values()))
+		for step, fit in sweep["fits"].items():
+			if fit["verdict"] == "SUPERLINEAR":
+				print(f"{bcol.FAIL}{step} grows faster than linearly with {name} (time ~ size^{fit['slope']:.2f}){bcol.ENDC}")
+	print(f"\nSlope 1 is linear. Above {SUPERLINEAR_SLOPE} is flagged, steps under {MIN_SECONDS}s are left out.")
+
+
+if __name__ == '__main__':
+	if "--measure" in sys.argv:
+		nicknames = json.loads(sys.argv[sys.argv.index("--measure") + 1])
+		print(RESULT_PREFIX + json.dumps(measure(nicknames)))
+		sys.exit(0)
+
+	sweeps = QUICK_SWEEPS if "--quick" in sys.argv else SWEEPS
+	report = run_sweeps(sweeps, keep="--keep" in sys.argv)
+	print_report(report)
+	os.makedirs(cache_dir, exist_ok=True)
+	with open(REPORT_FILE, "w") as f:
+		json.dump(report, f, indent=4)
+	print(f"Report written to {REPORT_FILE}")
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import profiler
+from config import cache_dir, Bcol
+
+# Small dependency-aware stage runner for pipeline.py.
+# Each stage declares the stages it comes after, the files it reads (inputs) and writes (outputs), and any
+# plain values it depends on (params). A stage is skipped when its inputs and params fingerprint the same as the
+# last time it ran and its outputs still exist. Stages whose dependencies are done run at the same time, in threads.
+# Inputs are fingerprinted as the stage starts, so a change made meanwhile by a concurrent stage is picked up next run.
+# Paths a stage both reads and writes (gpt enhancing the game nights) are fingerprinted again after it finishes,
+# otherwise it would rerun forever.
+STATE_FILE = os.path.join(cache_dir, "pipeline_state.json")
+
+bcol = Bcol()
+
+
+def path_fingerprint(path):
+	"""
+	Size and mtime of a file, or of every file below a directory. Cheap, and good enough to notice a change.
+	"""
+	if not os.path.exists(path):
+		return "missing"
+	if os.path.isfile(path):
+		stat = os.stat(path)
+		return f"{stat.st_size}:{stat.st_mtime_ns}"
+	digest = hashlib.sha1()
+	for root, dirs, files in os.walk(path):
+		dirs.sort()
+		for filename in sorted(files):
+			if filename.endswith(".tmp"):
+				continue
+			full_path = os.path.join(root, filename)
+			try:
+				stat = os.stat(full_path)
+			except FileNotFoundError:
+				continue
+			digest.update(f"{os.path.relpath(full_path, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+	return digest.hexdigest()
+
+
+def value_fingerprint(value):
+	return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Stage():
+
+	def __init__(self, name, run, after=(), inputs=(), outputs=(), params=None, always=False, enabled=True, why_disabled=""):
+		"""
+		run() does the work. always=True stages have nothing local to fingerprint (remote data) and run every time,
+		enabled=False stages are skipped (why_disabled says why, for --explain).
+		"""
+		self.name = name
+		self.run = run
+		self.after = list(after)
+		self.inputs = list(inputs)
+		self.outputs = list(outputs)
+		self.params = params
+		self.always = always
+		self.enabled = enabled
+		self.why_disabled = why_disabled
+
+	def fingerprints(self):
+		prints = {path: path_fingerprint(path) for path in self.inputs}
+		if self.params is not None:
+			prints["params"] = value_fingerprint(self.params)
+		return prints
+
+
+class Scheduler():
+
+	def __init__(self, stages, state_key="default", force=False, explain=False, workers=4):
+		self.stages = {stage.name: stage for stage in stages}
+		self.state_key = state_key
+		self.force = force
+		self.explain = explain
+		self.workers = workers
+		self.reasons = {}
+		self.results = {}
+		self.timings = {}
+		self.lock = threading.Lock()
+		self.state = self.load_state()
+		for stage in stages:
+			for dependency in stage.after:
+				if dependency not in self.stages:
+					raise ValueError(f"Stage {stage.name} comes after unknown stage {dependency}")
+
+	def load_state(self):
+		if os.path.exists(STATE_FILE):
+			try:
+				with open(STATE_FILE, 'r') as f:
+					return json.load(f)
+			except json.JSONDecodeError:
+				pass
+		return {}
+
+	def save_state(self):
+		os.makedirs(cache_dir, exist_ok=True)
+		tmp_path = STATE_FILE + ".tmp"
+		with open(tmp_path, "w") as f:
+			json.dump(self.state, f, indent=4)
+		os.replace(tmp_path, STATE_FILE)
+
+	def stage_state(self, stage):
+		return self.state.get(self.state_key, {}).get(stage.name)
+
+	def decide(self, stage):
+		"""
+		Returns (run?, reason).
+		"""
+		failed = [dependency for dependency in stage.after if self.results.get(dependency) == "failed"]
+		if failed:
+			return False, f"{', '.join(failed)} failed"
+		if not stage.enabled:
+			return False, stage.why_disabled or "disabled"
+		if self.force:
+			return True, "--force"
+		if stage.always:
+			return True, "always runs, its data is remote"
+		previous = self.stage_state(stage)
+		if previous is None:
+			return True, "no previous run recorded"
+		missing = [path for path in stage.outputs if not os.path.exists(path)]
+		if missing:
+			return True, f"output missing: {', '.join(missing)}"
+		current = stage.fingerprints()
+		changed = [name for name, value in current.items() if previous.get(name) != value]
+		if changed:
+			return True, f"changed: {', '.join(changed)}"
+		return False, "inputs unchanged"
+
+	def execute(self, stage):
+		prints = stage.fingerprints()
+		start = time.perf_counter()
+		with profiler.stage(stage.name):
+			stage.run()
+		elapsed = time.perf_counter() - start
+		for path in stage.outputs:
+			if path in prints:
+				prints[path] = path_fingerprint(path)
+		return elapsed, prints
+
+	def record(self, stage, prints):
+		with self.lock:
+			self.state.setdefault(self.state_key, {})[stage.name] = prints
+			self.save_state()
+
+	def run(self):
+		pending = dict(self.stages)
+		running = {}
+		start = time.perf_counter()
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			while pending or running:
+				for name, stage in list(pending.items()):
+					if any(dependency in pending or dependency in running.values() for dependency in stage.after):
+						continue
+					del pending[name]
+					should_run, reason = self.decide(stage)
+					self.reasons[name] = reason
+					if not should_run:
+						self.results[name] = "failed" if self.results_failed(stage) else "skipped"
+						print(f"{bcol.OKBLUE}Skipping {name}: {reason}{bcol.ENDC}")
+						continue
+					print(f"{bcol.BOLD}Running {name}{bcol.ENDC} ({reason})")
+					running[pool.submit(self.execute, stage)] = name
+				if not running:
+					if pending:
+						raise ValueError(f"Stages {', '.join(pending)} depend on each other")
+					continue
+				done, _ = wait(running, return_when=FIRST_COMPLETED)
+				for future in done:
+					name = running.pop(future)
+					try:
+						self.timings[name], prints = future.result()
+						self.results[name] = "ran"
+						self.record(self.stages[name], prints)
+					except Exception as e:
+						self.results[name] = "failed"
+						self.reasons[name] += f", then failed: {e}"
+						print(f"{bcol.FAIL}Stage {name} failed: {e}{bcol.ENDC}")
+		self.timings["total"] = time.perf_counter() - start
+		if self.explain:
+			self.print_explanation()
+		return self.results
+
+	def results_failed(self, stage):
+		# A stage skipped because something it needs failed counts as failed too, so the failure propagates
+		return any(self.results.get(dependency) == "failed" for dependency in stage.after)
+
+	def print_explanation(self):
+		print(f"{bcol.HEADER}Pipeline stages:{bcol.ENDC}")
+		width = max(len(name) for name in self.stages) + 2
+		for name in self.stages:
+			result = self.results.get(name, "not reached")
+			timing = f" in {self.timings[name]:.1f}s" if name in self.timings else ""
+			colour = bcol.OKGREEN if result == "ran" else bcol.FAIL if result == "failed" else bcol.OKBLUE
+			print(f"  {colour}{name:<{width}}{result}{timing}{bcol.ENDC} - {self.reasons.get(name, '')}")
+		print(f"  {'total':<{width}}{self.timings['total']:.1f}s")
@@ -3,6 +3,8 @@ import os
 import itertools
 from collections import defaultdict
 
+import match_store
+
 def record_synergy(pick_stats, player_hero, team_heroes, match_won):
     """
     Records synergy data for a player's hero with other team picks.
@@ -69,6 +71,25 @@ def analyze_player_synergy(matches_json, gamer):
     return pick_stats, ban_stats
 
 
+def analyze_player_synergy_rows(table, gamer):
+    """
+    Same as analyze_player_synergy, but reads the player's matches from Gamer_master's participant table
+    instead of walking every match's players again.
+    """
+    pick_stats = defaultdict(lambda: {"games": 0, "wins": 0})
+    ban_stats = defaultdict(lambda: {"bans": 0, "win_when_banned": 0})
+
+    for row in table.rows(gamer.nickname, (table.player_uid == gamer.id) & (table.top_hero_id != -1)):
+        match_won = table.synergy_win[row] == 1
+        record_synergy(pick_stats, table.top_hero_id[row].item(), list(table.team_heroes[row]), match_won)
+        for banned_hero in table.bans[row]:
+            ban_stats[banned_hero]["bans"] += 1
+            if match_won:
+                ban_stats[banned_hero]["win_when_banned"] += 1
+
+    return pick_stats, ban_stats
+
+
 def print_player_synergy_results(player, pick_stats, ban_stats, min_games=0, top_n=20):
     """
     Processes synergy, anti-synergy, and ban stats, returning structured lists as dictionaries.
@@ -141,19 +162,13 @@ def print_player_synergy_results(player, pick_stats, ban_stats, min_games=0, top
 
 
 
-def load_match_data(match_uid, gamer_dir):
+def load_match_data(match_uid):
     """
-    Loads a match JSON file given its UID.
+    Loads a match from the shared match store given its UID.
     """
-    match_filename = f"{match_uid}.json"
-    match_path = os.path.join(gamer_dir, match_filename)
-    if not os.path.exists(match_path):
-        return None
-
-    with open(match_path, "r") as f:
-        return json.load(f)
+    return match_store.get_store().load(match_uid)
 
-def build_match_array(latest_comp_file, gamer_dir):
+def build_match_array(latest_comp_file):
     """
     Builds an array of full match data from a player's history file.
     """
@@ -164,7 +179,7 @@ def build_match_array(latest_comp_file, gamer_dir):
     matches = []
     for m in match_list:
         match_uid = m["match_uid"]
-        match_data = load_match_data(match_uid, gamer_dir)
+        match_data = load_match_data(match_uid)
         if match_data:
             matches.append(match_data)
         else:
@@ -172,16 +187,20 @@ def build_match_array(latest_comp_file, gamer_dir):
 
     return matches
 
-def enrich_gamers_with_synergies(gamers):
+def enrich_gamers_with_synergies(gamers, table=None):
     for g in gamers:
-        gamer_dir = f"../profiles/{g.nickname}"
-        comp_file = os.path.join(gamer_dir, "latest_comp_games.json")
+        if table is not None:
+            # Gamer_master already has every match flattened
+            player_synergy, ban_synergy = analyze_player_synergy_rows(table, g)
+        else:
+            gamer_dir = f"../profiles/{g.nickname}"
+            comp_file = os.path.join(gamer_dir, "latest_comp_games.json")
 
-        # Load full match history
-        full_matches = build_match_array(comp_file, gamer_dir)
+            # Load full match history
+            full_matches = build_match_array(comp_file)
 
-        # Analyze hero synergy for this player
-        player_synergy, ban_synergy = analyze_player_synergy(full_matches, g)
+            # Analyze hero synergy for this player
+            player_synergy, ban_synergy = analyze_player_synergy(full_matches, g)
 
         # Print the best synergy picks and ban effectiveness
         combo_list, ban_list, anti_combo_list = print_player_synergy_results(g, player_synergy, ban_synergy, min_games=2, top_n=10)
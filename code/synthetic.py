@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import random
+import shutil
+import datetime
+
+from zoneinfo import ZoneInfo
+
+import match_store
+from config import Bcol, time_zone, api_time_zone, game_mode, level_to_rank_map
+
+# Fake squad data, shaped like what the API and the broker leave on disk, for trying and benchmarking the pipeline
+# without a key or real profiles. Writes a self-contained tree that mirrors the repo layout:
+#
+#   <root>/code/heroes.json            (copied from ours, the heroes are real)
+#   <root>/code/game_nights/           (written by Gamer_master itself, then given fake AI summaries)
+#   <root>/profiles/<nick>/<nick>.json, latest_comp_games.json
+#   <root>/profiles/_matches/          (the shared match store)
+#   <root>/img/player_heads/           (copied from ours)
+#
+# Run things from <root>/code, like from this folder. Everything is seeded, the same settings give the same tree.
+#
+#   python synthetic.py --root /tmp/squad --players 6 --matches 80 --overlap 0.6 --nights 20
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+bcol = Bcol()
+
+
+def api_date(dt):
+	# Dates in the profile "updates" are in the API's time zone, formatted like this
+	return dt.astimezone(ZoneInfo(api_time_zone)).strftime("%m/%d/%Y, %I:%M:%S %p")
+
+
+def hero_pool(rng, heroes, size):
+	pool = rng.sample(heroes, size)
+	return [int(hero["id"]) for hero in pool]
+
+
+def hero_stats(rng, role, play_time):
+	minutes = play_time / 60
+	stats = {
+		"kills": rng.randint(0, int(2 * minutes) + 2),
+		"deaths": rng.randint(0, int(0.6 * minutes) + 2),
+		"assists": rng.randint(0, int(1.5 * minutes) + 2),
+		"total_hero_damage": round(rng.uniform(600, 1800) * minutes, 2),
+		"total_hero_heal": round(rng.uniform(1200, 2400) * minutes if role == "Strategist" else rng.uniform(0, 200) * minutes, 2),
+		"total_damage_taken": round(rng.uniform(1500, 3000) * minutes if role == "Vanguard" else rng.uniform(500, 1200) * minutes, 2),
+	}
+	return stats
+
+
+def plan_matches(rng, players, matches_per_player, overlap, nights, start):
+	"""
+	Returns a list of (timestamp, [player indexes]). Every player gets matches_per_player matches, each match is a
+	stack of 2-5 squad members with probability overlap, a solo queue otherwise. Matches are spread over `nights`
+	evenings before start, in the configured time zone.
+	"""
+	remaining = [matches_per_player] * players
+	matches = []
+	while any(remaining):
+		core = max(range(players), key=lambda i: (remaining[i], -i))
+		stack = [core]
+		available = [i for i in range(players) if i != core and remaining[i] > 0]
+		if available and rng.random() < overlap:
+			stack += rng.sample(available, min(len(available), rng.randint(1, 4)))
+		for i in stack:
+			remaining[i] -= 1
+		night = start - datetime.timedelta(days=rng.randrange(nights) + 1)
+		played = night.replace(hour=18, minute=0, second=0, microsecond=0) + datetime.timedelta(seconds=rng.randrange(6 * 3600))
+		matches.append((int(played.timestamp()), sorted(stack)))
+	matches.sort()
+	# Two matches can not start at the same second, the match uid is built from the timestamp
+	for n in range(1, len(matches)):
+		if matches[n][0] <= matches[n - 1][0]:
+			matches[n] = (matches[n - 1][0] + 1, matches[n][1])
+	return matches
+
+
+def generate(root, players=6, matches_per_player=80, overlap=0.6, nights=20, seed=1, ai_summaries=True, game_nights=True):
+	"""
+	Writes a squad to root (see the top of this file). Returns the list of nicknames.
+	game_nights=False leaves out the game nights, for when only the API side is needed (mock_api.py).
+	"""
+	rng = random.Random(seed)
+	code_dir = os.path.join(root, "code")
+	profiles = os.path.join(root, "profiles")
+	heads = os.path.join(root, "img", "player_heads")
+	for folder in (code_dir, profiles, heads):
+		os.makedirs(folder, exist_ok=True)
+	shutil.copy(os.path.join(HERE, "heroes.json"), os.path.join(code_dir, "heroes.json"))
+	with open(os.path.join(HERE, "heroes.json"), 'r') as f:
+		heroes = json.load(f)
+	roles = {int(hero["id"]): hero["role"] for hero in heroes}
+	names = {int(hero["id"]): hero["name"] for hero in heroes}
+	head_files = sorted(name for name in os.listdir(os.path.join(HERE, "..", "img", "player_heads")) if name.endswith(".png"))
+	for name in head_files:
+		shutil.copy(os.path.join(HERE, "..", "img", "player_heads", name), os.path.join(heads, name))
+
+	squad = []
+	for i in range(players):
+		squad.append({
+			"nickname": f"Synth{i:03d}",
+			"uid": 700000000 + i,
+			"icon_id": os.path.splitext(head_files[i % len(head_files)])[0],
+			"pool": hero_pool(rng, heroes, rng.randint(3, 6)),
+			"sr": rng.randint(3200, 4900),
+			"history": [],
+		})
+
+	now = datetime.datetime.now(ZoneInfo(time_zone))
+	store = match_store.MatchStore(root=os.path.join(profiles, "_matches"), profiles=profiles)
+	for n, (timestamp, stack) in enumerate(plan_matches(rng, players, matches_per_player, overlap, nights, now)):
+		duration = rng.randint(7 * 60, 22 * 60)
+		match_uid = f"{1000 + n % 300}_{timestamp}_{duration}_{game_mode}_{n}"
+		won = rng.random() < 0.52
+		draw = rng.random() < 0.02
+		score = {"0": 3, "1": 3} if draw else ({"0": 3, "1": rng.randint(0, 2)} if won else {"0": rng.randint(0, 2), "1": 3})
+
+		match_players = []
+		squad_heroes = {}
+		hero_ids = list(roles)
+		for slot in range(12):
+			camp = 0 if slot < 6 else 1
+			if slot % 6 == 0:
+				# A hero is only played once per team
+				taken = set()
+			if slot < len(stack):
+				member = squad[stack[slot]]
+				nickname, player_uid = member["nickname"], member["uid"]
+				main = rng.choice([hero_id for hero_id in member["pool"] if hero_id not in taken] or [hero_id for hero_id in hero_ids if hero_id not in taken])
+				squad_heroes[stack[slot]] = main
+			else:
+				nickname, player_uid = f"Random{rng.randrange(10**6)}", 800000000 + rng.randrange(10**7)
+				main = rng.choice([hero_id for hero_id in hero_ids if hero_id not in taken])
+			taken.add(main)
+			# Now and then a second hero for part of the match
+			played = [{"hero_id": main, "play_time": duration}]
+			if rng.random() < 0.2:
+				swap = rng.randint(60, duration // 2)
+				second = rng.choice([hero_id for hero_id in hero_ids if hero_id not in taken])
+				taken.add(second)
+				played = [{"hero_id": main, "play_time": duration - swap}, {"hero_id": second, "play_time": swap}]
+			stats = hero_stats(rng, roles[main], duration)
+			participant = {
+				"player_uid": player_uid, "nick_name": nickname, "player_icon": "", "camp": camp,
+				"cur_hero_id": played[-1]["hero_id"], "is_win": 2 if draw else int((camp == 0) == won),
+				"player_heroes": [dict(hero, **hero_stats(rng, roles[hero["hero_id"]], hero["play_time"])) for hero in played],
+			}
+			participant.update(stats)
+			match_players.append(participant)
+
+		bans = rng.sample([int(hero["id"]) for hero in heroes], 4)
+		details = {
+			"match_uid": match_uid, "game_mode_id": game_mode, "match_play_duration": duration,
+			"mvp_uid": match_players[rng.randrange(6) if won else 6 + rng.randrange(6)]["player_uid"],
+			"svp_uid": match_players[6 + rng.randrange(6) if won else rng.randrange(6)]["player_uid"],
+			"match_players": match_players,
+			"dynamic_fields": {"ban_pick_info": [{"hero_id": hero_id, "is_pick": 0, "battle_side": k % 2} for k, hero_id in enumerate(bans)]},
+		}
+		store.write(match_uid, {"match_details": details})
+
+		for pos, member_index in enumerate(stack):
+			member = squad[member_index]
+			participant = match_players[pos]
+			gained = rng.randint(15, 35) * (1 if participant["is_win"] == 1 else -1 if participant["is_win"] == 0 else 0)
+			# Kept below One Above All, which is a leaderboard place rather than an SR band
+			member["sr"] = max(3000, min(5150, member["sr"] + gained))
+			level = min(22, max(1, (member["sr"] - 3000) // 100 + 1))
+			main = squad_heroes[member_index]
+			player_hero = {"hero_id": main, "play_time": participant["player_heroes"][0]["play_time"]}
+			player_hero.update({key: participant["player_heroes"][0][key] for key in ("kills", "deaths", "assists", "total_hero_damage", "total_hero_heal", "total_damage_taken")})
+			member["history"].append({
+				"match_uid": match_uid, "game_mode_id": game_mode, "match_time_stamp": timestamp,
+				"match_play_duration": duration, "score_info": score, "mvp_uid": details["mvp_uid"], "svp_uid": details["svp_uid"],
+				"match_player": {
+					"player_hero": player_hero,
+					"is_win": {"is_win": participant["is_win"] == 1},
+					"score_info": {"add_score": gained, "new_score": member["sr"], "new_level": level},
+				},
+			})
+
+	for member in squad:
+		nickname = member["nickname"]
+		history = sorted(member["history"], key=lambda m: m["match_time_stamp"], reverse=True)
+		gamer_dir = os.path.join(profiles, nickname)
+		os.makedirs(gamer_dir, exist_ok=True)
+		with open(os.path.join(gamer_dir, "latest_comp_games.json"), "w") as f:
+			json.dump({"match_history": history}, f)
+
+		ranked = []
+		for hero_id in member["pool"]:
+			played = [m for m in history if m["match_player"]["player_hero"]["hero_id"] == hero_id]
+			ranked.append({
+				"hero_id": hero_id, "hero_name": names[hero_id], "matches": len(played),
+				"wins": sum(1 for m in played if m["match_player"]["is_win"]["is_win"]),
+				"play_time": sum(m["match_play_duration"] for m in played),
+			})
+		matchups = []
+		for hero in rng.sample(heroes, 12):
+			matches = rng.randint(1, 12)
+			matchups.append({"hero_id": int(hero["id"]), "hero_name": hero["name"], "matches": matches, "wins": rng.randint(0, matches),
+				"win_rate": f"{rng.uniform(20, 80):.2f}"})
+		latest = datetime.datetime.fromtimestamp(history[0]["match_time_stamp"], ZoneInfo(time_zone)) if history else now
+		profile = {
+			"uid": member["uid"], "name": nickname,
+			"player": {
+				"uid": member["uid"], "name": nickname, "level": "120",
+				"icon": {"player_icon_id": member["icon_id"], "player_icon": f"/players/heads/player_head_{member['icon_id']}.png"},
+				"rank": {"rank": level_to_rank_map[str(history[0]["match_player"]["score_info"]["new_level"])] if history else "Bronze III"},
+			},
+			"updates": {
+				"info_update_time": api_date(now), "last_history_update": api_date(latest + datetime.timedelta(minutes=30)),
+				"last_inserted_match": api_date(latest), "last_update_request": api_date(latest),
+			},
+			"heroes_ranked": ranked,
+			"hero_matchups": matchups,
+			"match_history": history,
+			"rank_history": [{
+				"match_time_stamp": m["match_time_stamp"],
+				"level_progression": {"from": m["match_player"]["score_info"]["new_level"], "to": m["match_player"]["score_info"]["new_level"]},
+				"score_progression": {"add_score": m["match_player"]["score_info"]["add_score"], "total_score": m["match_player"]["score_info"]["new_score"]},
+			} for m in history],
+		}
+		with open(os.path.join(gamer_dir, f"{nickname}.json"), "w") as f:
+			json.dump(profile, f)
+
+	nicknames = [member["nickname"] for member in squad]
+	if game_nights:
+		write_game_nights(root, nicknames, ai_summaries=ai_summaries)
+	return nicknames
+
+
+def write_game_nights(root, nicknames, ai_summaries=True):
+	"""
+	The game night files are written by Gamer_master, from <root>/code, so they are exactly what a real run leaves.
+	With ai_summaries the nights also get the fields gpt_master adds, so the AI paths of the site are exercised.
+	"""
+	previous = os.getcwd()
+	os.chdir(os.path.join(root, "code"))
+	try:
+		import gamer_master
+		g_master = gamer_master.Gamer_master(nicknames)
+		g_master.initiate()
+		if not ai_summaries:
+			return
+		folder = g_master.game_nights_folder
+		for filename in sorted(os.listdir(folder)):
+			if not filename.endswith(".json"):
+				continue
+			path = os.path.join(folder, filename)
+			with open(path, 'r', encoding="utf-8") as f:
+				night = json.load(f)
+			night["AI_title"] = f"Synthetic night {night['date']}"
+			night["AI_summary"] = f"{night['match_count']} matches, {night['total_wins']} won."
+			night["personal_AI_summaries"] = [
+				{"nickname": player["nickname"], "title": f"{player['nickname']} on {night['date']}", "content": f"Played {player['match_count']} matches."}
+				for player in night["players"]
+			]
+			with open(path, "w", encoding="utf-8") as f:
+				json.dump(night, f, indent=4)
+	finally:
+		os.chdir(previous)
+
+
+if __name__ == '__main__':
+	settings = {"root": None, "players": 6, "matches": 80, "overlap": 0.6, "nights": 20, "seed": 1}
+	args = sys.argv[1:]
+	for i, arg in enumerate(args):
+		if arg.startswith("--") and arg[2:] in settings and i + 1 < len(args):
+			settings[arg[2:]] = args[i + 1]
+	if not settings["root"]:
+		exit(f"{bcol.FAIL}Usage: python synthetic.py --root <folder> [--players 6] [--matches 80] [--overlap 0.6] [--nights 20] [--seed 1]{bcol.ENDC}")
+	nicknames = generate(settings["root"], int(settings["players"]), int(settings["matches"]), float(settings["overlap"]), int(settings["nights"]), int(settings["seed"]))
+	print(f"{bcol.OKGREEN}Wrote {len(nicknames)} players to {settings['root']}. Run from {os.path.join(settings['root'], 'code')} with gamerlist = {nicknames}{bcol.ENDC}")
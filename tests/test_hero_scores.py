@@ -0,0 +1,176 @@
+import copy
+import random
+from types import SimpleNamespace
+
+from gamer_master import Gamer_master
+
+
+def reference_calculate_hero_scores(g_master):
+	# calculate_hero_scores as it was before the single-pass rewrite, which re-scored every night on each match
+	for g in g_master.gamers:
+		for hero in g.top_heroes:
+			# Initialize total counters
+			deaths_array = []
+			kills_array = []
+			assists_array = []
+			grouped_match_scores = {}
+
+			totals = {
+				"kills": 0, "assists": 0, "deaths": 0, "wins": 0, "losses": 0,
+				"damage": 0, "healing": 0, "tanked": 0, "seconds_played": 0
+			}
+			for match in hero["match_stats"]:
+				if match["primary"]:  # Only count matches where this hero was primary
+					match_date = match["match_date"]  # Get the date for grouping
+
+					# Aggregate data per match
+					totals["kills"] += match["kills"]
+					totals["assists"] += match["assists"]
+					totals["deaths"] += match["deaths"]
+					totals["seconds_played"] += g_master.duration_to_seconds(match["play_time"])
+					totals["damage"] += match["total_hero_damage"]
+					totals["healing"] += match["total_hero_heal"]
+					totals["tanked"] += match["total_damage_taken"]
+					if match["win"] == "win":
+						totals["wins"] += 1
+					if match["win"] == "loss":
+						totals["losses"] += 1
+
+					# Track arrays for consistency calculations
+					deaths_array.append(match["deaths"])
+					kills_array.append(match["kills"])
+					assists_array.append(match["assists"])
+
+					# --- GROUP MATCH SCORES BY DATE ---
+					if match_date not in grouped_match_scores:
+						grouped_match_scores[match_date] = {
+							"kills": 0, "assists": 0, "deaths": 0, "wins": 0, "losses": 0,
+							"damage": 0, "healing": 0, "tanked": 0, "seconds_played": 0,
+							"match_count": 0
+						}
+
+					# Aggregate per day
+					grouped_match_scores[match_date]["kills"] += match["kills"]
+					grouped_match_scores[match_date]["assists"] += match["assists"]
+					grouped_match_scores[match_date]["deaths"] += match["deaths"]
+					grouped_match_scores[match_date]["seconds_played"] += g_master.duration_to_seconds(match["play_time"])
+					grouped_match_scores[match_date]["damage"] += match["total_hero_damage"]
+					grouped_match_scores[match_date]["healing"] += match["total_hero_heal"]
+					grouped_match_scores[match_date]["tanked"] += match["total_damage_taken"]
+					grouped_match_scores[match_date]["match_count"] += 1
+					if match["win"] == "win":
+						grouped_match_scores[match_date]["wins"] += 1
+					if match["win"] == "loss":
+						grouped_match_scores[match_date]["losses"] += 1
+
+					# --- Derived Statistics Calculations ---
+					derived = {}
+					match_count = totals["wins"] + totals["losses"]
+
+					# KDA calculation: handle zero deaths to avoid division by zero
+					derived["kda"] = (totals["kills"] + totals["assists"]) / totals["deaths"] if totals["deaths"] > 0 else totals["kills"] + totals["assists"]
+
+					# Minutes played (avoid division by zero)
+					minutes_played = totals["seconds_played"] / 60 if totals["seconds_played"] > 0 else 0
+					derived["damage_per_minute"] = totals["damage"] / minutes_played if minutes_played > 0 else 0
+					derived["healing_per_minute"] = totals["healing"] / minutes_played if minutes_played > 0 else 0
+					derived["tanking_per_minute"] = totals["tanked"] / minutes_played if minutes_played > 0 else 0
+					derived["kills_per_minute"] = totals["kills"] / minutes_played if minutes_played > 0 else 0
+
+					# Win rate calculation
+					derived["win_rate"] = totals["wins"] / match_count if match_count > 0 else 0
+
+					# Per-game stats
+					derived["kills_per_game"] = totals["kills"] / match_count if match_count > 0 else 0
+					derived["assists_per_game"] = totals["assists"] / match_count if match_count > 0 else 0
+					derived["deaths_per_game"] = totals["deaths"] / match_count if match_count > 0 else 0
+
+					# Add the derived stats into the totals dictionary
+					totals["derived_stats"] = derived
+
+					# Compute consistency
+					totals["kills_consistency"] = g_master.compute_consistency(kills_array)
+					totals["deaths_consistency"] = g_master.compute_consistency(deaths_array)
+					totals["assists_consistency"] = g_master.compute_consistency(assists_array)
+
+					# Store final stats in hero object
+					hero["match_scores"] = totals
+					hero["match_scores"]["role"] = hero["role"]
+					hero["match_scores"]["hero_id"] = hero["hero_id"]
+
+					# Store grouped match scores
+					hero["grouped_match_scores"] = grouped_match_scores
+
+					# Compute final hero score using improved formula
+					hero["match_scores"]["score"] = g_master.compute_composite_value(hero["match_scores"]["derived_stats"], role=hero["role"])
+					hero["match_scores"]["derived_stats"]["score"] = totals["score"]
+					match["score"] = totals["score"]
+
+					# Compute scores for grouped matches by date
+					for match_date, stats in hero["grouped_match_scores"].items():
+						# Calculate per-minute values for proper scoring
+						minutes_played = stats["seconds_played"] / 60 if stats["seconds_played"] > 0 else 0
+						derived = {
+							"damage_per_minute": stats["damage"] / minutes_played if minutes_played > 0 else 0,
+							"healing_per_minute": stats["healing"] / minutes_played if minutes_played > 0 else 0,
+							"tanking_per_minute": stats["tanked"] / minutes_played if minutes_played > 0 else 0,
+							"kills_per_minute": stats["kills"] / minutes_played if minutes_played > 0 else 0,
+							"win_rate": stats["wins"] / stats["match_count"] if stats["match_count"] > 0 else 0,
+							"kda": (stats["kills"] + stats["assists"]) / stats["deaths"] if stats["deaths"] > 0 else stats["kills"] + stats["assists"],
+							"kills_per_game": stats["kills"] / stats["match_count"] if stats["match_count"] > 0 else 0,
+							"assists_per_game": stats["assists"] / stats["match_count"] if stats["match_count"] > 0 else 0,
+							"deaths_per_game": stats["deaths"] / stats["match_count"] if stats["match_count"] > 0 else 0
+						}
+						stats["score"] = g_master.compute_composite_value(derived, role=hero["role"])
+
+
+def seeded_gamers(seed=8):
+	rng = random.Random(seed)
+	gamers = []
+	for _ in range(3):
+		top_heroes = []
+		for hero_index in range(6):
+			match_stats = []
+			for _ in range(rng.randint(0, 40)):
+				match = {"primary": rng.random() < 0.7, "match_date": f"2025-0{rng.randint(1, 3)}-1{rng.randint(0, 5)}"}
+				if match["primary"]:
+					seconds = rng.randint(0, 900)
+					# Every play_time format the API has given us
+					play_time = rng.choice([seconds, float(seconds), {"raw": seconds}, f"{seconds // 60}m {seconds % 60}s"])
+					match.update({
+						"kills": rng.randint(0, 30), "assists": rng.randint(0, 30), "deaths": rng.randint(0, 15), "play_time": play_time,
+						"total_hero_damage": rng.random() * 30000, "total_hero_heal": rng.random() * 20000,
+						"total_damage_taken": rng.random() * 20000, "win": rng.choice(["win", "loss", "draw"]),
+					})
+				match_stats.append(match)
+			top_heroes.append({"role": rng.choice(["Vanguard", "Duelist", "Strategist"]), "hero_id": 1000 + hero_index, "match_stats": match_stats})
+		gamers.append(SimpleNamespace(top_heroes=top_heroes))
+	return gamers
+
+
+def scored(calculate, gamers):
+	g_master = Gamer_master.for_game_nights()
+	g_master.gamers = copy.deepcopy(gamers)
+	calculate(g_master)
+	return [gamer.top_heroes for gamer in g_master.gamers]
+
+
+def test_single_pass_scores_match_the_old_loop():
+	gamers = seeded_gamers()
+	expected = scored(reference_calculate_hero_scores, gamers)
+	actual = scored(Gamer_master.calculate_hero_scores, gamers)
+	compared = 0
+	for expected_heroes, actual_heroes in zip(expected, actual):
+		for expected_hero, actual_hero in zip(expected_heroes, actual_heroes):
+			assert [match.get("score") for match in actual_hero["match_stats"]] == [match.get("score") for match in expected_hero["match_stats"]]
+			for key in ("match_scores", "grouped_match_scores"):
+				assert (key in actual_hero) == (key in expected_hero)
+			if "match_scores" not in expected_hero:
+				continue
+			assert actual_hero["match_scores"] == expected_hero["match_scores"]
+			assert list(actual_hero["match_scores"]) == list(expected_hero["match_scores"])
+			assert actual_hero["match_scores"]["derived_stats"] == expected_hero["match_scores"]["derived_stats"]
+			assert actual_hero["grouped_match_scores"] == expected_hero["grouped_match_scores"]
+			compared += 1
+	# The seed has to give us heroes with primary matches, or there was nothing to compare
+	assert compared > 10
@@ -0,0 +1,61 @@
+import os
+import json
+
+from gamer_master import Gamer_master
+
+
+def night_stats(match_ids, kills, heroes):
+	return {
+		"kills": kills, "assists": 3, "deaths": 2, "wins": len(match_ids), "draws": 0, "losses": 0,
+		"damage": 1000, "healing": 0, "tanked": 500, "seconds_played": 600 * len(match_ids), "match_count": len(match_ids),
+		"unique_matches": [{"match_id": match_id, "win": "win", "duration": 600} for match_id in match_ids],
+		"heroes": [{"hero_id": hero_id, "name": "hero"} for hero_id in heroes], "secondaries": []
+	}
+
+
+def night(match_ids, kills=10, heroes=(1011,)):
+	return {
+		"matches": {match_id: {"result": "win", "players": {"alpha"}, "duration": 600} for match_id in match_ids},
+		"player_stats": {"alpha": night_stats(match_ids, kills, heroes)}
+	}
+
+
+def stored_night(g_master, file_path, night_data):
+	with open(file_path, "w", encoding="utf-8") as f:
+		json.dump({"unique_matches": sorted(night_data["matches"]), "fingerprint": g_master.night_fingerprint(night_data)}, f)
+
+
+def needs_update(g_master, file_path, night_data):
+	return g_master.night_needs_update(file_path, "2025-01-01", night_data, g_master.night_fingerprint(night_data))
+
+
+def test_only_late_matches_and_stat_changes_rebuild_a_night(tmp_path):
+	g_master = Gamer_master.for_game_nights(str(tmp_path))
+	file_path = os.path.join(tmp_path, "2025_01_01.json")
+	stored_night(g_master, file_path, night(["1", "2"]))
+
+	assert not needs_update(g_master, file_path, night(["1", "2"]))
+	# A late match shows up for a night that was already written
+	assert needs_update(g_master, file_path, night(["1", "2", "3"]))
+	# The night is aging out of the match_limit window, one of its matches is no longer loaded
+	assert not needs_update(g_master, file_path, night(["2"], kills=5))
+	# The player's top heroes changed since, which says nothing about this night
+	assert not needs_update(g_master, file_path, night(["1", "2"], heroes=(1022, 1033)))
+	# Same matches, corrected stats
+	assert needs_update(g_master, file_path, night(["1", "2"], kills=12))
+
+
+def test_old_fingerprints_are_restamped_not_rebuilt(tmp_path):
+	g_master = Gamer_master.for_game_nights(str(tmp_path))
+	file_path = os.path.join(tmp_path, "2025_01_01.json")
+	night_data = night(["1", "2"])
+	old_fingerprint = g_master.night_fingerprint(night_data)
+	del old_fingerprint["version"]
+	old_fingerprint["hash"] = "hashed with the hero lists"
+	with open(file_path, "w", encoding="utf-8") as f:
+		json.dump({"unique_matches": ["1", "2"], "fingerprint": old_fingerprint}, f)
+
+	assert not needs_update(g_master, file_path, night_data)
+	with open(file_path, "r", encoding="utf-8") as f:
+		assert json.load(f)["fingerprint"] == g_master.night_fingerprint(night_data)
+	assert needs_update(g_master, file_path, night(["1", "2", "3"]))
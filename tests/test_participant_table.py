@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import participant_table
+import synergies
+
+
+def fake_match(match_uid, timestamp, nickname, player_uid, hero_id, teammate_hero, is_win):
+	players = [
+		{"nick_name": nickname, "player_uid": player_uid, "camp": 0, "cur_hero_id": hero_id, "is_win": is_win,
+			"kills": 10, "deaths": 2, "assists": 5, "total_hero_damage": 1000, "total_hero_heal": 0, "total_damage_taken": 500,
+			"player_heroes": [{"hero_id": hero_id, "play_time": 600}]},
+		{"nick_name": "someone", "player_uid": 9, "camp": 0, "cur_hero_id": teammate_hero, "is_win": is_win, "player_heroes": []},
+		{"nick_name": "other", "player_uid": 8, "camp": 0, "cur_hero_id": teammate_hero + 1, "is_win": is_win, "player_heroes": []},
+		{"nick_name": "enemy", "player_uid": 7, "camp": 1, "cur_hero_id": 1050, "is_win": 1 - is_win, "player_heroes": []},
+	]
+	return {
+		"match_details": {"match_uid": match_uid, "mvp_uid": 0, "svp_uid": 0, "match_players": players,
+			"dynamic_fields": {"ban_pick_info": [{"hero_id": 1060 + timestamp % 3, "is_pick": 0}, {"hero_id": hero_id, "is_pick": 1}]}},
+		"extended_data": {"match_time_stamp": timestamp, "match_play_duration": 600, "match_player": {"player_hero": {"hero_id": hero_id}}},
+	}
+
+
+def fake_gamers():
+	first = SimpleNamespace(nickname="first", id=1, match_data=[
+		fake_match("a", 1700000000, "first", 1, 1011, 1022, 1),
+		fake_match("b", 1700001000, "first", 1, 1011, 1022, 1),
+	])
+	second = SimpleNamespace(nickname="second", id=2, match_data=[
+		fake_match("c", 1700000000, "second", 2, 1033, 1044, 0),
+		fake_match("d", 1700001000, "second", 2, 1033, 1044, 1),
+		fake_match("e", 1700002000, "second", 2, 1033, 1044, 1),
+	])
+	return [first, second]
+
+
+def test_rows_follow_the_gamer_not_their_position():
+	first, second = fake_gamers()
+	table = participant_table.ParticipantTable([first, second], lambda timestamp: "night", lambda duration: duration)
+	# What sanitize_gamerlist does when first has no top heroes left
+	remaining = [second]
+
+	assert list(table.match_uid[table.rows(second.nickname)]) == ["c", "d", "e"]
+	assert len(table.hero_match_rows(second.nickname, 1033)) == 3
+	assert len(table.rows("dropped")) == 0
+
+	pick_stats, ban_stats = synergies.analyze_player_synergy_rows(table, remaining[0])
+	assert pick_stats[frozenset([1033, 1044])] == {"games": 3, "wins": 2}
+	assert frozenset([1011, 1022]) not in pick_stats
+
+
+def test_synergies_match_the_per_match_analysis():
+	first, second = fake_gamers()
+	# second played one match under an older nickname, the uid is what identifies them
+	renamed = fake_match("f", 1700003000, "second_old_name", 2, 1034, 1045, 1)
+	second.match_data.append(renamed)
+	table = participant_table.ParticipantTable([first, second], lambda timestamp: "night", lambda duration: duration)
+
+	for gamer in (first, second):
+		expected = synergies.analyze_player_synergy(gamer.match_data, gamer)
+		actual = synergies.analyze_player_synergy_rows(table, gamer)
+		assert [dict(stats) for stats in actual] == [dict(stats) for stats in expected]
+	assert any(1034 in combo for combo in synergies.analyze_player_synergy_rows(table, second)[0])
@@ -0,0 +1,70 @@
+import os
+import json
+
+import config
+import pipeline
+import scheduler
+
+
+def squad_in(root):
+	return {
+		"name": "test", "gamers": ["alpha", "bravo"],
+		"game_nights_folder": os.path.join(root, "game_nights"), "records": os.path.join(root, "records.json"),
+		"audio_folder": os.path.join(root, "audio"), "page": os.path.join(root, "index.html"),
+	}
+
+
+def write(path, data):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, "w") as f:
+		json.dump(data, f)
+
+
+def run_squad(squad):
+	# The squad's real stages, with every stage's work swapped for a no-op, so only the scheduling is tested
+	stages = pipeline.squad_stages(squad, [])
+	for stage in stages:
+		stage.run = lambda: None
+	return scheduler.Scheduler(stages, state_key="test").run()
+
+
+def test_new_match_reruns_analysis_and_site(tmp_path, monkeypatch):
+	profiles = os.path.join(tmp_path, "profiles")
+	store = os.path.join(profiles, "_matches")
+	monkeypatch.setattr(pipeline, "profile_dir", profiles)
+	monkeypatch.setattr(pipeline, "match_store_dir", store)
+	monkeypatch.setattr(scheduler, "STATE_FILE", os.path.join(tmp_path, "pipeline_state.json"))
+
+	squad = squad_in(str(tmp_path))
+	for gamer in squad["gamers"]:
+		write(os.path.join(profiles, gamer, f"{gamer}.json"), {"name": gamer})
+		write(os.path.join(profiles, gamer, "latest_comp_games.json"), {"match_history": [{"match_uid": "1"}]})
+	write(os.path.join(store, "1.json"), {"match_details": {}})
+	os.makedirs(squad["game_nights_folder"])
+	os.makedirs(squad["audio_folder"])
+	write(squad["records"], {})
+	write(squad["page"], {})
+
+	assert set(run_squad(squad).values()) == {"ran"}
+	assert set(run_squad(squad).values()) == {"skipped"}
+
+	# What the matches stage does for a new match: store it, and list it for the gamer. Their profile is untouched.
+	write(os.path.join(store, "2.json"), {"match_details": {}})
+	write(os.path.join(profiles, "alpha", "latest_comp_games.json"), {"match_history": [{"match_uid": "2"}, {"match_uid": "1"}]})
+	results = run_squad(squad)
+	assert results["test:analysis"] == "ran"
+	assert results["test:site"] == "ran"
+
+	# A match downloaded after the history that lists it (a retry) is picked up as well
+	assert run_squad(squad)["test:analysis"] == "skipped"
+	write(os.path.join(store, "3.json"), {"match_details": {}})
+	results = run_squad(squad)
+	assert results["test:analysis"] == "ran"
+	assert results["test:site"] == "ran"
+
+	# A scoring setting changed in config.py
+	assert run_squad(squad)["test:site"] == "skipped"
+	monkeypatch.setattr(config, "matchup_threshold", config.matchup_threshold + 1)
+	results = run_squad(squad)
+	assert results["test:analysis"] == "ran"
+	assert results["test:site"] == "ran"